@@ -1,14 +1,75 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from api.models import Cliente, Produto, ContratacaoPlano, AporteExtra, Resgate
 
 
+class ContagemEstimadaPaginator(Paginator):
+    """
+    Paginação que, na listagem sem filtros de uma tabela grande, usa a estimativa de linhas das
+    estatísticas do Postgres (pg_class.reltuples) em vez de um COUNT(*) que lê a tabela inteira.
+    Com filtro, busca, outro banco ou tabelas pequenas a contagem continua exata
+    """
+
+    @cached_property
+    def count(self):
+        estimativa = self.estimar(self.object_list)
+        if estimativa is not None and estimativa > settings.ADMIN_CONTAGEM_EXATA_ATE:
+            return estimativa
+        return super().count
+
+    @staticmethod
+    def estimar(queryset):
+        if not hasattr(queryset, 'query') or queryset.query.where or queryset.query.distinct:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            linha = cursor.fetchone()
+        # reltuples é -1 (ou 0) enquanto a tabela não passou por um ANALYZE
+        return linha[0] if linha and linha[0] > 0 else None
+
+
+class TabelaGrandeAdmin(admin.ModelAdmin):
+    """
+    Admin para tabelas que crescem sem limite: contagem estimada e sem o segundo COUNT(*) da tabela
+    inteira ao filtrar. As subclasses com FKs no list_display as declaram em list_select_related,
+    para que o changelist as carregue no mesmo SELECT
+    """
+    paginator = ContagemEstimadaPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class SomenteInclusaoAdmin(TabelaGrandeAdmin):
+    """
+    Admin das movimentações de dinheiro, que como na API só podem ser incluídas: o extrato, os saldos
+    compactados e os agregados são derivados das inclusões, e editar ou apagar a linha os deixaria
+    fora de sincronia. Correções entram como novas movimentações
+    """
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Cliente)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(TabelaGrandeAdmin):
     list_display = ('cpf', 'nome', 'email', 'dataDeNascimento', 'sexo', 'rendaMensal',)
     list_filter = ('sexo',)
-    search_fields = ('cpf', 'nome', 'email',)
-    list_per_page = 50
+    # só buscas que usam índice: o unique do cpf e o índice de UPPER(email) do iexact
+    search_fields = ('cpf__exact', 'email__iexact',)
+    search_help_text = 'CPF (apenas números) ou email completo'
 
 
 @admin.register(Produto)
@@ -17,23 +78,27 @@ class ProdutoAdmin(admin.ModelAdmin):
         'nome', 'susep', 'expiracaoDeVenda', 'valorMinimoAporteInicial', 'valorMinimoAporteExtra',
         'idadeDeEntrada', 'idadeDeSaida', 'carenciaInicialDeResgate', 'carenciaEntreResgates'
     )
-    search_fields = ('nome', 'susepe',)
+    search_fields = ('nome', 'susep',)
     list_per_page = 50
 
 
 @admin.register(ContratacaoPlano)
-class ContratacaoPlanoAdmin(admin.ModelAdmin):
+class ContratacaoPlanoAdmin(SomenteInclusaoAdmin):
     list_display = ('idCliente', 'idProduto', 'aporte', 'dataDaContratacao',)
-    list_per_page = 50
+    list_select_related = ('idCliente', 'idProduto',)
+    autocomplete_fields = ('idCliente', 'idProduto',)
 
 
 @admin.register(AporteExtra)
-class AporteExtraAdmin(admin.ModelAdmin):
+class AporteExtraAdmin(SomenteInclusaoAdmin):
     list_display = ('idCliente', 'idPlano', 'valorAporte',)
-    list_per_page = 50
+    list_select_related = ('idCliente', 'idPlano',)
+    autocomplete_fields = ('idCliente',)
+    raw_id_fields = ('idPlano',)
 
 
 @admin.register(Resgate)
-class ResgateAdmin(admin.ModelAdmin):
+class ResgateAdmin(SomenteInclusaoAdmin):
     list_display = ('idPlano', 'valorResgate',)
-    list_per_page = 50
+    list_select_related = ('idPlano',)
+    raw_id_fields = ('idPlano',)
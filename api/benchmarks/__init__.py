@@ -0,0 +1,4 @@
+"""
+Benchmarks da API. Rodam contra o banco configurado em DATABASE_URL,
+criando e removendo os próprios dados.
+"""
@@ -0,0 +1,90 @@
+import random
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from api.models import Cliente, Produto, ContratacaoPlano, AporteExtra, Resgate, Movimentacao
+
+
+def popular(clientes: int, produtos: int, planos: int, aportes: int, resgates: int,
+            semente: int = 42, lote: int = 5000) -> dict:
+    """
+    Gera uma massa de dados reproduzível (mesma semente, mesmos dados) gravada com bulk_create.
+    As regras de negócio não são aplicadas, mas o extrato de cada plano é gerado junto
+    """
+    aleatorio = random.Random(semente)
+
+    def novo_id():
+        return uuid.UUID(int=aleatorio.getrandbits(128), version=4)
+
+    def valor(minimo, maximo):
+        return Decimal(aleatorio.randint(minimo * 100, maximo * 100)) / 100
+
+    hoje = date.today()
+    lista_produtos = [
+        Produto(
+            id=novo_id(), nome=f'Produto {numero}', susep=f'{numero:05d}.000000/2023-00',
+            expiracaoDeVenda=hoje + timedelta(days=aleatorio.randint(30, 3650)),
+            valorMinimoAporteInicial=valor(500, 5000), valorMinimoAporteExtra=valor(50, 500),
+            idadeDeEntrada=aleatorio.randint(0, 30), idadeDeSaida=aleatorio.randint(60, 90),
+            carenciaInicialDeResgate=aleatorio.choice([0, 30, 60, 90]),
+            carenciaEntreResgates=aleatorio.choice([0, 15, 30]),
+        )
+        for numero in range(produtos)
+    ]
+    lista_clientes = [
+        Cliente(
+            id=novo_id(), cpf=f'{semente % 10}{numero:010d}', nome=f'Cliente {numero}',
+            email=f'cliente{numero}.{semente}@example.com',
+            dataDeNascimento=hoje - timedelta(days=aleatorio.randint(18 * 365, 60 * 365)),
+            sexo=aleatorio.choice('MF'), rendaMensal=valor(1000, 30000),
+        )
+        for numero in range(clientes)
+    ]
+    lista_planos = [
+        ContratacaoPlano(
+            id=novo_id(), idCliente=aleatorio.choice(lista_clientes), idProduto=aleatorio.choice(lista_produtos),
+            aporte=valor(5000, 50000), dataDaContratacao=hoje - timedelta(days=aleatorio.randint(0, 3650)),
+        )
+        for _ in range(planos)
+    ]
+    lista_aportes = []
+    for _ in range(aportes):
+        plano = aleatorio.choice(lista_planos)
+        lista_aportes.append(AporteExtra(
+            id=novo_id(), idCliente=plano.idCliente, idPlano=plano, valorAporte=valor(50, 1000)
+        ))
+    lista_resgates = [
+        Resgate(
+            id=novo_id(), idPlano=aleatorio.choice(lista_planos), valorResgate=valor(10, 500),
+            dataDoResgate=hoje - timedelta(days=aleatorio.randint(0, 365)),
+        )
+        for _ in range(resgates)
+    ]
+    movimentacoes = (
+        [Movimentacao.do_aporte_inicial(plano) for plano in lista_planos]
+        + [
+            Movimentacao(idPlano=aporte.idPlano, tipo=Movimentacao.OpcoesTipo.APORTE_EXTRA,
+                         valor=aporte.valorAporte, data=hoje)
+            for aporte in lista_aportes
+        ]
+        + [
+            Movimentacao(idPlano=resgate.idPlano, tipo=Movimentacao.OpcoesTipo.RESGATE,
+                         valor=-resgate.valorResgate, data=resgate.dataDoResgate)
+            for resgate in lista_resgates
+        ]
+    )
+
+    with transaction.atomic():
+        for modelo, objetos in [
+            (Produto, lista_produtos), (Cliente, lista_clientes), (ContratacaoPlano, lista_planos),
+            (AporteExtra, lista_aportes), (Resgate, lista_resgates), (Movimentacao, movimentacoes),
+        ]:
+            modelo.objects.bulk_create(objetos, batch_size=lote)
+
+    return {
+        'produtos': len(lista_produtos), 'clientes': len(lista_clientes), 'planos': len(lista_planos),
+        'aportes': len(lista_aportes), 'resgates': len(lista_resgates),
+    }
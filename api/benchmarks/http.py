@@ -0,0 +1,36 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _requisitar(url: str) -> tuple:
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - inicio, ok
+
+
+def medir_url(url: str, requisicoes: int, concorrencia: int) -> dict:
+    """ Dispara as requisições com `concorrencia` clientes simultâneos e mede vazão e latências """
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        inicio = time.perf_counter()
+        resultados = list(executor.map(_requisitar, [url] * requisicoes))
+        total = time.perf_counter() - inicio
+
+    tempos = [tempo for tempo, _ in resultados]
+    percentis = statistics.quantiles(tempos, n=100, method='inclusive')
+    return {
+        'url': url,
+        'concorrencia': concorrencia,
+        'requisicoes': requisicoes,
+        'erros': sum(1 for _, ok in resultados if not ok),
+        'req_s': requisicoes / total,
+        'p50_ms': percentis[49] * 1000,
+        'p95_ms': percentis[94] * 1000,
+    }
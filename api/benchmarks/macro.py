@@ -0,0 +1,74 @@
+import json
+from datetime import date
+
+from django.test import Client
+from django.urls import reverse
+
+from api.benchmarks.medicao import medir
+from api.benchmarks.resgates import _criar_planos
+from api.models import AporteExtra, ContratacaoPlano, Resgate
+from api.urls import router
+
+
+def executar(repeticoes: int = 200) -> list:
+    """
+    Mede as leituras (list e retrieve) de cada rota registrada no router e as escritas que movimentam
+    dinheiro (contratação, aporte extra e resgate) através do test client
+    """
+    app = Client()
+    resultados = []
+    for _, viewset, basename in router.registry:
+        if getattr(viewset, 'queryset', None) is None:
+            continue
+        url = reverse(f'{basename}-list')
+        resultados.append(medir(f'GET {url}', lambda: _get(app, url), repeticoes))
+
+        pk = viewset.queryset.model.objects.values_list('pk', flat=True).first()
+        if pk is not None:
+            url_detalhe = reverse(f'{basename}-detail', args=[pk])
+            resultados.append(medir(
+                f'GET {url_detalhe.replace(str(pk), "{id}")}', lambda: _get(app, url_detalhe), repeticoes
+            ))
+    return resultados + _escritas(app, repeticoes)
+
+
+def _escritas(app, repeticoes: int) -> list:
+    """
+    POSTs num produto sem carências e num cliente criados só para o benchmark, apagados no fim
+    junto com tudo o que foi gravado neles
+    """
+    produto, cliente, (plano,) = _criar_planos(1)
+    cenarios = [
+        ('contratacaoplano-list', {
+            'idCliente': str(cliente.id), 'idProduto': str(produto.id), 'aporte': 1,
+            'dataDaContratacao': str(date.today()),
+        }),
+        ('aporteextra-list', {'idCliente': str(cliente.id), 'idPlano': str(plano.id), 'valorAporte': 1}),
+        ('resgate-list', {'idPlano': str(plano.id), 'valorResgate': 1}),
+    ]
+    resultados = []
+    try:
+        for basename, corpo in cenarios:
+            url = reverse(basename)
+            resultados.append(medir(f'POST {url}', lambda url=url, corpo=corpo: _post(app, url, corpo), repeticoes))
+    finally:
+        Resgate.objects.filter(idPlano__idCliente=cliente).delete()
+        AporteExtra.objects.filter(idCliente=cliente).delete()
+        ContratacaoPlano.objects.filter(idCliente=cliente).delete()
+        cliente.delete()
+        produto.delete()
+    return resultados
+
+
+def _get(app, url):
+    response = app.get(url, HTTP_ACCEPT='application/json')
+    if response.status_code != 200:
+        raise AssertionError(f'{url} respondeu {response.status_code}')
+    return response
+
+
+def _post(app, url, corpo):
+    response = app.post(url, data=json.dumps(corpo), content_type='application/json', HTTP_ACCEPT='application/json')
+    if response.status_code != 201:
+        raise AssertionError(f'{url} respondeu {response.status_code}: {response.content[:200]}')
+    return response
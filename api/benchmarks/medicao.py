@@ -0,0 +1,30 @@
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def medir(nome: str, funcao, repeticoes: int = 1000, aquecimento: int = 10) -> dict:
+    """ Executa a função várias vezes e retorna vazão, latências p50/p95 e queries por execução """
+    for _ in range(aquecimento):
+        funcao()
+
+    tempos = []
+    with CaptureQueriesContext(connection) as queries:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            antes = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - antes)
+        total = time.perf_counter() - inicio
+
+    percentis = statistics.quantiles(tempos, n=100, method='inclusive')
+    return {
+        'nome': nome,
+        'repeticoes': repeticoes,
+        'ops_s': repeticoes / total,
+        'p50_ms': percentis[49] * 1000,
+        'p95_ms': percentis[94] * 1000,
+        'queries': len(queries) / repeticoes,
+    }
@@ -0,0 +1,74 @@
+from datetime import date
+
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarks.medicao import medir
+from api.renderers import ORJSONRenderer
+from api.models import Cliente, Produto, ContratacaoPlano, AporteExtra, Resgate
+from api.serializers import (
+    ClienteSerializer,
+    ProdutoSerializer,
+    ContratacaoPlanoSerializer,
+    AporteExtraSerializer,
+    ResgateSerializer,
+    conversores_de_leitura,
+    serializar_linhas,
+)
+
+SERIALIZERS = [
+    (Cliente, ClienteSerializer),
+    (Produto, ProdutoSerializer),
+    (ContratacaoPlano, ContratacaoPlanoSerializer),
+    (AporteExtra, AporteExtraSerializer),
+    (Resgate, ResgateSerializer),
+]
+
+
+def executar(repeticoes: int = 10000) -> list:
+    """
+    Mede os métodos de regra dos models e cada ModelSerializer, uma instância e uma página de 100,
+    contra a leitura rápida por values() e o JSONRenderer contra o ORJSONRenderer na mesma página
+    """
+    resultados = []
+    hoje = date.today()
+
+    cliente = Cliente.objects.first()
+    if cliente:
+        resultados.append(medir('Cliente.get_idade', lambda: cliente.get_idade(hoje), repeticoes))
+
+    produto = Produto.objects.first()
+    if produto:
+        regras = [
+            ('venda_expirada', lambda: produto.venda_expirada(data_contratacao=hoje)),
+            ('aporte_insuficente', lambda: produto.aporte_insuficente(valor_aporte=1000)),
+            ('aporte_extra_insuficiente', lambda: produto.aporte_extra_insuficiente(valor_aporte_extra=100)),
+            ('idade_insuficiente', lambda: produto.idade_insuficiente(idade_cliente=30)),
+            ('idade_superior', lambda: produto.idade_superior(idade_cliente=30)),
+        ]
+        for nome, funcao in regras:
+            resultados.append(medir(f'Produto.{nome}', funcao, repeticoes))
+
+    for modelo, serializer in SERIALIZERS:
+        instancias = list(modelo.objects.all()[:100])
+        if not instancias:
+            continue
+        resultados.append(medir(
+            f'{serializer.__name__}', lambda: serializer(instancias[0]).data, repeticoes // 10
+        ))
+        resultados.append(medir(
+            f'{serializer.__name__}(many=True, 100)', lambda: serializer(instancias, many=True).data,
+            max(repeticoes // 1000, 10)
+        ))
+        campos = conversores_de_leitura(serializer())
+        linhas = list(modelo.objects.values(*(coluna for _, coluna, _ in campos))[:100])
+        resultados.append(medir(
+            f'{serializer.__name__} leitura rápida (100)', lambda: serializar_linhas(campos, linhas),
+            max(repeticoes // 1000, 10)
+        ))
+        pagina = serializar_linhas(campos, linhas)
+        for renderer in (JSONRenderer, ORJSONRenderer):
+            resultados.append(medir(
+                f'{renderer.__name__} {serializer.__name__} (100)', lambda: renderer().render(pagina),
+                max(repeticoes // 1000, 10)
+            ))
+    return resultados
@@ -0,0 +1,79 @@
+import threading
+import time
+import uuid
+from datetime import date
+
+from django.db import connection
+
+from api.models import Cliente, Produto, ContratacaoPlano, Resgate
+
+
+def _criar_planos(quantidade: int):
+    """ Cria um produto sem carências e um plano por worker, todos no mesmo produto """
+    sufixo = uuid.uuid4().hex[:8]
+    produto = Produto.objects.create(
+        nome=f'Benchmark {sufixo}', susep='00000.000000/0000-00',
+        expiracaoDeVenda=date(2999, 12, 31), valorMinimoAporteInicial=1,
+        valorMinimoAporteExtra=1, idadeDeEntrada=0, idadeDeSaida=200,
+        carenciaInicialDeResgate=0, carenciaEntreResgates=0
+    )
+    cliente = Cliente.objects.create(
+        cpf=str(uuid.uuid4().int)[:11], nome=f'Benchmark {sufixo}',
+        email=f'benchmark-{sufixo}@example.com', dataDeNascimento=date(1990, 1, 1),
+        sexo='M', rendaMensal=1
+    )
+    planos = [
+        ContratacaoPlano.objects.create(
+            idCliente=cliente, idProduto=produto, aporte=10 ** 9, dataDaContratacao=date.today()
+        )
+        for _ in range(quantidade)
+    ]
+    return produto, cliente, planos
+
+
+def _remover(produto, cliente, planos):
+    Resgate.objects.filter(idPlano__in=planos).delete()
+    ContratacaoPlano.objects.filter(pk__in=[plano.pk for plano in planos]).delete()
+    cliente.delete()
+    produto.delete()
+
+
+def medir_vazao(workers: int, resgates_por_worker: int) -> dict:
+    """
+    Dispara resgates em paralelo, cada worker resgatando do seu próprio plano de um mesmo produto.
+    Retorna o total de resgates, o tempo decorrido e a vazão em resgates por segundo
+    """
+    produto, cliente, planos = _criar_planos(workers)
+    barreira = threading.Barrier(workers + 1)
+    erros = []
+
+    def resgatar(plano):
+        try:
+            barreira.wait()
+            for _ in range(resgates_por_worker):
+                Resgate.objects.create(idPlano=plano, valorResgate=1)
+        except Exception as exc:  # noqa
+            erros.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=resgatar, args=(plano,)) for plano in planos]
+    for thread in threads:
+        thread.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    decorrido = time.perf_counter() - inicio
+
+    _remover(produto, cliente, planos)
+    if erros:
+        raise erros[0]
+
+    total = workers * resgates_por_worker
+    return {
+        'workers': workers,
+        'resgates': total,
+        'segundos': decorrido,
+        'resgates_por_segundo': total / decorrido,
+    }
@@ -0,0 +1,61 @@
+import time
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from api.regras import RegrasProduto
+
+CHAVE_VERSAO_PRODUTOS = 'api:produtos:versao'
+
+# snapshots das regras por produto, um dicionário por processo (worker)
+_regras = {}
+_versao = {'valor': None, 'verificada_em': 0.0}
+
+
+def _verifica_versao():
+    """
+    Descarta os snapshots locais quando outro worker alterou algum produto.
+    A versão compartilhada é consultada no máximo uma vez a cada CACHE_PRODUTOS_INTERVALO segundos
+    """
+    agora = time.monotonic()
+    if agora - _versao['verificada_em'] < settings.CACHE_PRODUTOS_INTERVALO:
+        return
+    versao = cache.get(CHAVE_VERSAO_PRODUTOS)
+    if versao != _versao['valor']:
+        _regras.clear()
+        _versao['valor'] = versao
+    _versao['verificada_em'] = agora
+
+
+def regras_do_produto(produto_id) -> RegrasProduto:
+    """ Retorna as regras do produto, indo ao banco apenas quando não estiverem em cache """
+    _verifica_versao()
+    regras = _regras.get(produto_id)
+    if regras is None:
+        Produto = apps.get_model('api', 'Produto')
+        valores = Produto.objects.values(*RegrasProduto.campos()).get(pk=produto_id)
+        regras = RegrasProduto(**valores)
+        _regras[produto_id] = regras
+    return regras
+
+
+def versao_produtos() -> str:
+    """
+    Versão atual do catálogo de produtos, serve de ETag para a listagem. Vem do próprio banco, e não do
+    cache, para ser a mesma em todos os workers mesmo com o LocMemCache de cada processo: muda quando um
+    produto é criado, alterado (atualizadoEm) ou apagado (quantidade)
+    """
+    Produto = apps.get_model('api', 'Produto')
+    versao = Produto.objects.aggregate(quantidade=Count('pk'), ultima=Max('atualizadoEm'))
+    return f"{versao['quantidade']}:{versao['ultima']}"
+
+
+def invalidar_produtos():
+    """ Limpa o cache deste worker e publica uma nova versão para que os demais também o limpem """
+    versao = uuid.uuid4().hex
+    cache.set(CHAVE_VERSAO_PRODUTOS, versao, timeout=None)
+    _regras.clear()
+    _versao['valor'] = versao
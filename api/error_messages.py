@@ -5,3 +5,15 @@ APORTE_EXTRA_MINIMO = 'O aporte extra mínimo é %.2f!'
 APORTE_INSUFICIENTE = 'O valor máximo para resgate é %.2f'
 CARENCIA_INICIAL = 'O prazo mínimo para resgate é {}!'
 CARENCIA_ENTRE_RESGATES = 'O prazo mínimo entre resgates é {}!'
+CLIENTE_INEXISTENTE = 'Cliente não encontrado!'
+PRODUTO_INEXISTENTE = 'Produto não encontrado!'
+CPF_DUPLICADO = 'Esse CPF já existe.'
+EMAIL_DUPLICADO = 'Esse e-mail já existe.'
+IDEMPOTENCIA_EM_PROCESSAMENTO = 'Uma requisição com essa Idempotency-Key ainda está em processamento.'
+IDEMPOTENCIA_REUTILIZADA = 'Essa Idempotency-Key já foi usada com outro conteúdo.'
+IDEMPOTENCIA_CHAVE_LONGA = 'A Idempotency-Key pode ter no máximo {} caracteres.'
+CAMPOS_INEXISTENTES = 'Campos inexistentes: {}.'
+PLANO_INEXISTENTE = 'Plano não encontrado!'
+INTERVALO_INVALIDO = 'O início precisa ser anterior ou igual ao fim.'
+INTERVALO_LONGO = 'O relatório por dia aceita no máximo {} dias.'
+JSON_INVALIDO = 'A linha não é um JSON válido: {}.'
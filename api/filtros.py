@@ -0,0 +1,28 @@
+from django.core.exceptions import ValidationError
+from rest_framework import exceptions
+from rest_framework.filters import BaseFilterBackend
+
+
+class FiltrosSimples(BaseFilterBackend):
+    """
+    Filtros de igualdade e de intervalo nas listagens: cada lookup em `filtros` da view, como
+    'idCliente' ou 'dataDaContratacao__gte', é aceito com o mesmo nome na query string.
+    Os filtros seguem os índices dos modelos, não use lookups que não tenham um índice por trás
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        condicoes = {
+            lookup: request.query_params[lookup]
+            for lookup in getattr(view, 'filtros', ())
+            if lookup in request.query_params
+        }
+        try:
+            return queryset.filter(**condicoes)
+        except ValidationError as exc:
+            raise exceptions.ValidationError({'filtros': exc.messages})
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': lookup, 'required': False, 'in': 'query', 'schema': {'type': 'string'}}
+            for lookup in getattr(view, 'filtros', ())
+        ]
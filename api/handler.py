@@ -3,11 +3,14 @@ from rest_framework import status
 from rest_framework.response import Response
 from django.core.exceptions import ValidationError
 
+from api.metricas import REJEICOES
+
 
 def validation_error_handler(exc, context):
     response = exception_handler(exc, context)
 
     if isinstance(exc, ValidationError):
+        REJEICOES.labels(erro=getattr(exc, 'code', None) or 'DESCONHECIDO').inc()
         err_data = {
             'error': exc.args[0]
         }
@@ -0,0 +1,85 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.error_messages import IDEMPOTENCIA_CHAVE_LONGA, IDEMPOTENCIA_EM_PROCESSAMENTO, IDEMPOTENCIA_REUTILIZADA
+from api.models import ChaveIdempotencia
+
+CABECALHO = 'Idempotency-Key'
+
+
+class IdempotenciaMixin:
+    """
+    Honra o cabeçalho Idempotency-Key no create: a reserva da chave na constraint única (chave, rota),
+    a escrita e a resposta gravada ficam numa só transação, então nunca sobra uma chave sem resposta
+    nem uma escrita sem chave. Uma repetição concorrente espera no índice único até a primeira
+    terminar e devolve a resposta dela; as repetições seguintes custam uma única consulta.
+    Chaves mais antigas que IDEMPOTENCIA_TTL_HORAS valem como novas mesmo antes do limpar_idempotencia
+    """
+
+    def create(self, request, *args, **kwargs):
+        chave = request.headers.get(CABECALHO)
+        if not chave:
+            return super().create(request, *args, **kwargs)
+        tamanho_maximo = ChaveIdempotencia._meta.get_field('chave').max_length
+        if len(chave) > tamanho_maximo:
+            return Response(
+                {'error': IDEMPOTENCIA_CHAVE_LONGA.format(tamanho_maximo)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rota = f'{self.basename}-create'
+        hash_requisicao = hashlib.sha256(request.body).hexdigest()
+        validade = timezone.now() - timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+        registro = ChaveIdempotencia.objects.filter(chave=chave, rota=rota).first()
+        if registro is not None and (registro.statusCode is None or registro.criadoEm < validade):
+            # chaves sem resposta nunca chegam a ser confirmadas aqui; uma que exista é de uma requisição
+            # interrompida entre a reserva e a resposta. Ela e as expiradas, que a limpeza ainda não
+            # apagou, dão lugar a uma nova reserva
+            ChaveIdempotencia.objects.filter(
+                Q(statusCode__isnull=True) | Q(criadoEm__lt=validade), pk=registro.pk
+            ).delete()
+            registro = None
+        if registro is not None:
+            return self.repetir_resposta(registro, hash_requisicao)
+
+        # um erro em qualquer passo desfaz tudo, e o cliente pode corrigir e tentar de novo com a mesma chave
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    registro = ChaveIdempotencia.objects.create(
+                        chave=chave, rota=rota, hashRequisicao=hash_requisicao
+                    )
+            except IntegrityError:
+                # o insert esperou a requisição que reservou a chave antes desta terminar
+                registro = ChaveIdempotencia.objects.filter(chave=chave, rota=rota, criadoEm__gte=validade).first()
+                return self.repetir_resposta(registro, hash_requisicao)
+
+            response = super().create(request, *args, **kwargs)
+            registro.statusCode = response.status_code
+            registro.resposta = response.data
+            registro.save(update_fields=['statusCode', 'resposta'])
+        return response
+
+    @staticmethod
+    def repetir_resposta(registro, hash_requisicao):
+        if registro is None:
+            # a primeira requisição falhou e liberou a chave enquanto esta era processada
+            return Response({'error': IDEMPOTENCIA_EM_PROCESSAMENTO}, status=status.HTTP_409_CONFLICT)
+        if registro.hashRequisicao != hash_requisicao:
+            return Response({'error': IDEMPOTENCIA_REUTILIZADA}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if registro.statusCode is None:
+            return Response({'error': IDEMPOTENCIA_EM_PROCESSAMENTO}, status=status.HTTP_409_CONFLICT)
+        return Response(registro.resposta, status=registro.statusCode, headers={'Idempotent-Replayed': 'true'})
+
+
+def limpar_chaves_expiradas(ttl: timedelta = None) -> int:
+    """ Apaga as chaves mais antigas que o TTL, a partir daí a mesma chave vale como uma requisição nova """
+    ttl = ttl or timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+    apagadas, _ = ChaveIdempotencia.objects.filter(criadoEm__lt=timezone.now() - ttl).delete()
+    return apagadas
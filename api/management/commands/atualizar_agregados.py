@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.relatorios import atualizar_agregados
+
+
+class Command(BaseCommand):
+    help = "Soma aos agregados diários dos relatórios as movimentações gravadas depois da marca d'água"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--atraso', type=int, default=60,
+            help='Ignora movimentações gravadas há menos desses segundos'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Agregados gravados por vez')
+        parser.add_argument(
+            '--reconstruir', action='store_true',
+            help='Apaga os agregados e refaz tudo a partir do extrato inteiro'
+        )
+
+    def handle(self, *args, **options):
+        atualizados = atualizar_agregados(
+            atraso=options['atraso'], lote=options['lote'], reconstruir=options['reconstruir']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{atualizados} agregados atualizados'))
@@ -0,0 +1,62 @@
+import json
+import platform
+import subprocess
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.benchmarks import micro, macro
+
+
+class Command(BaseCommand):
+    help = 'Roda os micro e macro benchmarks e grava os resultados em JSON para comparar entre commits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--saida', default='benchmark.json', help='Arquivo JSON com os resultados')
+        parser.add_argument('--somente', choices=['micro', 'macro'], help='Roda apenas um dos grupos')
+        parser.add_argument('--repeticoes', type=int, default=200, help='Requisições por endpoint no macro')
+        parser.add_argument('--comparar', help='JSON de uma execução anterior para mostrar a variação')
+
+    def handle(self, *args, **options):
+        resultados = []
+        if options['somente'] in (None, 'micro'):
+            resultados += micro.executar()
+        if options['somente'] in (None, 'macro'):
+            resultados += macro.executar(options['repeticoes'])
+
+        relatorio = {
+            'commit': self.commit_atual(),
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'banco': connection.vendor,
+            'resultados': resultados,
+        }
+        with open(options['saida'], 'w') as saida:
+            json.dump(relatorio, saida, indent=2)
+
+        anteriores = {}
+        if options['comparar']:
+            with open(options['comparar']) as arquivo:
+                anteriores = {resultado['nome']: resultado for resultado in json.load(arquivo)['resultados']}
+
+        self.stdout.write(f'{"benchmark":<50} {"ops/s":>10} {"p50 ms":>8} {"p95 ms":>8} {"queries":>7}')
+        for resultado in resultados:
+            linha = (
+                f'{resultado["nome"]:<50} {resultado["ops_s"]:>10.1f} {resultado["p50_ms"]:>8.3f} '
+                f'{resultado["p95_ms"]:>8.3f} {resultado["queries"]:>7.1f}'
+            )
+            anterior = anteriores.get(resultado['nome'])
+            if anterior:
+                linha += f' {(resultado["ops_s"] / anterior["ops_s"] - 1) * 100:>+7.1f}%'
+            self.stdout.write(linha)
+        self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {options["saida"]}'))
+
+    @staticmethod
+    def commit_atual():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
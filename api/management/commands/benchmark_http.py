@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmarks.http import medir_url
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão de URLs sob alta concorrência, ex.: a leitura pelo WSGI e pelo ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs completas, ex.: http://web:8002/api/clientes/')
+        parser.add_argument('--requisicoes', type=int, default=2000)
+        parser.add_argument('--concorrencia', default='16,64,256', help='Clientes simultâneos, separados por vírgula')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"url":<50} {"clientes":>8} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"erros":>6}')
+        for concorrencia in [int(valor) for valor in options['concorrencia'].split(',')]:
+            for url in options['urls']:
+                resultado = medir_url(url, options['requisicoes'], concorrencia)
+                self.stdout.write(
+                    f'{url:<50} {concorrencia:>8} {resultado["req_s"]:>9.1f} {resultado["p50_ms"]:>8.1f} '
+                    f'{resultado["p95_ms"]:>8.1f} {resultado["erros"]:>6}'
+                )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmarks.resgates import medir_vazao
+
+
+class Command(BaseCommand):
+    help = 'Mede a vazão de resgates em planos distintos de um mesmo produto com número crescente de workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', default='1,2,4,8,16',
+            help='Quantidades de workers simultâneos separadas por vírgula'
+        )
+        parser.add_argument('--resgates', type=int, default=200, help='Resgates por worker')
+
+    def handle(self, *args, **options):
+        workers = [int(valor) for valor in options['workers'].split(',')]
+        base = None
+        self.stdout.write(f'{"workers":>8} {"resgates/s":>12} {"speedup":>8}')
+        for quantidade in workers:
+            resultado = medir_vazao(quantidade, options['resgates'])
+            base = base or resultado['resgates_por_segundo']
+            self.stdout.write(
+                f'{quantidade:>8} {resultado["resgates_por_segundo"]:>12.1f} '
+                f'{resultado["resgates_por_segundo"] / base:>8.2f}'
+            )
@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from api.error_messages import CPF_DUPLICADO, EMAIL_DUPLICADO, JSON_INVALIDO
+from api.models import Cliente
+from api.serializers import ClienteImportacaoSerializer
+
+
+class Command(BaseCommand):
+    help = 'Importa clientes de um arquivo CSV ou NDJSON em lotes, gravando as linhas rejeitadas à parte'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo com as colunas do cliente (cpf, nome, email, ...)')
+        parser.add_argument('--formato', choices=['csv', 'ndjson'], help='Padrão: extensão do arquivo')
+        parser.add_argument('--lote', type=int, default=5000, help='Linhas validadas e gravadas por vez')
+        parser.add_argument(
+            '--rejeitados', help='Arquivo NDJSON com as linhas rejeitadas, padrão: <arquivo>.rejeitados.ndjson'
+        )
+        parser.add_argument(
+            '--sem-copy', action='store_true', help='Usa bulk_create mesmo quando o banco suporta COPY'
+        )
+
+    def handle(self, *args, **options):
+        arquivo = Path(options['arquivo'])
+        if not arquivo.exists():
+            raise CommandError(f'Arquivo {arquivo} não encontrado')
+        formato = options['formato'] or arquivo.suffix.lstrip('.').lower()
+        if formato not in ('csv', 'ndjson'):
+            raise CommandError('Informe --formato csv ou ndjson')
+        rejeitados = Path(options['rejeitados'] or f'{arquivo}.rejeitados.ndjson')
+        self.usar_copy = connection.vendor == 'postgresql' and not options['sem_copy']
+        self.serializer = ClienteImportacaoSerializer()
+        self.totais = {'lidas': 0, 'importadas': 0, 'rejeitadas': 0}
+        self.inicio = time.perf_counter()
+
+        with arquivo.open(encoding='utf-8', newline='') as entrada, rejeitados.open('w', encoding='utf-8') as saida:
+            self.saida_rejeitados = saida
+            linhas = enumerate(csv.DictReader(entrada), start=1) if formato == 'csv' else self.ler_ndjson(entrada)
+            lote = []
+            for numero, linha in linhas:
+                lote.append((numero, linha))
+                if len(lote) >= options['lote']:
+                    self.importar_lote(lote)
+                    lote = []
+            if lote:
+                self.importar_lote(lote)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.totais["importadas"]} clientes importados, {self.totais["rejeitadas"]} rejeitados '
+            f'em {time.perf_counter() - self.inicio:.1f}s'
+        ))
+        if self.totais['rejeitadas']:
+            self.stdout.write(f'Linhas rejeitadas em {rejeitados}')
+
+    def ler_ndjson(self, entrada):
+        """ Linhas do NDJSON já decodificadas, numeradas como no arquivo. Linhas em branco são puladas """
+        for numero, texto in enumerate(entrada, start=1):
+            if not texto.strip():
+                continue
+            try:
+                linha = json.loads(texto)
+            except json.JSONDecodeError as exc:
+                # uma linha truncada ou corrompida não interrompe o resto da importação
+                self.totais['lidas'] += 1
+                erros = {api_settings.NON_FIELD_ERRORS_KEY: [JSON_INVALIDO.format(exc)]}
+                self.rejeitar(numero, texto.rstrip('\r\n'), erros)
+                continue
+            yield numero, linha
+
+    def rejeitar(self, numero, linha, erros):
+        self.saida_rejeitados.write(
+            json.dumps({'linha': numero, 'dados': linha, 'erros': erros}, ensure_ascii=False) + '\n'
+        )
+        self.totais['rejeitadas'] += 1
+
+    def importar_lote(self, lote):
+        validos = []
+        cpfs, emails = set(), set()
+        for numero, linha in lote:
+            try:
+                dados = self.serializer.to_internal_value(linha)
+            except ValidationError as exc:
+                self.rejeitar(numero, linha, exc.detail)
+                continue
+            # duplicados dentro do próprio lote
+            if dados['cpf'] in cpfs:
+                self.rejeitar(numero, linha, {'cpf': [CPF_DUPLICADO]})
+                continue
+            if dados['email'] in emails:
+                self.rejeitar(numero, linha, {'email': [EMAIL_DUPLICADO]})
+                continue
+            cpfs.add(dados['cpf'])
+            emails.add(dados['email'])
+            validos.append((numero, linha, dados))
+
+        # duplicados já gravados, verificados pelos índices únicos em uma query por coluna
+        cpfs_existentes = set(Cliente.objects.filter(cpf__in=cpfs).values_list('cpf', flat=True))
+        emails_existentes = set(Cliente.objects.filter(email__in=emails).values_list('email', flat=True))
+        clientes = []
+        for numero, linha, dados in validos:
+            if dados['cpf'] in cpfs_existentes:
+                self.rejeitar(numero, linha, {'cpf': [CPF_DUPLICADO]})
+            elif dados['email'] in emails_existentes:
+                self.rejeitar(numero, linha, {'email': [EMAIL_DUPLICADO]})
+            else:
+                clientes.append(Cliente(**dados))
+
+        with transaction.atomic():
+            if clientes:
+                if self.usar_copy:
+                    self.copiar(clientes)
+                else:
+                    Cliente.objects.bulk_create(clientes)
+
+        self.totais['lidas'] += len(lote)
+        self.totais['importadas'] += len(clientes)
+        decorrido = time.perf_counter() - self.inicio
+        self.stdout.write(
+            f'{self.totais["lidas"]} linhas lidas, {self.totais["importadas"]} importadas, '
+            f'{self.totais["rejeitadas"]} rejeitadas ({self.totais["lidas"] / decorrido:.0f} linhas/s)'
+        )
+
+    def copiar(self, clientes):
+        """ Grava o lote com COPY ... FROM STDIN do PostgreSQL """
+        campos = Cliente._meta.concrete_fields
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for cliente in clientes:
+            writer.writerow([campo.pre_save(cliente, True) for campo in campos])
+        buffer.seek(0)
+        colunas = ', '.join(connection.ops.quote_name(campo.column) for campo in campos)
+        tabela = connection.ops.quote_name(Cliente._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {tabela} ({colunas}) FROM STDIN WITH (FORMAT csv)', buffer)
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.idempotencia import limpar_chaves_expiradas
+
+
+class Command(BaseCommand):
+    help = 'Apaga as chaves de idempotência gravadas há mais tempo que o TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl', type=float, default=settings.IDEMPOTENCIA_TTL_HORAS,
+            help='Idade máxima das chaves, em horas'
+        )
+
+    def handle(self, *args, **options):
+        apagadas = limpar_chaves_expiradas(timedelta(hours=options['ttl']))
+        self.stdout.write(self.style.SUCCESS(f'{apagadas} chaves apagadas'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmarks.dados import popular
+
+
+class Command(BaseCommand):
+    help = 'Gera uma massa de dados reproduzível para os benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=1000)
+        parser.add_argument('--produtos', type=int, default=20)
+        parser.add_argument('--planos', type=int, default=2000)
+        parser.add_argument('--aportes', type=int, default=5000)
+        parser.add_argument('--resgates', type=int, default=1000)
+        parser.add_argument('--semente', type=int, default=42, help='Mesma semente, mesmos dados')
+
+    def handle(self, *args, **options):
+        totais = popular(
+            clientes=options['clientes'], produtos=options['produtos'], planos=options['planos'],
+            aportes=options['aportes'], resgates=options['resgates'], semente=options['semente'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{quantidade} {nome}' for nome, quantidade in totais.items()) + ' criados'
+        ))
@@ -0,0 +1,33 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.projecao import projetar_saldos
+
+
+class Command(BaseCommand):
+    help = 'Projeta o saldo de todos os planos até a idade de saída do produto para cada taxa de juros anual'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taxas', required=True, help='Taxas anuais separadas por vírgula, ex.: 0.06,0.1')
+        parser.add_argument(
+            '--aporte-mensal', type=float, help='Aporte mensal, padrão: aporte extra mínimo do produto'
+        )
+        parser.add_argument('--saida', default='projecoes.csv', help='Arquivo CSV de saída')
+
+    def handle(self, *args, **options):
+        try:
+            taxas = [float(taxa) for taxa in options['taxas'].split(',')]
+        except ValueError:
+            raise CommandError('Informe as taxas como números separados por vírgula')
+        projecao = projetar_saldos(taxas, aporte_mensal=options['aporte_mensal'])
+
+        with open(options['saida'], 'w', newline='') as saida:
+            writer = csv.writer(saida)
+            writer.writerow(['idPlano', 'mesesAteSaida', 'saldoAtual'] + [f'taxa_{taxa}' for taxa in taxas])
+            for plano, meses, saldo, projecoes in zip(
+                projecao.planos, projecao.meses, projecao.saldos, projecao.projecoes
+            ):
+                writer.writerow([plano, meses, f'{saldo:.2f}'] + [f'{valor:.2f}' for valor in projecoes])
+
+        self.stdout.write(self.style.SUCCESS(f'{len(projecao.planos)} planos projetados em {options["saida"]}'))
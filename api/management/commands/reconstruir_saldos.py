@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.saldos import reconstruir_saldos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula todos os saldos compactados dos planos a partir do extrato'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--atraso', type=int, default=60,
+            help='Ignora movimentações gravadas há menos desses segundos'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Saldos gravados por vez')
+
+    def handle(self, *args, **options):
+        reconstruidos = reconstruir_saldos(atraso=options['atraso'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{reconstruidos} saldos reconstruídos'))
@@ -0,0 +1,56 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.tarefas import loop_do_worker, processar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas em segundo plano enfileiradas na tabela de tarefas'
+    # segundos entre as verificações dos processos filhos
+    intervalo_de_verificacao = 1.0
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=settings.TAREFAS_PROCESSOS)
+        parser.add_argument(
+            '--intervalo', type=float, default=settings.TAREFAS_INTERVALO,
+            help='Segundos de espera entre consultas quando a fila está vazia'
+        )
+        parser.add_argument('--uma-vez', action='store_true', help='Esvazia a fila neste processo e termina')
+
+    def handle(self, *args, **options):
+        if options['uma_vez']:
+            executadas = processar_pendentes()
+            self.stdout.write(self.style.SUCCESS(f'{executadas} tarefas executadas'))
+            return
+
+        # cada processo abre a sua própria conexão, nenhuma pode ser herdada do pai
+        connections.close_all()
+        processos = [self.iniciar(options['intervalo']) for _ in range(options['processos'])]
+        self.stdout.write(f'{len(processos)} processos aguardando tarefas')
+
+        encerrando = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: encerrando.set())
+        signal.signal(signal.SIGINT, lambda *_: encerrando.set())
+        # um processo que morre (OOM, erro fatal) é substituído, senão a fila pararia com o container de pé
+        while not encerrando.wait(self.intervalo_de_verificacao):
+            for indice, processo in enumerate(processos):
+                if not processo.is_alive():
+                    self.stderr.write(f'Processo {processo.pid} terminou com código {processo.exitcode}, reiniciando')
+                    processos[indice] = self.iniciar(options['intervalo'])
+
+        # cada processo termina a tarefa em andamento antes de sair, ver loop_do_worker
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            processo.join()
+
+    @staticmethod
+    def iniciar(intervalo: float):
+        processo = multiprocessing.Process(target=loop_do_worker, args=(intervalo,), daemon=True)
+        processo.start()
+        return processo
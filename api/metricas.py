@@ -0,0 +1,37 @@
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+# o gunicorn recria o diretório no on_starting, mas runserver, worker, testes e o ASGI não passam por ele
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+REQUISICOES = Counter(
+    'api_requisicoes_total', 'Requisições atendidas pelos ViewSets',
+    ['basename', 'action', 'method', 'status'],
+)
+LATENCIA = Histogram(
+    'api_requisicao_duracao_segundos', 'Latência das requisições por ViewSet e ação',
+    ['basename', 'action'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REJEICOES = Counter(
+    'api_regras_rejeitadas_total', 'Operações rejeitadas pelas regras de negócio, por tipo de erro',
+    ['erro'],
+)
+
+
+def metricas(request):
+    """
+    Métricas no formato texto do Prometheus. Com PROMETHEUS_MULTIPROC_DIR definido cada worker grava
+    as suas em arquivos nesse diretório e a resposta soma as de todos eles
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return HttpResponse(generate_latest(registro), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,165 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from api.metricas import LATENCIA, REQUISICOES
+from api.replicas import leituras_na_replica
+
+logger = logging.getLogger(__name__)
+
+# listas de parâmetros de tamanho variável, ex.: IN (%s, %s, %s)
+_PARAMETROS = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+class ColetorDeQueries:
+    """ execute_wrapper que acumula quantidade, tempo e formato das queries executadas """
+
+    def __init__(self):
+        self.quantidade = 0
+        self.tempo = 0.0
+        self.formatos = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.quantidade += 1
+            self.formatos[_PARAMETROS.sub('%s', sql)] += 1
+
+    def repetidas(self, limite: int) -> list:
+        return [(sql, vezes) for sql, vezes in self.formatos.most_common() if vezes >= limite]
+
+
+class InstrumentacaoMiddleware:
+    """
+    Mede queries, tempo de banco e tempo total de cada requisição e os publica no cabeçalho
+    Server-Timing, apontando queries repetidas (N+1). Desligado (INSTRUMENTACAO=False) o
+    middleware nem é carregado
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTACAO:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limite = settings.INSTRUMENTACAO_LIMITE_REPETICOES
+
+    def __call__(self, request):
+        coletor = ColetorDeQueries()
+        inicio = time.perf_counter()
+        with ExitStack() as stack:
+            for conexao in connections.all():
+                stack.enter_context(conexao.execute_wrapper(coletor))
+            response = self.get_response(request)
+        total = time.perf_counter() - inicio
+
+        metricas = [
+            f'db;dur={coletor.tempo * 1000:.1f};desc="{coletor.quantidade} queries"',
+            f'app;dur={(total - coletor.tempo) * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        for sql, vezes in coletor.repetidas(self.limite):
+            logger.warning('Possível N+1 em %s %s: %d vezes %s', request.method, request.path, vezes, sql)
+            descricao = sql[:80].replace('"', "'").replace('\\', '')
+            metricas.append(f'nplus1;desc="{vezes}x {descricao}"')
+        response['Server-Timing'] = ', '.join(metricas)
+        return response
+
+
+class MetricasMiddleware:
+    """ Conta requisições e mede a latência de cada ação dos ViewSets, rotuladas pelo basename do router """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        self.registrar(request, response, inicio)
+        return response
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        response = await self.get_response(request)
+        self.registrar(request, response, inicio)
+        return response
+
+    @staticmethod
+    def registrar(request, response, inicio):
+        rotulos = getattr(request, '_metricas_rotulos', None)
+        if rotulos:
+            LATENCIA.labels(*rotulos).observe(time.perf_counter() - inicio)
+            REQUISICOES.labels(*rotulos, request.method, response.status_code).inc()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        basename = getattr(view_func, 'initkwargs', {}).get('basename')
+        acoes = getattr(view_func, 'actions', None)
+        if basename and acoes:
+            request._metricas_rotulos = (basename, acoes.get(request.method.lower(), request.method.lower()))
+
+
+class ReplicaMiddleware:
+    """
+    Leituras da API (GET, HEAD, OPTIONS) vão para as réplicas. Depois de uma escrita bem-sucedida o
+    cliente recebe um cookie que o mantém no primário por REPLICA_FIXACAO_SEGUNDOS, para que ele
+    sempre veja o que acabou de gravar mesmo com atraso na replicação.
+
+    A garantia vale só para quem devolve o cookie. Clientes que não guardam cookies (integrações
+    servidor a servidor, jobs) recebem o mesmo prazo no cabeçalho X-Fixar-Primario da resposta e
+    devem enviar X-Fixar-Primario nas leituras seguintes; sem um dos dois a leitura vai para a
+    réplica e pode não ver a escrita. Escritas de um cliente não fixam leituras de outro
+    """
+    sync_capable = True
+    async_capable = True
+    cookie = 'fixar_primario'
+    cabecalho = 'X-Fixar-Primario'
+    metodos_de_leitura = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with leituras_na_replica(self.le_da_replica(request)):
+            response = self.get_response(request)
+        return self.fixar_no_primario(request, response)
+
+    async def __acall__(self, request):
+        with leituras_na_replica(self.le_da_replica(request)):
+            response = await self.get_response(request)
+        return self.fixar_no_primario(request, response)
+
+    def le_da_replica(self, request) -> bool:
+        return (
+            request.method in self.metodos_de_leitura
+            and request.path.startswith('/api/')
+            and self.cookie not in request.COOKIES
+            and not request.headers.get(self.cabecalho)
+        )
+
+    def fixar_no_primario(self, request, response):
+        if request.method not in self.metodos_de_leitura and response.status_code < 400:
+            response.set_cookie(
+                self.cookie, '1', max_age=settings.REPLICA_FIXACAO_SEGUNDOS, httponly=True, samesite='Lax'
+            )
+            response[self.cabecalho] = str(settings.REPLICA_FIXACAO_SEGUNDOS)
+        return response
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.5 on 2026-10-17 22:58
+
+import datetime
+from django.db import migrations, models
+
+
+def copia_data_ultimo_resgate(apps, schema_editor):
+    """
+    Preserva a carência vigente levando a data do último resgate do produto para os resgates existentes.
+    O esquema anterior só guardava essa data, por produto, então não há de onde tirar a data real de
+    cada resgate: todos os resgates de um produto ficam com a mesma data, a do último, e os de produtos
+    sem data ficam com a da migração. A carência entre resgates de planos desse produto fica contada a
+    partir desse último resgate, como já era antes; relatórios por data de resgate anteriores a esta
+    migração não são confiáveis
+    """
+    Produto = apps.get_model('api', 'Produto')
+    Resgate = apps.get_model('api', 'Resgate')
+    for produto in Produto.objects.exclude(dataUltimoResgate=None).iterator():
+        Resgate.objects.filter(idPlano__idProduto=produto).update(dataDoResgate=produto.dataUltimoResgate)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_produto_dataultimoresgate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resgate',
+            name='dataDoResgate',
+            field=models.DateField(default=datetime.date.today, editable=False),
+        ),
+        migrations.RunPython(copia_data_ultimo_resgate, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='produto',
+            name='dataUltimoResgate',
+        ),
+        migrations.AddIndex(
+            model_name='resgate',
+            index=models.Index(fields=['idPlano', '-dataDoResgate'], name='resgate_plano_data_idx'),
+        ),
+    ]
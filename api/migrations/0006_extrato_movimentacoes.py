@@ -0,0 +1,70 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def popula_extrato(apps, schema_editor):
+    """
+    Gera o extrato dos planos existentes. Até aqui o aporte do plano acumulava os aportes extras
+    e os resgates não eram debitados, o aporte volta a ser só o aporte inicial
+    """
+    from datetime import date
+
+    ContratacaoPlano = apps.get_model('api', 'ContratacaoPlano')
+    AporteExtra = apps.get_model('api', 'AporteExtra')
+    Resgate = apps.get_model('api', 'Resgate')
+    Movimentacao = apps.get_model('api', 'Movimentacao')
+
+    for plano in ContratacaoPlano.objects.iterator():
+        movimentacoes = []
+        aportes_extras = list(AporteExtra.objects.filter(idPlano=plano).values_list('valorAporte', flat=True))
+        plano.aporte -= sum(aportes_extras)
+        plano.save(update_fields=['aporte'])
+        movimentacoes.append(Movimentacao(
+            idPlano=plano, tipo='APORTE_INICIAL', valor=plano.aporte, data=plano.dataDaContratacao
+        ))
+        movimentacoes += [
+            Movimentacao(idPlano=plano, tipo='APORTE_EXTRA', valor=valor, data=date.today())
+            for valor in aportes_extras
+        ]
+        movimentacoes += [
+            Movimentacao(idPlano=plano, tipo='RESGATE', valor=-valor, data=data)
+            for valor, data in Resgate.objects.filter(idPlano=plano).values_list('valorResgate', 'dataDoResgate')
+        ]
+        Movimentacao.objects.bulk_create(movimentacoes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_resgate_dataderesgate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoCompactado',
+            fields=[
+                ('idPlano', models.OneToOneField(db_column='idPlano', on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api.contratacaoplano')),
+                ('saldo', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('ultimaMovimentacao', models.BigIntegerField()),
+                ('atualizadoEm', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Movimentacao',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('APORTE_INICIAL', 'Aporte inicial'), ('APORTE_EXTRA', 'Aporte extra'), ('RESGATE', 'Resgate')], max_length=14)),
+                ('valor', models.DecimalField(decimal_places=2, help_text='Negativo nos resgates', max_digits=12)),
+                ('data', models.DateField()),
+                ('criadoEm', models.DateTimeField(auto_now_add=True)),
+                ('idPlano', models.ForeignKey(db_column='idPlano', on_delete=django.db.models.deletion.CASCADE, to='api.contratacaoplano')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['idPlano', 'id'], name='movimentacao_plano_id_idx'),
+        ),
+        migrations.RunPython(popula_extrato, migrations.RunPython.noop),
+    ]
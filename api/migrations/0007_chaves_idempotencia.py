@@ -0,0 +1,30 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:11
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_extrato_movimentacoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('chave', models.CharField(max_length=255)),
+                ('rota', models.CharField(max_length=100)),
+                ('hashRequisicao', models.CharField(help_text='sha256 do corpo da requisição', max_length=64)),
+                ('statusCode', models.PositiveSmallIntegerField(null=True)),
+                ('resposta', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('criadoEm', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='chaveidempotencia',
+            constraint=models.UniqueConstraint(fields=('chave', 'rota'), name='idempotencia_chave_rota_unica'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_chaves_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='atualizadoEm',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='atualizadoEm',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_atualizadoem'),
+    ]
+
+    # o índice composto é criado antes de remover o índice simples da FK que ele substitui
+    operations = [
+        migrations.AddIndex(
+            model_name='contratacaoplano',
+            index=models.Index(fields=['idCliente', 'dataDaContratacao'], name='plano_cliente_data_idx'),
+        ),
+        migrations.AlterField(
+            model_name='contratacaoplano',
+            name='idCliente',
+            field=models.ForeignKey(db_column='idCliente', db_index=False, on_delete=django.db.models.deletion.PROTECT, to='api.cliente'),
+        ),
+        migrations.AlterField(
+            model_name='movimentacao',
+            name='idPlano',
+            field=models.ForeignKey(db_column='idPlano', db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.contratacaoplano'),
+        ),
+        migrations.AlterField(
+            model_name='resgate',
+            name='idPlano',
+            field=models.ForeignKey(db_column='idPlano', db_index=False, on_delete=django.db.models.deletion.PROTECT, to='api.contratacaoplano'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['expiracaoDeVenda', 'idadeDeEntrada', 'idadeDeSaida'], name='produto_elegibilidade_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:27
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_tarefas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='cliente_email_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_cliente_email_upper'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaDagua',
+            fields=[
+                ('processo', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('ultimaMovimentacao', models.BigIntegerField(default=0)),
+                ('atualizadoEm', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AgregadoDiario',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('dia', models.DateField()),
+                ('contratacoes', models.PositiveIntegerField(default=0)),
+                ('valorContratado', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('aportesExtras', models.PositiveIntegerField(default=0)),
+                ('valorAportesExtras', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('resgates', models.PositiveIntegerField(default=0)),
+                ('valorResgatado', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('idProduto', models.ForeignKey(db_column='idProduto', db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.produto')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='agregadodiario',
+            index=models.Index(fields=['dia'], name='agregado_dia_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='agregadodiario',
+            constraint=models.UniqueConstraint(fields=('idProduto', 'dia'), name='agregado_produto_dia_unq'),
+        ),
+    ]
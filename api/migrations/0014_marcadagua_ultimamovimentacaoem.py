@@ -0,0 +1,30 @@
+# Generated by Django 4.1.5 on 2026-10-17 23:48
+
+from django.db import migrations, models
+
+
+def preencher_ultima_movimentacao_em(apps, schema_editor):
+    """ Marcas já existentes passam a apontar para o criadoEm da movimentação em que pararam """
+    MarcaDagua = apps.get_model('api', 'MarcaDagua')
+    Movimentacao = apps.get_model('api', 'Movimentacao')
+    for marca in MarcaDagua.objects.filter(ultimaMovimentacao__gt=0):
+        marca.ultimaMovimentacaoEm = (
+            Movimentacao.objects.filter(id=marca.ultimaMovimentacao).values_list('criadoEm', flat=True).first()
+        )
+        marca.save(update_fields=['ultimaMovimentacaoEm'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_agregados_diarios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marcadagua',
+            name='ultimaMovimentacaoEm',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(preencher_ultima_movimentacao_em, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,24 @@
 import uuid
-from typing import Union
+from typing import Optional
 from datetime import date
 from decimal import Decimal
 
 from django.core import validators
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Upper
+from django.utils import timezone
 
 from api.error_messages import (
     PRAZO_EXPIRADO, APORTE_MINIMO, IDADE_INVALIDA, APORTE_EXTRA_MINIMO,
     APORTE_INSUFICIENTE, CARENCIA_INICIAL, CARENCIA_ENTRE_RESGATES,
+    CLIENTE_INEXISTENTE, PRODUTO_INEXISTENTE, EMAIL_DUPLICADO,
 )
+from api.cache import regras_do_produto
+from api.metricas import REJEICOES
+from api.regras import RegrasProdutoMixin
 
 
 class Cliente(models.Model):
@@ -25,12 +33,20 @@ class Cliente(models.Model):
         unique=True,
         validators=[validators.EmailValidator()],
         error_messages={
-            'unique': "Esse e-mail já existe.",
+            'unique': EMAIL_DUPLICADO,
         }
     )
     dataDeNascimento = models.DateField()
     sexo = models.CharField(max_length=1, choices=OpcoesSexo.choices)
     rendaMensal = models.DecimalField(max_digits=12, decimal_places=2)
+    # versão da linha para o ETag/Last-Modified do detalhe
+    atualizadoEm = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # a busca do admin compara o email com iexact, que o índice do unique não atende
+            models.Index(Upper('email'), name='cliente_email_upper_idx'),
+        ]
 
     def __str__(self):
         return f'{self.nome}'
@@ -40,7 +56,16 @@ class Cliente(models.Model):
         return int(round((data - self.dataDeNascimento).days / 365.242189, 1))
 
 
-class Produto(models.Model):
+class ProdutoQuerySet(models.QuerySet):
+    def elegiveis(self, idade: int, data: date):
+        """
+        Produtos que um cliente com essa idade pode contratar na data: as mesmas regras de
+        venda_expirada, idade_insuficiente e idade_superior, num único filtro indexado
+        """
+        return self.filter(expiracaoDeVenda__gte=data, idadeDeEntrada__lte=idade, idadeDeSaida__gte=idade)
+
+
+class Produto(RegrasProdutoMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     nome = models.CharField(max_length=150)
     susep = models.CharField(max_length=20)
@@ -51,47 +76,143 @@ class Produto(models.Model):
     idadeDeSaida = models.SmallIntegerField()
     carenciaInicialDeResgate = models.SmallIntegerField()
     carenciaEntreResgates = models.SmallIntegerField()
-    dataUltimoResgate = models.DateField(null=True, blank=True)
+    # versão da linha para o ETag/Last-Modified do detalhe
+    atualizadoEm = models.DateTimeField(auto_now=True)
+
+    objects = ProdutoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # a expiração filtra por intervalo e as idades são verificadas dentro do próprio índice
+            models.Index(
+                fields=['expiracaoDeVenda', 'idadeDeEntrada', 'idadeDeSaida'], name='produto_elegibilidade_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.nome}'
 
-    def venda_expirada(self, data_contratacao: date = date.today()) -> bool:
-        return data_contratacao > self.expiracaoDeVenda
 
-    def aporte_insuficente(self, valor_aporte: Union[float | Decimal] = 0.0) -> bool:
-        return valor_aporte < self.valorMinimoAporteInicial
+def _zero():
+    return Value(Decimal('0.00'), output_field=models.DecimalField(max_digits=14, decimal_places=2))
+
+
+class ContratacaoPlanoQuerySet(models.QuerySet):
+    def com_saldo(self):
+        """ Anota o saldo de cada plano: snapshot compactado somado às movimentações posteriores a ele """
+        movimentacoes_posteriores = Movimentacao.objects.filter(
+            idPlano=OuterRef('pk'),
+            id__gt=Coalesce(OuterRef('saldocompactado__ultimaMovimentacao'), 0),
+        ).values('idPlano').annotate(total=Sum('valor')).values('total')
+        zero = _zero()
+        return self.annotate(
+            saldo=Coalesce('saldocompactado__saldo', zero) + Coalesce(Subquery(movimentacoes_posteriores), zero)
+        )
 
-    def aporte_extra_insuficiente(self, valor_aporte_extra: Union[float | Decimal] = 0.0) -> bool:
-        return valor_aporte_extra < self.valorMinimoAporteExtra
+    def com_posicao(self):
+        """
+        Anota o saldo, o nome do produto, os totais de aportes extras e de resgates e a data do
+        último resgate de cada plano, tudo na mesma query para a posição consolidada do cliente
+        """
+        aportes_extras = AporteExtra.objects.filter(idPlano=OuterRef('pk')).values('idPlano').annotate(
+            total=Sum('valorAporte')
+        ).values('total')
+        resgates = Resgate.objects.filter(idPlano=OuterRef('pk')).values('idPlano').annotate(
+            total=Sum('valorResgate')
+        ).values('total')
+        ultimo_resgate = Resgate.objects.filter(idPlano=OuterRef('pk')).order_by('-dataDoResgate').values(
+            'dataDoResgate'
+        )[:1]
+        return self.com_saldo().annotate(
+            nomeProduto=F('idProduto__nome'),
+            totalAportesExtras=Coalesce(Subquery(aportes_extras), _zero()),
+            totalResgatado=Coalesce(Subquery(resgates), _zero()),
+            dataUltimoResgate=Subquery(ultimo_resgate),
+        )
 
-    def idade_insuficiente(self, idade_cliente: int) -> bool:
-        return idade_cliente < self.idadeDeEntrada
 
-    def idade_superior(self, idade_cliente: int) -> bool:
-        return idade_cliente > self.idadeDeSaida
+class ContratacaoPlanoManager(models.Manager.from_queryset(ContratacaoPlanoQuerySet)):
+    def contratar_em_lote(self, itens: list[dict], batch_size: int = 1000):
+        """
+        Valida e insere várias contratações de uma só vez, buscando os clientes e
+        produtos referenciados com uma query por tabela.
+        Retorna os planos criados e a lista de erros por item (índice na lista de entrada). Cada item
+        rejeitado conta em REJEICOES, como as contratações individuais recusadas pelo handler
+        """
+        produtos = Produto.objects.in_bulk({item['idProduto'] for item in itens})
+        clientes = Cliente.objects.in_bulk({item['idCliente'] for item in itens})
+        planos, erros = [], []
+        for indice, item in enumerate(itens):
+            produto = produtos.get(item['idProduto'])
+            cliente = clientes.get(item['idCliente'])
+            if produto is None:
+                REJEICOES.labels(erro='PRODUTO_INEXISTENTE').inc()
+                erros.append({'indice': indice, 'error': PRODUTO_INEXISTENTE})
+                continue
+            if cliente is None:
+                REJEICOES.labels(erro='CLIENTE_INEXISTENTE').inc()
+                erros.append({'indice': indice, 'error': CLIENTE_INEXISTENTE})
+                continue
+            plano = self.model(
+                idCliente=cliente,
+                idProduto=produto,
+                aporte=item['aporte'],
+                dataDaContratacao=item['dataDaContratacao'],
+            )
+            try:
+                plano.valida_contratacao(produto=produto, cliente=cliente)
+            except ValidationError as exc:
+                REJEICOES.labels(erro=exc.code or 'DESCONHECIDO').inc()
+                erros.append({'indice': indice, 'error': exc.args[0]})
+                continue
+            planos.append(plano)
+
+        with transaction.atomic(savepoint=False):
+            criados = self.bulk_create(planos, batch_size=batch_size)
+            Movimentacao.objects.bulk_create(
+                [Movimentacao.do_aporte_inicial(plano) for plano in criados], batch_size=batch_size
+            )
+        return criados, erros
 
 
 class ContratacaoPlano(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    idCliente = models.ForeignKey('Cliente', on_delete=models.PROTECT, db_column='idCliente')
+    # indexado pelo plano_cliente_data_idx, que começa por ele
+    idCliente = models.ForeignKey('Cliente', on_delete=models.PROTECT, db_column='idCliente', db_index=False)
     idProduto = models.ForeignKey('Produto', on_delete=models.PROTECT, db_column='idProduto')
     aporte = models.DecimalField(max_digits=12, decimal_places=2)
     dataDaContratacao = models.DateField()
 
+    objects = ContratacaoPlanoManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['idCliente', 'dataDaContratacao'], name='plano_cliente_data_idx'),
+        ]
+
     def __str__(self):
         return f'{self.id} {self.dataDaContratacao}'
 
+    def saldo_atual(self, travar: bool = False) -> Decimal:
+        """ Retorna o saldo do plano, travando a linha do plano até o fim da transação se pedido """
+        planos = ContratacaoPlano.objects.all()
+        if travar:
+            planos = planos.select_for_update(of=('self',))
+        return planos.com_saldo().values_list('saldo', flat=True).get(pk=self.pk)
+
     def resgate_negado(self, valor):
-        return self.aporte < valor
+        return self.saldo_atual() < valor
 
-    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
-        produto = self.idProduto
-        cliente = self.idCliente
+    def data_ultimo_resgate(self) -> Optional[date]:
+        """ Retorna a data do resgate mais recente deste plano """
+        return self.resgate_set.order_by('-dataDoResgate').values_list('dataDoResgate', flat=True).first()
+
+    def valida_contratacao(self, produto: RegrasProdutoMixin, cliente: Cliente):
+        """ Lança ValidationError caso a contratação viole alguma regra do produto """
         if produto.venda_expirada(data_contratacao=self.dataDaContratacao):
-            raise ValidationError(PRAZO_EXPIRADO)
+            raise ValidationError(PRAZO_EXPIRADO, code='PRAZO_EXPIRADO')
         if produto.aporte_insuficente(valor_aporte=self.aporte):
-            raise ValidationError(APORTE_MINIMO.format(produto.valorMinimoAporteInicial))
+            raise ValidationError(APORTE_MINIMO.format(produto.valorMinimoAporteInicial), code='APORTE_MINIMO')
         idade_cliente = cliente.get_idade(self.dataDaContratacao)
         idades_invalidas = [
             produto.idade_insuficiente(idade_cliente=idade_cliente),
@@ -100,9 +221,15 @@ class ContratacaoPlano(models.Model):
         if any(idades_invalidas):
             raise ValidationError(IDADE_INVALIDA.format(
                 produto.idadeDeEntrada, produto.idadeDeSaida
-            ))
+            ), code='IDADE_INVALIDA')
 
-        super().save(force_insert=False, force_update=False, using=None, update_fields=None)
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        self.valida_contratacao(produto=regras_do_produto(self.idProduto_id), cliente=self.idCliente)
+        novo = self._state.adding
+        with transaction.atomic():
+            super().save(force_insert=False, force_update=False, using=None, update_fields=None)
+            if novo:
+                Movimentacao.do_aporte_inicial(self).save()
 
 
 class AporteExtra(models.Model):
@@ -114,37 +241,224 @@ class AporteExtra(models.Model):
     def __str__(self):
         return f'{self.id} {self.valorAporte}'
 
+    def valida_aporte(self, produto: RegrasProdutoMixin):
+        """ Lança ValidationError caso o aporte viole alguma regra do produto """
+        if produto.aporte_extra_insuficiente(self.valorAporte):
+            raise ValidationError(
+                APORTE_EXTRA_MINIMO.format(produto.valorMinimoAporteExtra), code='APORTE_EXTRA_MINIMO'
+            )
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         plano = self.idPlano
-        produto = plano.idProduto
-        if produto.aporte_extra_insuficiente(self.valorAporte):
-            raise ValidationError(APORTE_EXTRA_MINIMO.format(produto.valorMinimoAporteExtra))
-        # incremento no aporte
-        plano.aporte += self.valorAporte
-        plano.save()
-        super().save(force_insert=False, force_update=False, using=None, update_fields=None)
+        self.valida_aporte(produto=regras_do_produto(plano.idProduto_id))
+        novo = self._state.adding
+        with transaction.atomic():
+            super().save(force_insert=False, force_update=False, using=None, update_fields=None)
+            # o saldo do plano é derivado do extrato, então o aporte é só mais uma inserção
+            if novo:
+                Movimentacao.objects.create(
+                    idPlano=plano, tipo=Movimentacao.OpcoesTipo.APORTE_EXTRA,
+                    valor=self.valorAporte, data=date.today()
+                )
 
 
 class Resgate(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    idPlano = models.ForeignKey('ContratacaoPlano', on_delete=models.PROTECT, db_column='idPlano')
+    # indexado pelo resgate_plano_data_idx, que começa por ele
+    idPlano = models.ForeignKey(
+        'ContratacaoPlano', on_delete=models.PROTECT, db_column='idPlano', db_index=False
+    )
     valorResgate = models.DecimalField(max_digits=12, decimal_places=2)
+    dataDoResgate = models.DateField(default=date.today, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['idPlano', '-dataDoResgate'], name='resgate_plano_data_idx'),
+        ]
 
     def __str__(self):
         return f'{self.id} {self.valorResgate}'
 
+    def valida_resgate(self, produto: RegrasProdutoMixin, saldo: Decimal, data_ultimo_resgate: Optional[date]):
+        """ Lança ValidationError caso o resgate viole o saldo do plano ou alguma carência do produto """
+        if saldo < self.valorResgate:
+            raise ValidationError(APORTE_INSUFICIENTE.format(saldo), code='APORTE_INSUFICIENTE')
+        if (self.dataDoResgate - self.idPlano.dataDaContratacao).days < produto.carenciaInicialDeResgate:
+            raise ValidationError(
+                CARENCIA_INICIAL.format(produto.carenciaInicialDeResgate), code='CARENCIA_INICIAL'
+            )
+        # a carência entre resgates é verificada por plano, sem escrever no produto
+        if data_ultimo_resgate:
+            if (self.dataDoResgate - data_ultimo_resgate).days < produto.carenciaEntreResgates:
+                raise ValidationError(
+                    CARENCIA_ENTRE_RESGATES.format(produto.carenciaEntreResgates), code='CARENCIA_ENTRE_RESGATES'
+                )
+
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         plano = self.idPlano
-        produto = plano.idProduto
-        data_resgate = date.today()
-        if plano.resgate_negado(valor=self.valorResgate):
-            raise ValidationError(APORTE_INSUFICIENTE.format(plano.aporte))
-        if (data_resgate - plano.dataDaContratacao).days < produto.carenciaInicialDeResgate:
-            raise ValidationError(CARENCIA_INICIAL.format(produto.carenciaInicialDeResgate))
-        if produto.dataUltimoResgate:
-            if (data_resgate - produto.dataUltimoResgate).days < produto.carenciaEntreResgates:
-                raise ValidationError(CARENCIA_ENTRE_RESGATES.format(produto.carenciaEntreResgates))
-
-        produto.dataUltimoResgate = data_resgate
-        produto.save()
-        super().save(force_insert=False, force_update=False, using=None, update_fields=None)
+        produto = regras_do_produto(plano.idProduto_id)
+        novo = self._state.adding
+        with transaction.atomic():
+            # a trava no plano serializa só os resgates do mesmo plano
+            saldo = plano.saldo_atual(travar=True)
+            self.valida_resgate(produto=produto, saldo=saldo, data_ultimo_resgate=plano.data_ultimo_resgate())
+            super().save(force_insert=False, force_update=False, using=None, update_fields=None)
+            if novo:
+                Movimentacao.objects.create(
+                    idPlano=plano, tipo=Movimentacao.OpcoesTipo.RESGATE,
+                    valor=-self.valorResgate, data=self.dataDoResgate
+                )
+
+
+class Movimentacao(models.Model):
+    """ Extrato imutável do plano, cada aporte e resgate vira uma linha e nada é alterado depois """
+    class OpcoesTipo(models.TextChoices):
+        APORTE_INICIAL = ('APORTE_INICIAL', 'Aporte inicial')
+        APORTE_EXTRA = ('APORTE_EXTRA', 'Aporte extra')
+        RESGATE = ('RESGATE', 'Resgate')
+
+    # sequencial para servir de marca d'água na compactação dos saldos
+    id = models.BigAutoField(primary_key=True)
+    # indexado pelo movimentacao_plano_id_idx, que começa por ele
+    idPlano = models.ForeignKey(
+        'ContratacaoPlano', on_delete=models.CASCADE, db_column='idPlano', db_index=False
+    )
+    tipo = models.CharField(max_length=14, choices=OpcoesTipo.choices)
+    valor = models.DecimalField(max_digits=12, decimal_places=2, help_text='Negativo nos resgates')
+    data = models.DateField()
+    criadoEm = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['idPlano', 'id'], name='movimentacao_plano_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tipo} {self.valor}'
+
+    @classmethod
+    def do_aporte_inicial(cls, plano: ContratacaoPlano) -> 'Movimentacao':
+        return cls(
+            idPlano=plano, tipo=cls.OpcoesTipo.APORTE_INICIAL,
+            valor=plano.aporte, data=plano.dataDaContratacao
+        )
+
+
+class SaldoCompactado(models.Model):
+    """ Saldo do plano somando as movimentações até ultimaMovimentacao, atualizado periodicamente """
+    idPlano = models.OneToOneField(
+        'ContratacaoPlano', on_delete=models.CASCADE, primary_key=True, db_column='idPlano'
+    )
+    saldo = models.DecimalField(max_digits=14, decimal_places=2)
+    ultimaMovimentacao = models.BigIntegerField()
+    atualizadoEm = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.idPlano_id} {self.saldo}'
+
+
+class MarcaDagua(models.Model):
+    """ Última movimentação do extrato já incorporada por um processo incremental """
+    processo = models.CharField(max_length=50, primary_key=True)
+    ultimaMovimentacao = models.BigIntegerField(default=0)
+    # criadoEm da última movimentação incorporada, até onde os dados do processo estão atualizados
+    ultimaMovimentacaoEm = models.DateTimeField(null=True, blank=True)
+    atualizadoEm = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.processo} {self.ultimaMovimentacao}'
+
+
+class AgregadoDiario(models.Model):
+    """ Contratações, aportes extras e resgates de um produto em um dia, somados do extrato pela marca d'água """
+    id = models.BigAutoField(primary_key=True)
+    # indexado pelo agregado_produto_dia_unq, que começa por ele
+    idProduto = models.ForeignKey(
+        'Produto', on_delete=models.CASCADE, db_column='idProduto', db_index=False
+    )
+    dia = models.DateField()
+    contratacoes = models.PositiveIntegerField(default=0)
+    valorContratado = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    aportesExtras = models.PositiveIntegerField(default=0)
+    valorAportesExtras = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    resgates = models.PositiveIntegerField(default=0)
+    valorResgatado = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['idProduto', 'dia'], name='agregado_produto_dia_unq'),
+        ]
+        indexes = [
+            # relatórios de todos os produtos num intervalo de dias
+            models.Index(fields=['dia'], name='agregado_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.idProduto_id} {self.dia}'
+
+
+class ChaveIdempotencia(models.Model):
+    """ Resposta de um POST enviado com Idempotency-Key, devolvida de novo quando o cliente repete a chamada """
+    id = models.BigAutoField(primary_key=True)
+    chave = models.CharField(max_length=255)
+    rota = models.CharField(max_length=100)
+    hashRequisicao = models.CharField(max_length=64, help_text='sha256 do corpo da requisição')
+    # vazios enquanto a primeira requisição ainda está sendo processada
+    statusCode = models.PositiveSmallIntegerField(null=True)
+    resposta = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    criadoEm = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['chave', 'rota'], name='idempotencia_chave_rota_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.rota} {self.chave}'
+
+
+class Tarefa(models.Model):
+    """ Operação em lote executada em segundo plano pelo `manage.py worker`, a fila é a própria tabela """
+    class OpcoesEstado(models.TextChoices):
+        PENDENTE = ('PENDENTE', 'Pendente')
+        EXECUTANDO = ('EXECUTANDO', 'Executando')
+        CONCLUIDA = ('CONCLUIDA', 'Concluída')
+        FALHOU = ('FALHOU', 'Falhou')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=10, choices=OpcoesEstado.choices, default=OpcoesEstado.PENDENTE)
+    processados = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True)
+    resultado = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    erro = models.TextField(blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    criadoEm = models.DateTimeField(auto_now_add=True)
+    iniciadoEm = models.DateTimeField(null=True)
+    concluidoEm = models.DateTimeField(null=True)
+    # sinal de vida do worker, renovado a cada progresso
+    atualizadoEm = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # só as pendentes entram no índice que os workers percorrem
+            models.Index(
+                fields=['criadoEm'], condition=models.Q(estado='PENDENTE'), name='tarefa_pendente_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.tipo} {self.estado}'
+
+    def registrar_progresso(self, processados: int, total: Optional[int] = None, parcial: Optional[dict] = None):
+        """
+        Grava o progresso sem salvar o restante da linha, que o worker pode ter desatualizado. `parcial`
+        é o resultado até aqui, de onde uma nova tentativa retoma a partir de `processados`
+        """
+        self.processados = processados
+        self.total = total if total is not None else self.total
+        self.resultado = parcial if parcial is not None else self.resultado
+        Tarefa.objects.filter(pk=self.pk).update(
+            processados=self.processados, total=self.total, resultado=self.resultado, atualizadoEm=timezone.now()
+        )
@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CursorPaginacao(CursorPagination):
+    """
+    Paginação por cursor ordenada pela chave primária: cada página é uma busca
+    pelo índice a partir do último id, sem OFFSET e sem COUNT(*)
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional, Sequence
+
+import numpy as np
+
+from api.models import ContratacaoPlano
+
+
+@dataclass(frozen=True)
+class Projecao:
+    """ Projeção de saldos: uma linha por plano e uma coluna por taxa anual """
+    planos: np.ndarray
+    meses: np.ndarray
+    saldos: np.ndarray
+    taxas: np.ndarray
+    projecoes: np.ndarray
+
+
+def carregar_planos(planos) -> tuple:
+    """ Lê de uma vez as colunas de plano, cliente e produto usadas na projeção e as converte em arrays """
+    linhas = list(planos.com_saldo().values_list(
+        'id', 'saldo', 'idCliente__dataDeNascimento', 'idProduto__idadeDeSaida', 'idProduto__valorMinimoAporteExtra'
+    ))
+    if not linhas:
+        return (
+            np.empty(0, dtype=object), np.empty(0), np.empty(0, dtype='datetime64[D]'),
+            np.empty(0, dtype=int), np.empty(0),
+        )
+    ids, saldos, nascimentos, idades_saida, aportes_minimos = zip(*linhas)
+    return (
+        np.array(ids, dtype=object),
+        np.array(saldos, dtype=float),
+        np.array(nascimentos, dtype='datetime64[D]'),
+        np.array(idades_saida, dtype=int),
+        np.array(aportes_minimos, dtype=float),
+    )
+
+
+def projetar_saldos(
+    taxas_anuais: Sequence[float],
+    planos=None,
+    aporte_mensal: Optional[float] = None,
+    data_base: Optional[date] = None,
+) -> Projecao:
+    """
+    Projeta o saldo de cada plano na data em que o cliente atinge a idadeDeSaida do produto,
+    com aportes mensais de `aporte_mensal` (padrão: o aporte extra mínimo do produto) e
+    juros compostos mensais equivalentes a cada taxa anual. Sem laços por plano: tudo é
+    calculado sobre arrays de planos x taxas
+    """
+    planos = ContratacaoPlano.objects.all() if planos is None else planos
+    data_base = data_base or date.today()
+    ids, saldos, nascimentos, idades_saida, aportes_minimos = carregar_planos(planos)
+
+    # meses completos entre a data base e o aniversário de idadeDeSaida do cliente
+    meses_nascimento = nascimentos.astype('datetime64[M]')
+    dias_nascimento = (nascimentos - meses_nascimento.astype('datetime64[D]')).astype(int)
+    meses = (
+        (meses_nascimento - np.datetime64(data_base, 'M')).astype(int)
+        + idades_saida * 12
+        - (data_base.day - 1 > dias_nascimento)
+    )
+    meses = np.maximum(meses, 0)
+    aportes = aportes_minimos if aporte_mensal is None else np.full_like(saldos, float(aporte_mensal))
+
+    taxas = np.asarray(taxas_anuais, dtype=float)
+    taxas_mensais = (1 + taxas) ** (1 / 12) - 1
+    # planos nas linhas e taxas nas colunas
+    fator = (1 + taxas_mensais[np.newaxis, :]) ** meses[:, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        acumulado_aportes = np.where(
+            taxas_mensais == 0,
+            meses[:, np.newaxis],
+            (fator - 1) / taxas_mensais,
+        )
+    projecoes = saldos[:, np.newaxis] * fator + aportes[:, np.newaxis] * acumulado_aportes
+    return Projecao(planos=ids, meses=meses, saldos=saldos, taxas=taxas, projecoes=projecoes)
@@ -0,0 +1,41 @@
+import uuid
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Union
+
+
+class RegrasProdutoMixin:
+    """ Regras de negócio do produto, compartilhadas pelo model Produto e pelo snapshot em cache """
+
+    def venda_expirada(self, data_contratacao: date = date.today()) -> bool:
+        return data_contratacao > self.expiracaoDeVenda
+
+    def aporte_insuficente(self, valor_aporte: Union[float | Decimal] = 0.0) -> bool:
+        return valor_aporte < self.valorMinimoAporteInicial
+
+    def aporte_extra_insuficiente(self, valor_aporte_extra: Union[float | Decimal] = 0.0) -> bool:
+        return valor_aporte_extra < self.valorMinimoAporteExtra
+
+    def idade_insuficiente(self, idade_cliente: int) -> bool:
+        return idade_cliente < self.idadeDeEntrada
+
+    def idade_superior(self, idade_cliente: int) -> bool:
+        return idade_cliente > self.idadeDeSaida
+
+
+@dataclass(frozen=True)
+class RegrasProduto(RegrasProdutoMixin):
+    """ Cópia imutável dos campos de um Produto usados pelas regras de negócio """
+    id: uuid.UUID
+    expiracaoDeVenda: date
+    valorMinimoAporteInicial: Decimal
+    valorMinimoAporteExtra: Decimal
+    idadeDeEntrada: int
+    idadeDeSaida: int
+    carenciaInicialDeResgate: int
+    carenciaEntreResgates: int
+
+    @classmethod
+    def campos(cls) -> tuple:
+        return tuple(cls.__dataclass_fields__)
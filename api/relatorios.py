@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from api.models import AgregadoDiario, MarcaDagua, Movimentacao
+from api.saldos import ultima_movimentacao_estavel
+
+PROCESSO = 'agregados_diarios'
+
+# colunas de quantidade e valor de cada tipo de movimentação no agregado
+COLUNAS_POR_TIPO = {
+    Movimentacao.OpcoesTipo.APORTE_INICIAL: ('contratacoes', 'valorContratado'),
+    Movimentacao.OpcoesTipo.APORTE_EXTRA: ('aportesExtras', 'valorAportesExtras'),
+    Movimentacao.OpcoesTipo.RESGATE: ('resgates', 'valorResgatado'),
+}
+COLUNAS = [coluna for colunas in COLUNAS_POR_TIPO.values() for coluna in colunas]
+
+
+def atualizar_agregados(atraso: int = 60, lote: int = 1000, reconstruir: bool = False) -> int:
+    """
+    Soma aos agregados diários as movimentações gravadas depois da marca d'água e a avança, retorna
+    quantos (produto, dia) mudaram. Com `reconstruir` apaga os agregados e refaz tudo desde o início
+    """
+    with transaction.atomic():
+        # a trava na marca d'água serializa execuções concorrentes, que senão somariam as mesmas movimentações
+        marca, _ = MarcaDagua.objects.select_for_update().get_or_create(processo=PROCESSO)
+        if reconstruir:
+            AgregadoDiario.objects.all().delete()
+            marca.ultimaMovimentacao = 0
+            marca.ultimaMovimentacaoEm = None
+
+        ultima = ultima_movimentacao_estavel(atraso)
+        if ultima <= marca.ultimaMovimentacao:
+            # sem movimentações novas a marca só muda quando foi zerada pelo reconstruir
+            if reconstruir:
+                marca.save()
+            return 0
+
+        novas = (
+            Movimentacao.objects
+            .filter(id__gt=marca.ultimaMovimentacao, id__lte=ultima)
+            .values('tipo', 'data', produto=F('idPlano__idProduto'))
+            .annotate(quantidade=Count('id'), total=Sum('valor'))
+            .order_by()
+        )
+        agregados = {}
+        for linha in novas.iterator(chunk_size=lote):
+            chave = (linha['produto'], linha['data'])
+            if chave not in agregados:
+                agregados[chave] = AgregadoDiario(idProduto_id=linha['produto'], dia=linha['data'])
+            quantidade, valor = COLUNAS_POR_TIPO[linha['tipo']]
+            agregado = agregados[chave]
+            setattr(agregado, quantidade, getattr(agregado, quantidade) + linha['quantidade'])
+            # resgates são negativos no extrato e positivos no relatório
+            setattr(agregado, valor, getattr(agregado, valor) + abs(linha['total']))
+
+        novos = list(agregados.values())
+        for inicio in range(0, len(novos), lote):
+            _gravar(novos[inicio:inicio + lote])
+
+        marca.ultimaMovimentacao = ultima
+        marca.ultimaMovimentacaoEm = Movimentacao.objects.values_list('criadoEm', flat=True).get(id=ultima)
+        marca.save()
+    return len(novos)
+
+
+def _gravar(agregados: list):
+    """ Soma aos agregados que já existem e grava o bloco num único upsert """
+    existentes = {
+        (existente.idProduto_id, existente.dia): existente
+        for existente in AgregadoDiario.objects.filter(
+            idProduto__in={agregado.idProduto_id for agregado in agregados},
+            dia__in={agregado.dia for agregado in agregados},
+        )
+    }
+    for agregado in agregados:
+        existente = existentes.get((agregado.idProduto_id, agregado.dia))
+        if existente is not None:
+            for coluna in COLUNAS:
+                setattr(agregado, coluna, getattr(agregado, coluna) + getattr(existente, coluna))
+    AgregadoDiario.objects.bulk_create(
+        agregados,
+        update_conflicts=True,
+        unique_fields=['idProduto', 'dia'],
+        update_fields=COLUNAS,
+    )
+
+
+def relatorio(inicio, fim, agrupamento: str = 'produto', produto=None):
+    """
+    Totais dos agregados entre `inicio` e `fim`, por produto no intervalo inteiro ou por produto e dia.
+    Lê só as linhas do intervalo pelos índices de (idProduto, dia) e de dia, sem passar pelo extrato.
+    O intervalo por dia é limitado a RELATORIOS_MAX_DIAS pelo RelatorioParametrosSerializer
+    """
+    agregados = AgregadoDiario.objects.filter(dia__range=(inicio, fim))
+    if produto is not None:
+        agregados = agregados.filter(idProduto=produto)
+    grupos = ['idProduto', 'dia'] if agrupamento == 'dia' else ['idProduto']
+    return list(
+        agregados
+        .values(*grupos)
+        .annotate(nomeProduto=F('idProduto__nome'), **{coluna: Sum(coluna) for coluna in COLUNAS})
+        .order_by(*reversed(grupos))
+    )
@@ -0,0 +1,87 @@
+import csv
+import json
+from decimal import Decimal
+
+import orjson
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class _Eco:
+    """ Buffer que só devolve o que foi escrito, usado para gerar o CSV linha a linha """
+    def write(self, valor):
+        return valor
+
+
+def _tem_float(dado) -> bool:
+    """ Procura floats e Decimal (que o encoder do DRF converte em float) sem recursão """
+    pendentes = [dado]
+    while pendentes:
+        atual = pendentes.pop()
+        if isinstance(atual, (float, Decimal)):
+            return True
+        if isinstance(atual, dict):
+            pendentes.extend(atual.values())
+        elif isinstance(atual, (list, tuple)):
+            pendentes.extend(atual)
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    O JSONRenderer do DRF com a codificação do orjson e a mesma saída, byte a byte: JSON compacto em
+    UTF-8, com U+2028/U+2029 escapados. Datas e o que o orjson não conhece passam pelo encoder do DRF.
+    Floats ficam com o JSONRenderer, porque o orjson os formata de outro jeito (1e-05 vira 0.00001)
+    e devolve null para NaN onde o DRF recusa; os serializers dos models mandam Decimal como texto,
+    então as listagens e detalhes não têm floats. Indentação (API navegável, ; indent=) e o que o
+    orjson recusa também ficam com o JSONRenderer
+    """
+    opcoes = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if self.ensure_ascii or not self.compact or indent is not None or _tem_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.opcoes)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class NDJSONRenderer(BaseRenderer):
+    """ Um objeto JSON por linha, gerado sob demanda para respostas em streaming """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render_linhas(self, nomes, linhas):
+        for linha in linhas:
+            yield json.dumps(dict(zip(nomes, linha)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n').encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """ CSV com cabeçalho, gerado sob demanda para respostas em streaming """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render_linhas(self, nomes, linhas):
+        writer = csv.writer(_Eco())
+        yield writer.writerow(nomes)
+        for linha in linhas:
+            yield writer.writerow(linha)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        return ''.join(self.render_linhas(list(data), [list(data.values())])).encode(self.charset)
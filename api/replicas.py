@@ -0,0 +1,40 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# ligado pelo ReplicaMiddleware nas leituras que podem ir para uma réplica
+_leitura_na_replica = ContextVar('leitura_na_replica', default=False)
+
+
+@contextmanager
+def leituras_na_replica(ativo: bool = True):
+    """ Direciona as leituras feitas dentro do bloco para as réplicas, se houver alguma configurada """
+    token = _leitura_na_replica.set(ativo)
+    try:
+        yield
+    finally:
+        _leitura_na_replica.reset(token)
+
+
+class RoteadorDeReplicas:
+    """
+    Manda as leituras marcadas com leituras_na_replica() para uma das réplicas em REPLICAS;
+    escritas, leituras dentro delas e migrações ficam sempre no primário (default)
+    """
+
+    def db_for_read(self, model, **hints):
+        if _leitura_na_replica.get() and settings.REPLICAS:
+            return random.choice(settings.REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # réplicas e primário têm os mesmos dados
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
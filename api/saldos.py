@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+from api.models import Movimentacao, SaldoCompactado
+
+
+def ultima_movimentacao_estavel(atraso: int) -> int:
+    """
+    Maior id de movimentação gravada há mais de `atraso` segundos. As sequências não seguem a ordem
+    de commit, então o atraso evita passar a marca d'água por cima de transações ainda abertas
+    """
+    limite = timezone.now() - timedelta(seconds=atraso)
+    return Movimentacao.objects.filter(criadoEm__lt=limite).aggregate(ultima=Max('id'))['ultima'] or 0
+
+
+def compactar_saldos(atraso: int = 60, lote: int = 1000) -> int:
+    """ Incorpora aos saldos compactados as movimentações novas de cada plano, retorna quantos planos mudaram """
+    ultima = ultima_movimentacao_estavel(atraso)
+    novas = (
+        Movimentacao.objects
+        .filter(id__lte=ultima)
+        .filter(
+            Q(idPlano__saldocompactado__isnull=True)
+            | Q(id__gt=F('idPlano__saldocompactado__ultimaMovimentacao'))
+        )
+        .values('idPlano')
+        .annotate(
+            saldo_anterior=Max('idPlano__saldocompactado__saldo'),
+            total=Sum('valor'),
+            ultima=Max('id'),
+        )
+        .order_by()
+    )
+    atualizados = 0
+    with transaction.atomic():
+        saldos = []
+        for linha in novas.iterator(chunk_size=lote):
+            saldos.append(SaldoCompactado(
+                idPlano_id=linha['idPlano'],
+                saldo=(linha['saldo_anterior'] or 0) + linha['total'],
+                ultimaMovimentacao=linha['ultima'],
+            ))
+            if len(saldos) >= lote:
+                atualizados += _gravar(saldos)
+                saldos = []
+        atualizados += _gravar(saldos)
+    return atualizados
+
+
+def reconstruir_saldos(atraso: int = 60, lote: int = 1000) -> int:
+    """ Recalcula todos os saldos compactados a partir do extrato, em uma única leitura ordenada por plano """
+    ultima = ultima_movimentacao_estavel(atraso)
+    movimentacoes = (
+        Movimentacao.objects
+        .filter(id__lte=ultima)
+        .order_by('idPlano', 'id')
+        .values_list('idPlano', 'valor', 'id')
+        .iterator(chunk_size=lote)
+    )
+    reconstruidos = 0
+    with transaction.atomic():
+        SaldoCompactado.objects.all().delete()
+        saldos, atual = [], None
+        for plano, valor, id_movimentacao in movimentacoes:
+            if atual is None or atual.idPlano_id != plano:
+                if len(saldos) >= lote:
+                    reconstruidos += _gravar(saldos)
+                    saldos = []
+                atual = SaldoCompactado(idPlano_id=plano, saldo=0)
+                saldos.append(atual)
+            atual.saldo += valor
+            atual.ultimaMovimentacao = id_movimentacao
+        reconstruidos += _gravar(saldos)
+    return reconstruidos
+
+
+def _gravar(saldos: list) -> int:
+    SaldoCompactado.objects.bulk_create(
+        saldos,
+        update_conflicts=True,
+        unique_fields=['idPlano'],
+        update_fields=['saldo', 'ultimaMovimentacao', 'atualizadoEm'],
+    )
+    return len(saldos)
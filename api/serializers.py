@@ -1,39 +1,271 @@
+import math
+
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 
+from api.error_messages import CAMPOS_INEXISTENTES, INTERVALO_INVALIDO, INTERVALO_LONGO
+from api.simulacoes import CONTRATACAO, APORTE_EXTRA, RESGATE
 from api.models import (
     Cliente,
     Produto,
     ContratacaoPlano,
     AporteExtra,
     Resgate,
+    Tarefa,
 )
 
 
-class ClienteSerializer(serializers.ModelSerializer):
+def campos_do_parametro(request, parametro: str) -> set:
+    """ Nomes de campos de um parâmetro como ?fields=id,nome """
+    valor = request.query_params.get(parametro, '')
+    return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+
+class CamposDinamicosMixin:
+    """
+    Recorta os campos da resposta nas leituras com ?fields=id,nome ou ?exclude=email.
+    Em escritas o serializer fica inteiro, senão os campos recortados deixariam de ser validados
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        campos = campos_do_parametro(request, 'fields')
+        excluidos = campos_do_parametro(request, 'exclude')
+        inexistentes = (campos | excluidos) - set(self.fields)
+        if inexistentes:
+            raise serializers.ValidationError({'fields': CAMPOS_INEXISTENTES.format(', '.join(sorted(inexistentes)))})
+
+        for nome in list(self.fields):
+            if (campos and nome not in campos) or nome in excluidos:
+                self.fields.pop(nome)
+
+
+# tipos cujo to_representation devolve o próprio valor que vem do banco
+_SEM_CONVERSAO = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+_CONVERSORES = {}
+
+
+def _aceitando_nulo(conversor):
+    return lambda valor: None if valor is None else conversor(valor)
+
+
+def conversores_de_leitura(serializer) -> list | None:
+    """
+    Pré-compila a leitura de um ModelSerializer a partir de values(): uma tupla (nome, coluna,
+    conversor) por campo, com conversor None onde o valor do banco já é o da resposta. Devolve None
+    se algum campo não for uma coluna simples do model, e então só o caminho normal do DRF serve
+    """
+    chave = (type(serializer), tuple(serializer.fields))
+    if chave in _CONVERSORES:
+        return _CONVERSORES[chave]
+
+    campos = None
+    if isinstance(serializer, serializers.ModelSerializer) \
+            and type(serializer).to_representation is serializers.ModelSerializer.to_representation:
+        campos = _compilar(serializer)
+    _CONVERSORES[chave] = campos
+    return campos
+
+
+def _compilar(serializer) -> list | None:
+    # os conversores ficam em cache, então saem de um serializer sem contexto para não guardar o request
+    todos = type(serializer)().fields
+    colunas = {campo.name for campo in serializer.Meta.model._meta.concrete_fields}
+    campos = []
+    for nome in serializer.fields:
+        campo = todos[nome]
+        if campo.write_only:
+            continue
+        if isinstance(campo, (serializers.BaseSerializer, serializers.ManyRelatedField)) or campo.source not in colunas:
+            return None
+        if isinstance(campo, serializers.PrimaryKeyRelatedField) and campo.pk_field is not None:
+            conversor = _aceitando_nulo(campo.pk_field.to_representation)
+        elif isinstance(campo, _SEM_CONVERSAO):
+            conversor = None
+        elif isinstance(campo, serializers.UUIDField) and campo.uuid_format == 'hex_verbose':
+            conversor = _aceitando_nulo(str)
+        else:
+            conversor = _aceitando_nulo(campo.to_representation)
+        campos.append((nome, campo.source, conversor))
+    return campos
+
+
+def serializar_linhas(campos: list, linhas) -> list:
+    """ Serializa dicts de values() com os conversores de `conversores_de_leitura`, na ordem dos campos """
+    return [
+        {nome: linha[coluna] if conversor is None else conversor(linha[coluna]) for nome, coluna, conversor in campos}
+        for linha in linhas
+    ]
+
+
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Cliente
         fields = '__all__'
 
 
-class ProdutoSerializer(serializers.ModelSerializer):
+class ProdutoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Produto
         fields = '__all__'
 
 
-class ContratacaoPlanoSerializer(serializers.ModelSerializer):
+class ContratacaoPlanoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = ContratacaoPlano
         fields = '__all__'
 
 
-class AporteExtraSerializer(serializers.ModelSerializer):
+class AporteExtraSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = AporteExtra
         fields = '__all__'
 
 
-class ResgateSerializer(serializers.ModelSerializer):
+class ResgateSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Resgate
         fields = '__all__'
+
+
+class ContratacaoPlanoLoteSerializer(serializers.Serializer):
+    """ Item de uma contratação em lote, as chaves estrangeiras são validadas em bloco """
+    idCliente = serializers.UUIDField()
+    idProduto = serializers.UUIDField()
+    aporte = serializers.DecimalField(max_digits=12, decimal_places=2)
+    dataDaContratacao = serializers.DateField()
+
+
+class ClienteImportacaoSerializer(serializers.ModelSerializer):
+    """ Validação de clientes importados em lote, a unicidade de cpf/email é verificada por lote """
+    class Meta:
+        model = Cliente
+        fields = '__all__'
+        extra_kwargs = {
+            'cpf': {'validators': []},
+            'email': {'validators': []},
+        }
+
+
+class ProjecaoParametrosSerializer(serializers.Serializer):
+    taxas = serializers.CharField(help_text='Taxas de juros anuais separadas por vírgula, ex.: 0.06,0.1')
+    aporteMensal = serializers.DecimalField(
+        max_digits=12, decimal_places=2, min_value=0, required=False,
+        help_text='Padrão: aporte extra mínimo do produto'
+    )
+
+    def validate_taxas(self, valor):
+        try:
+            taxas = [float(taxa) for taxa in valor.split(',')]
+        except ValueError:
+            raise serializers.ValidationError('Informe as taxas como números separados por vírgula')
+        # float() aceita nan e inf, que atravessariam a projeção e não têm representação em JSON
+        if not all(math.isfinite(taxa) for taxa in taxas):
+            raise serializers.ValidationError('Informe as taxas como números separados por vírgula')
+        if any(taxa <= -1 for taxa in taxas):
+            raise serializers.ValidationError('As taxas precisam ser maiores que -1')
+        return taxas
+
+
+class PosicaoPlanoSerializer(serializers.Serializer):
+    """ Um plano na posição consolidada, lido das anotações de ContratacaoPlano.objects.com_posicao() """
+    idPlano = serializers.UUIDField(source='id')
+    idProduto = serializers.UUIDField(source='idProduto_id')
+    nomeProduto = serializers.CharField()
+    dataDaContratacao = serializers.DateField()
+    aporte = serializers.DecimalField(max_digits=12, decimal_places=2)
+    saldo = serializers.DecimalField(max_digits=14, decimal_places=2)
+    totalAportesExtras = serializers.DecimalField(max_digits=14, decimal_places=2)
+    totalResgatado = serializers.DecimalField(max_digits=14, decimal_places=2)
+    dataUltimoResgate = serializers.DateField(allow_null=True)
+
+
+class PosicaoSerializer(serializers.Serializer):
+    idCliente = serializers.UUIDField()
+    nome = serializers.CharField()
+    planos = PosicaoPlanoSerializer(many=True)
+
+
+class SimulacaoSerializer(serializers.Serializer):
+    """ Item de uma simulação: contratação (idCliente, idProduto), aporte extra ou resgate (idPlano) """
+    tipo = serializers.ChoiceField(choices=[CONTRATACAO, APORTE_EXTRA, RESGATE])
+    idCliente = serializers.UUIDField(required=False)
+    idProduto = serializers.UUIDField(required=False)
+    idPlano = serializers.UUIDField(required=False)
+    valor = serializers.DecimalField(max_digits=12, decimal_places=2)
+    data = serializers.DateField(required=False, help_text='Padrão: hoje')
+
+    def validate(self, attrs):
+        obrigatorios = ('idCliente', 'idProduto') if attrs['tipo'] == CONTRATACAO else ('idPlano',)
+        faltando = {
+            campo: [self.fields[campo].error_messages['required']] for campo in obrigatorios if campo not in attrs
+        }
+        if faltando:
+            raise serializers.ValidationError(faltando)
+        return attrs
+
+
+class SimulacaoResultadoSerializer(serializers.Serializer):
+    indice = serializers.IntegerField()
+    aceito = serializers.BooleanField()
+    error = serializers.CharField(allow_null=True)
+    codigo = serializers.CharField(allow_null=True)
+
+
+class TarefaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tarefa
+        exclude = ('parametros',)
+
+
+class RelatorioParametrosSerializer(serializers.Serializer):
+    inicio = serializers.DateField()
+    fim = serializers.DateField()
+    agrupamento = serializers.ChoiceField(
+        choices=['produto', 'dia'], default='produto',
+        help_text='produto: totais do intervalo por produto; dia: uma linha por produto e dia'
+    )
+    idProduto = serializers.UUIDField(required=False)
+
+    def validate(self, attrs):
+        if attrs['inicio'] > attrs['fim']:
+            raise serializers.ValidationError({'fim': [INTERVALO_INVALIDO]})
+        # por dia a resposta tem uma linha por produto e dia, sem paginação
+        if attrs['agrupamento'] == 'dia' and (attrs['fim'] - attrs['inicio']).days >= settings.RELATORIOS_MAX_DIAS:
+            raise serializers.ValidationError({'fim': [INTERVALO_LONGO.format(settings.RELATORIOS_MAX_DIAS)]})
+        return attrs
+
+
+class RelatorioLinhaSerializer(serializers.Serializer):
+    """ Uma linha de api.relatorios.relatorio(), o dia só vem no agrupamento por dia """
+    idProduto = serializers.UUIDField()
+    nomeProduto = serializers.CharField()
+    dia = serializers.DateField(required=False)
+    contratacoes = serializers.IntegerField()
+    valorContratado = serializers.DecimalField(max_digits=16, decimal_places=2)
+    aportesExtras = serializers.IntegerField()
+    valorAportesExtras = serializers.DecimalField(max_digits=16, decimal_places=2)
+    resgates = serializers.IntegerField()
+    valorResgatado = serializers.DecimalField(max_digits=16, decimal_places=2)
+
+
+class RelatorioSerializer(serializers.Serializer):
+    inicio = serializers.DateField()
+    fim = serializers.DateField()
+    agrupamento = serializers.CharField()
+    atualizadoAte = serializers.DateTimeField(
+        allow_null=True, help_text='Gravação da última movimentação incluída nos totais'
+    )
+    resultados = RelatorioLinhaSerializer(many=True)
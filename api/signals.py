@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.cache import invalidar_produtos
+from api.models import Produto
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def produto_alterado(sender, **kwargs):
+    # invalida já e de novo após o commit, descartando o que outros workers leram antes dele
+    invalidar_produtos()
+    transaction.on_commit(invalidar_produtos)
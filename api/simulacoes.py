@@ -0,0 +1,78 @@
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db.models import OuterRef, Subquery
+
+from api.error_messages import CLIENTE_INEXISTENTE, PRODUTO_INEXISTENTE, PLANO_INEXISTENTE
+from api.models import Cliente, Produto, ContratacaoPlano, AporteExtra, Resgate
+from api.regras import RegrasProduto
+
+CONTRATACAO = 'CONTRATACAO'
+APORTE_EXTRA = 'APORTE_EXTRA'
+RESGATE = 'RESGATE'
+
+
+def _carregar(itens: list[dict]):
+    """ Busca clientes, planos e produtos referenciados pelo lote, uma query por tabela e sem travas """
+    clientes = Cliente.objects.only('id', 'dataDeNascimento').in_bulk(
+        {item['idCliente'] for item in itens if item['tipo'] == CONTRATACAO}
+    )
+    ultimo_resgate = Resgate.objects.filter(idPlano=OuterRef('pk')).order_by('-dataDoResgate').values(
+        'dataDoResgate'
+    )[:1]
+    planos = ContratacaoPlano.objects.com_saldo().annotate(dataUltimoResgate=Subquery(ultimo_resgate)).only(
+        'id', 'idProduto', 'dataDaContratacao'
+    ).in_bulk({item['idPlano'] for item in itens if item['tipo'] != CONTRATACAO})
+
+    ids_produtos = {item['idProduto'] for item in itens if item['tipo'] == CONTRATACAO}
+    ids_produtos |= {plano.idProduto_id for plano in planos.values()}
+    produtos = {
+        valores['id']: RegrasProduto(**valores)
+        for valores in Produto.objects.filter(id__in=ids_produtos).values(*RegrasProduto.campos())
+    }
+    return clientes, planos, produtos
+
+
+def _validar(item: dict, clientes: dict, planos: dict, produtos: dict):
+    """ Aplica ao item as mesmas validações do save do model correspondente, sem gravar """
+    data = item.get('data') or date.today()
+    if item['tipo'] == CONTRATACAO:
+        cliente = clientes.get(item['idCliente'])
+        produto = produtos.get(item['idProduto'])
+        if cliente is None:
+            raise ValidationError(CLIENTE_INEXISTENTE, code='CLIENTE_INEXISTENTE')
+        if produto is None:
+            raise ValidationError(PRODUTO_INEXISTENTE, code='PRODUTO_INEXISTENTE')
+        plano = ContratacaoPlano(
+            idCliente=cliente, idProduto_id=produto.id, aporte=item['valor'], dataDaContratacao=data
+        )
+        plano.valida_contratacao(produto=produto, cliente=cliente)
+        return
+
+    plano = planos.get(item['idPlano'])
+    if plano is None:
+        raise ValidationError(PLANO_INEXISTENTE, code='PLANO_INEXISTENTE')
+    produto = produtos[plano.idProduto_id]
+    if item['tipo'] == APORTE_EXTRA:
+        AporteExtra(idPlano=plano, valorAporte=item['valor']).valida_aporte(produto=produto)
+    else:
+        resgate = Resgate(idPlano=plano, valorResgate=item['valor'], dataDoResgate=data)
+        resgate.valida_resgate(produto=produto, saldo=plano.saldo, data_ultimo_resgate=plano.dataUltimoResgate)
+
+
+def simular(itens: list[dict]) -> list[dict]:
+    """
+    Avalia um lote de contratações, aportes extras e resgates sem escrever nada.
+    Cada item é avaliado contra o estado atual do banco, independente dos demais itens do lote,
+    e o resultado traz a mesma mensagem de erro que a operação real devolveria
+    """
+    clientes, planos, produtos = _carregar(itens)
+    resultados = []
+    for indice, item in enumerate(itens):
+        try:
+            _validar(item, clientes, planos, produtos)
+        except ValidationError as exc:
+            resultados.append({'indice': indice, 'aceito': False, 'error': exc.message, 'codigo': exc.code})
+        else:
+            resultados.append({'indice': indice, 'aceito': True, 'error': None, 'codigo': None})
+    return resultados
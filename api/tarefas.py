@@ -0,0 +1,179 @@
+import logging
+import signal
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.idempotencia import limpar_chaves_expiradas
+from api.models import ContratacaoPlano, Tarefa
+from api.relatorios import atualizar_agregados
+from api.saldos import compactar_saldos
+from api.serializers import ContratacaoPlanoLoteSerializer
+
+logger = logging.getLogger(__name__)
+
+# funções executadas pelos workers, registradas pelo tipo da tarefa
+TAREFAS = {}
+
+
+def tarefa(tipo: str):
+    """ Registra a função como executora das tarefas desse tipo. Ela recebe a tarefa e os parâmetros """
+    def registrar(funcao):
+        TAREFAS[tipo] = funcao
+        return funcao
+    return registrar
+
+
+def enfileirar(tipo: str, **parametros) -> Tarefa:
+    if tipo not in TAREFAS:
+        raise ValueError(f'Tarefa desconhecida: {tipo}')
+    return Tarefa.objects.create(tipo=tipo, parametros=parametros)
+
+
+def reservar(limite: int = 1) -> list[Tarefa]:
+    """
+    Reserva as tarefas pendentes mais antigas com SELECT ... FOR UPDATE SKIP LOCKED: workers
+    concorrentes pulam as linhas já travadas em vez de esperar, e nenhuma tarefa é pega duas vezes
+    """
+    with transaction.atomic():
+        ids = list(
+            Tarefa.objects.select_for_update(skip_locked=True)
+            .filter(estado=Tarefa.OpcoesEstado.PENDENTE)
+            .order_by('criadoEm')
+            .values_list('id', flat=True)[:limite]
+        )
+        agora = timezone.now()
+        Tarefa.objects.filter(id__in=ids).update(
+            estado=Tarefa.OpcoesEstado.EXECUTANDO, iniciadoEm=agora, atualizadoEm=agora,
+            tentativas=F('tentativas') + 1
+        )
+    return list(Tarefa.objects.filter(id__in=ids).order_by('criadoEm'))
+
+
+def _sinal_de_vida(tarefa: Tarefa, parar: threading.Event, intervalo: float):
+    """
+    Renova o atualizadoEm da tarefa enquanto ela executa, numa conexão própria: transações longas
+    da tarefa não deixariam o progresso gravado por ela aparecer para o recuperar_abandonadas
+    """
+    try:
+        while not parar.wait(intervalo):
+            Tarefa.objects.filter(pk=tarefa.pk).update(atualizadoEm=timezone.now())
+    finally:
+        connection.close()
+
+
+def executar(tarefa: Tarefa):
+    """ Executa a tarefa reservada e grava o resultado ou o erro """
+    parar = threading.Event()
+    sinal_de_vida = threading.Thread(
+        target=_sinal_de_vida, args=(tarefa, parar, settings.TAREFAS_ABANDONO_SEGUNDOS / 3), daemon=True
+    )
+    sinal_de_vida.start()
+    try:
+        resultado = TAREFAS[tarefa.tipo](tarefa, **tarefa.parametros)
+    except Exception:  # noqa
+        logger.exception('Tarefa %s (%s) falhou', tarefa.id, tarefa.tipo)
+        tarefa.estado = Tarefa.OpcoesEstado.FALHOU
+        tarefa.erro = traceback.format_exc()
+    else:
+        tarefa.estado = Tarefa.OpcoesEstado.CONCLUIDA
+        tarefa.resultado = resultado
+    finally:
+        parar.set()
+        sinal_de_vida.join()
+    tarefa.concluidoEm = timezone.now()
+    tarefa.save(update_fields=['estado', 'resultado', 'erro', 'concluidoEm', 'atualizadoEm'])
+
+
+def recuperar_abandonadas(segundos: int = None) -> int:
+    """
+    Devolve para a fila as tarefas em execução sem sinal de vida há mais de `segundos`, como as de
+    um worker que morreu. Depois de TAREFAS_MAX_TENTATIVAS elas são marcadas como falhas
+    """
+    segundos = segundos or settings.TAREFAS_ABANDONO_SEGUNDOS
+    abandonadas = Tarefa.objects.filter(
+        estado=Tarefa.OpcoesEstado.EXECUTANDO, atualizadoEm__lt=timezone.now() - timedelta(seconds=segundos)
+    )
+    abandonadas.filter(tentativas__gte=settings.TAREFAS_MAX_TENTATIVAS).update(
+        estado=Tarefa.OpcoesEstado.FALHOU, erro='Tarefa abandonada pelo worker', concluidoEm=timezone.now()
+    )
+    return abandonadas.update(estado=Tarefa.OpcoesEstado.PENDENTE)
+
+
+def processar_pendentes(encerrar: threading.Event = None) -> int:
+    """ Executa tarefas até a fila esvaziar ou `encerrar` ser sinalizado, retorna quantas foram executadas """
+    executadas = 0
+    while not (encerrar and encerrar.is_set()) and (tarefas := reservar()):
+        for reservada in tarefas:
+            executar(reservada)
+            executadas += 1
+    return executadas
+
+
+def loop_do_worker(intervalo: float):
+    """
+    Laço de cada processo do worker: executa o que houver e dorme `intervalo` segundos com a fila vazia.
+    O SIGTERM do processo pai (deploy, docker stop) só encerra o laço depois da tarefa em andamento.
+    Erros fora das tarefas, como o banco fora do ar, não derrubam o processo: a conexão é descartada
+    e o laço tenta de novo com espera crescente, até TAREFAS_ESPERA_MAXIMA segundos
+    """
+    encerrar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: encerrar.set())
+    # o Ctrl+C chega a todo o grupo de processos, quem repassa o encerramento é o pai
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    falhas = 0
+    while not encerrar.is_set():
+        try:
+            recuperar_abandonadas()
+            executadas = processar_pendentes(encerrar)
+        except Exception:  # noqa
+            falhas += 1
+            logger.exception('Erro no laço do worker, tentativa %d', falhas)
+            close_old_connections()
+            encerrar.wait(min(intervalo * 2 ** falhas, settings.TAREFAS_ESPERA_MAXIMA))
+            continue
+        falhas = 0
+        close_old_connections()
+        if not executadas:
+            encerrar.wait(intervalo)
+
+
+@tarefa('contratar_em_lote')
+def contratar_em_lote(tarefa: Tarefa, itens: list, lote: int = 1000):
+    """
+    A mesma contratação em lote do /api/contratacoes/bulk/, em blocos. Cada bloco é gravado na mesma
+    transação que o progresso e o resultado parcial, então uma nova tentativa, depois de um worker
+    abandonar a tarefa, retoma do primeiro bloco não gravado sem contratar nada duas vezes
+    """
+    serializer = ContratacaoPlanoLoteSerializer(data=itens, many=True)
+    serializer.is_valid(raise_exception=True)
+    validados = serializer.validated_data
+    resultado = tarefa.resultado or {'criados': [], 'erros': []}
+    tarefa.registrar_progresso(tarefa.processados, len(validados), resultado)
+    for inicio in range(tarefa.processados, len(validados), lote):
+        with transaction.atomic():
+            planos, erros_do_bloco = ContratacaoPlano.objects.contratar_em_lote(validados[inicio:inicio + lote])
+            resultado['criados'] += [str(plano.id) for plano in planos]
+            resultado['erros'] += [{**erro, 'indice': erro['indice'] + inicio} for erro in erros_do_bloco]
+            tarefa.registrar_progresso(min(inicio + lote, len(validados)), parcial=resultado)
+    return resultado
+
+
+@tarefa('compactar_saldos')
+def compactar_saldos_em_segundo_plano(tarefa: Tarefa, atraso: int = 60, lote: int = 1000):
+    return {'atualizados': compactar_saldos(atraso=atraso, lote=lote)}
+
+
+@tarefa('atualizar_agregados')
+def atualizar_agregados_em_segundo_plano(tarefa: Tarefa, atraso: int = 60, lote: int = 1000):
+    return {'atualizados': atualizar_agregados(atraso=atraso, lote=lote)}
+
+
+@tarefa('limpar_idempotencia')
+def limpar_idempotencia_em_segundo_plano(tarefa: Tarefa, ttl_horas: float = None):
+    return {'apagadas': limpar_chaves_expiradas(timedelta(hours=ttl_horas) if ttl_horas else None)}
@@ -0,0 +1,124 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client as App  # Para evitar confusões com o Cliente
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.admin import ContagemEstimadaPaginator
+from api.models import Cliente, ContratacaoPlano, AporteExtra, Movimentacao, Resgate
+from api.tests.tests_unit import BaseTestCase
+
+
+class AdminTabelasGrandesTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app = App()
+        self.app.force_login(User.objects.create_superuser('admin', 'admin@brasilprev.com', 'senha'))
+
+    def criar_registros(self, inicio, fim):
+        for indice in range(inicio, fim):
+            cliente = Cliente.objects.create(
+                cpf=f'{indice:011d}', nome=f'Cliente {indice}', email=f'cliente{indice}@gmail.com',
+                dataDeNascimento=self.data_nascimento, sexo='F', rendaMensal=1000
+            )
+            plano = ContratacaoPlano.objects.create(
+                idCliente=cliente, idProduto=self.produto, aporte=self.valor_minimo_aporte_inicial,
+                dataDaContratacao=self.data_contratacao
+            )
+            AporteExtra.objects.create(idCliente=cliente, idPlano=plano, valorAporte=self.valor_minimo_aporte_extra)
+            Resgate.objects.create(idPlano=plano, valorResgate=100)
+
+    def consultas_do_changelist(self, rota):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.app.get(reverse(rota))
+        self.assertEqual(response.status_code, 200)
+        return len(consultas)
+
+    def test_changelist_com_consultas_constantes(self):
+        """
+        Dado changelists de planos, aportes extras e resgates
+        Quando a tabela passa de um para dez registros
+        Então verifique que o número de consultas não cresce com as linhas, pelas FKs carregadas no mesmo SELECT
+        """
+        rotas = ('admin:api_contratacaoplano_changelist', 'admin:api_aporteextra_changelist',
+                 'admin:api_resgate_changelist')
+        self.criar_registros(0, 1)
+        antes = [self.consultas_do_changelist(rota) for rota in rotas]
+        self.criar_registros(1, 10)
+        depois = [self.consultas_do_changelist(rota) for rota in rotas]
+        self.assertEqual(antes, depois)
+
+    def test_busca_por_cpf_e_email(self):
+        """
+        Dado um cliente cadastrado
+        Quando buscado no admin pelo cpf ou pelo email em caixa diferente
+        Então verifique que ele é encontrado e que buscas por trechos do nome não varrem a tabela
+        """
+        url = reverse('admin:api_cliente_changelist')
+        for termo in (self.cliente.cpf, self.cliente.email.upper()):
+            with self.subTest(termo=termo):
+                self.assertContains(self.app.get(url, {'q': termo}), self.cliente.email)
+        self.assertNotContains(self.app.get(url, {'q': 'José'}), self.cliente.email)
+
+    def test_inclusao_sem_dropdown_de_clientes(self):
+        """
+        Dado a inclusão de um plano
+        Quando o formulário é aberto
+        Então verifique que os clientes não são carregados num select, e sim por autocomplete
+        """
+        response = self.app.get(reverse('admin:api_contratacaoplano_add'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, f'<option value="{self.cliente.id}">')
+
+    def test_movimentacoes_nao_sao_alteradas_nem_apagadas(self):
+        """
+        Dado um plano, um aporte extra e um resgate
+        Quando um superusuário tenta alterá-los ou apagá-los pelo admin
+        Então verifique que o formulário é só de leitura, o delete é recusado e o extrato não muda
+        """
+        aporte = AporteExtra.objects.create(
+            idCliente=self.cliente, idPlano=self.contratacao, valorAporte=self.valor_minimo_aporte_extra
+        )
+        resgate = Resgate.objects.create(idPlano=self.contratacao, valorResgate=100)
+        extrato = list(Movimentacao.objects.order_by('id').values_list('id', 'valor'))
+        for modelo, instancia in (('contratacaoplano', self.contratacao), ('aporteextra', aporte),
+                                  ('resgate', resgate)):
+            with self.subTest(modelo=modelo):
+                url = reverse(f'admin:api_{modelo}_change', args=[instancia.pk])
+                self.assertNotContains(self.app.get(url), 'name="_save"')
+                self.assertEqual(self.app.post(url, {}).status_code, 403)
+                response = self.app.post(reverse(f'admin:api_{modelo}_delete', args=[instancia.pk]), {'post': 'yes'})
+                self.assertEqual(response.status_code, 403)
+        self.assertEqual(list(Movimentacao.objects.order_by('id').values_list('id', 'valor')), extrato)
+
+    def test_contagem_exata_fora_do_postgres_ou_com_filtro(self):
+        """
+        Dado a listagem de clientes
+        Quando paginada com e sem filtro
+        Então verifique que as tabelas sem estimativa usam a contagem exata
+        """
+        paginator = ContagemEstimadaPaginator(Cliente.objects.filter(sexo='M').order_by('id'), 50)
+        self.assertIsNone(paginator.estimar(paginator.object_list))
+        self.assertEqual(paginator.count, 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'A estimativa vem das estatísticas do PostgreSQL')
+class ContagemEstimadaTest(BaseTestCase):
+    @override_settings(ADMIN_CONTAGEM_EXATA_ATE=0)
+    def test_contagem_estimada_sem_filtro(self):
+        """
+        Dado uma tabela analisada pelo Postgres
+        Quando a listagem sem filtro é paginada
+        Então verifique que a contagem vem de pg_class, sem COUNT(*)
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE api_cliente')
+        paginator = ContagemEstimadaPaginator(Cliente.objects.order_by('id'), 50)
+        with CaptureQueriesContext(connection) as consultas:
+            estimativa = paginator.count
+        self.assertEqual(estimativa, 1)
+        self.assertNotIn('COUNT', ' '.join(consulta['sql'].upper() for consulta in consultas))
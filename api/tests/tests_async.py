@@ -0,0 +1,93 @@
+import uuid
+from unittest.mock import patch
+
+from django.test import AsyncClient
+from django.urls import reverse
+
+from api.models import Cliente
+from api.tests.tests_unit import BaseTestCase
+
+
+class LeituraAssincronaTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app = AsyncClient()
+
+    async def test_detalhe_assincrono(self):
+        """
+        Dado um cliente existente
+        Quando consultado pela rota assíncrona
+        Então verifique que a resposta é a mesma da rota síncrona
+        """
+        response = await self.app.get(reverse('cliente-async-detail', kwargs={'pk': self.cliente.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], str(self.cliente.id))
+        self.assertEqual(response.json()['cpf'], self.cliente.cpf)
+
+    async def test_detalhe_inexistente(self):
+        """
+        Dado um id que não existe
+        Quando consultado pela rota assíncrona
+        Então verifique que a resposta é 404
+        """
+        response = await self.app.get(reverse('cliente-async-detail', kwargs={'pk': uuid.uuid4()}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_listagem_paginada(self):
+        """
+        Dado três clientes cadastrados
+        Quando listados pela rota assíncrona com page_size=2
+        Então verifique que a segunda página traz o cliente restante, sem repetições
+        """
+        for indice in range(2):
+            await Cliente.objects.acreate(
+                cpf=f'1111111111{indice}', nome='Cliente', email=f'cliente{indice}@gmail.com',
+                dataDeNascimento=self.cliente.dataDeNascimento, sexo='F', rendaMensal=1000,
+            )
+        response = await self.app.get(reverse('cliente-async-list'), {'page_size': 2})
+        primeira = response.json()
+        self.assertEqual(len(primeira['results']), 2)
+        self.assertIsNotNone(primeira['next'])
+
+        response = await self.app.get(primeira['next'])
+        segunda = response.json()
+        self.assertEqual(len(segunda['results']), 1)
+        self.assertIsNone(segunda['next'])
+
+        ids = [item['id'] for item in primeira['results'] + segunda['results']]
+        self.assertEqual(sorted(ids), sorted([str(pk) async for pk in Cliente.objects.values_list('id', flat=True)]))
+
+    async def test_listagem_sem_leitura_rapida(self):
+        """
+        Dado um serializer sem conversores de leitura, como os que têm campos calculados
+        Quando listado pela rota assíncrona
+        Então verifique que a resposta sai pelo ModelSerializer, igual à da leitura rápida
+        """
+        url = reverse('cliente-async-list')
+        rapida = (await self.app.get(url)).json()
+        with patch('api.views_async.conversores_de_leitura', return_value=None):
+            response = await self.app.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), rapida)
+
+    async def test_cursor_invalido(self):
+        """
+        Dado um cursor que não é um id
+        Quando a listagem assíncrona é pedida com ele
+        Então verifique que a resposta é 400, como nas rotas síncronas
+        """
+        response = await self.app.get(reverse('cliente-async-list'), {'cursor': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+    async def test_page_size_menor_que_um(self):
+        """
+        Dado page_size zero ou negativo
+        Quando a listagem assíncrona é pedida
+        Então verifique que ela traz uma página de um registro
+        """
+        for tamanho in (0, -1):
+            with self.subTest(page_size=tamanho):
+                response = await self.app.get(reverse('cliente-async-list'), {'page_size': tamanho})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), 1)
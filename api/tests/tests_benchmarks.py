@@ -0,0 +1,50 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+
+from api.benchmarks.dados import popular
+from api.models import ContratacaoPlano, Movimentacao
+
+
+class BenchmarkTest(TestCase):
+    def test_popular_reproduzivel(self):
+        """
+        Dada uma semente,
+        Quando a massa de dados for gerada,
+        Então verifique se os ids são sempre os mesmos e o extrato acompanha os planos
+        """
+        class Desfazer(Exception):
+            pass
+
+        try:
+            with transaction.atomic():
+                popular(clientes=5, produtos=2, planos=10, aportes=5, resgates=5, semente=1)
+                ids = set(ContratacaoPlano.objects.values_list('id', flat=True))
+                raise Desfazer
+        except Desfazer:
+            pass
+
+        popular(clientes=5, produtos=2, planos=10, aportes=5, resgates=5, semente=1)
+        self.assertEqual(set(ContratacaoPlano.objects.values_list('id', flat=True)), ids)
+        self.assertEqual(len(ids), 10)
+        self.assertEqual(Movimentacao.objects.count(), 20)
+
+    def test_benchmark_json(self):
+        popular(clientes=5, produtos=2, planos=10, aportes=5, resgates=5)
+        with tempfile.TemporaryDirectory() as diretorio:
+            saida = Path(diretorio) / 'benchmark.json'
+            call_command('benchmark', saida=str(saida), repeticoes=2, stdout=StringIO())
+            relatorio = json.loads(saida.read_text())
+
+        nomes = {resultado['nome'] for resultado in relatorio['resultados']}
+        self.assertIn('Cliente.get_idade', nomes)
+        self.assertIn('GET /api/resgates/{id}/', nomes)
+        self.assertIn('POST /api/resgates/', nomes)
+        self.assertEqual(ContratacaoPlano.objects.count(), 10)
+        for resultado in relatorio['resultados']:
+            self.assertGreater(resultado['ops_s'], 0)
@@ -0,0 +1,129 @@
+import json
+import threading
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from api.models import Produto, Cliente, ContratacaoPlano, AporteExtra
+from api.tarefas import enfileirar, reservar
+
+
+def executar_em_paralelo(funcao, threads: int):
+    """ Executa a função em várias threads liberadas ao mesmo tempo, cada uma com a sua conexão """
+    barreira = threading.Barrier(threads)
+    erros = []
+
+    def alvo():
+        try:
+            barreira.wait()
+            funcao()
+        except Exception as exc:  # noqa
+            erros.append(exc)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=alvo) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return erros
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Concorrência real exige PostgreSQL')
+class AporteExtraConcorrenciaTest(TransactionTestCase):
+    threads = 16
+    aportes_por_thread = 25
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            cpf='12345678909', nome='José Henriques', email='jhrq@gmail.com',
+            dataDeNascimento=date(1991, 10, 22), sexo='M', rendaMensal=3500.00
+        )
+        self.produto = Produto.objects.create(
+            nome="Produto 1", susep='15414.900840/2018-17',
+            expiracaoDeVenda=date(2999, 12, 31), valorMinimoAporteInicial=2500.00,
+            valorMinimoAporteExtra=100.00, idadeDeEntrada=18,
+            idadeDeSaida=65, carenciaInicialDeResgate=90, carenciaEntreResgates=30
+        )
+        self.contratacao = ContratacaoPlano.objects.create(
+            idCliente=self.cliente,
+            idProduto=self.produto,
+            aporte=2500.00,
+            dataDaContratacao=date(2022, 9, 15)
+        )
+
+    def test_aportes_simultaneos_no_mesmo_plano(self):
+        """
+        Dado vários aportes extras simultâneos no mesmo plano,
+        Quando todos forem concluídos,
+        Então verifique se nenhum incremento no saldo foi perdido
+        """
+        valor = Decimal('100.00')
+
+        def aportar():
+            for _ in range(self.aportes_por_thread):
+                AporteExtra.objects.create(
+                    idCliente_id=self.cliente.id,
+                    idPlano=ContratacaoPlano.objects.get(pk=self.contratacao.pk),
+                    valorAporte=valor
+                )
+
+        erros = executar_em_paralelo(aportar, self.threads)
+        self.assertEqual(erros, [])
+
+        total = self.threads * self.aportes_por_thread
+        self.assertEqual(AporteExtra.objects.filter(idPlano=self.contratacao).count(), total)
+        self.assertEqual(self.contratacao.saldo_atual(), Decimal('2500.00') + valor * total)
+
+    def test_mesma_chave_de_idempotencia_simultanea(self):
+        """
+        Dado várias requisições simultâneas com a mesma Idempotency-Key,
+        Quando todas forem respondidas,
+        Então verifique se só um aporte foi criado e todas receberam a resposta dele
+        """
+        respostas = []
+
+        def aportar():
+            respostas.append(Client().post(
+                reverse('aporteextra-list'),
+                data=json.dumps({
+                    'idCliente': str(self.cliente.id), 'idPlano': str(self.contratacao.id), 'valorAporte': 100
+                }),
+                content_type='application/json', HTTP_IDEMPOTENCY_KEY='mesma-chave'
+            ))
+
+        erros = executar_em_paralelo(aportar, self.threads)
+        self.assertEqual(erros, [])
+        self.assertEqual(AporteExtra.objects.filter(idPlano=self.contratacao).count(), 1)
+        self.assertEqual({resposta.status_code for resposta in respostas}, {201})
+        self.assertEqual(len({resposta.json()['id'] for resposta in respostas}), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED exige PostgreSQL')
+class TarefaConcorrenciaTest(TransactionTestCase):
+    threads = 8
+    tarefas = 40
+
+    def test_reserva_sem_duplicidade(self):
+        """
+        Dado várias tarefas pendentes e vários workers reservando ao mesmo tempo,
+        Quando a fila esvaziar,
+        Então verifique se cada tarefa foi reservada por exatamente um worker
+        """
+        for _ in range(self.tarefas):
+            enfileirar('compactar_saldos')
+        reservadas = []
+
+        def reservar_ate_esvaziar():
+            while tarefas := reservar():
+                reservadas.extend(tarefa.id for tarefa in tarefas)
+
+        erros = executar_em_paralelo(reservar_ate_esvaziar, self.threads)
+        self.assertEqual(erros, [])
+        self.assertEqual(len(reservadas), self.tarefas)
+        self.assertEqual(len(set(reservadas)), self.tarefas)
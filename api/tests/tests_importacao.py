@@ -0,0 +1,86 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+
+from api.error_messages import CPF_DUPLICADO, EMAIL_DUPLICADO, JSON_INVALIDO
+from api.models import Cliente
+from api.tests.tests_unit import BaseTestCase
+
+CABECALHO = 'cpf,nome,email,dataDeNascimento,sexo,rendaMensal\n'
+
+
+class ImportarClientesTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+
+    def importar(self, nome, conteudo, **opcoes):
+        arquivo = Path(self.diretorio.name) / nome
+        arquivo.write_text(conteudo, encoding='utf-8')
+        call_command('importar_clientes', str(arquivo), stdout=StringIO(), **opcoes)
+        rejeitados = Path(f'{arquivo}.rejeitados.ndjson').read_text(encoding='utf-8').splitlines()
+        return [json.loads(linha) for linha in rejeitados]
+
+    def test_importar_csv(self):
+        """
+        Dado um CSV com clientes válidos, repetidos e inválidos,
+        Quando ele for importado em lotes,
+        Então verifique se só os válidos são gravados e os demais vão para o arquivo de rejeitados
+        """
+        conteudo = CABECALHO + (
+            '11111111111,Ana,ana@gmail.com,1990-01-01,F,1000.00\n'
+            '12345678909,Cpf Existente,novo@gmail.com,1990-01-01,M,1000.00\n'
+            '22222222222,Email Existente,jhrq@gmail.com,1990-01-01,M,1000.00\n'
+            '33333333333,Sem Email,,1990-01-01,M,1000.00\n'
+            '44444444444,Bia,bia@gmail.com,1990-01-01,F,1000.00\n'
+            '44444444444,Bia Repetida,bia2@gmail.com,1990-01-01,F,1000.00\n'
+        )
+        rejeitados = self.importar('clientes.csv', conteudo, lote=2)
+
+        self.assertEqual(
+            set(Cliente.objects.values_list('cpf', flat=True)),
+            {'12345678909', '11111111111', '44444444444'}
+        )
+        erros = {rejeitado['linha']: rejeitado['erros'] for rejeitado in rejeitados}
+        self.assertEqual(sorted(erros), [2, 3, 4, 6])
+        self.assertEqual(erros[2], {'cpf': [CPF_DUPLICADO]})
+        self.assertEqual(erros[3], {'email': [EMAIL_DUPLICADO]})
+        self.assertIn('email', erros[4])
+        self.assertEqual(erros[6], {'cpf': [CPF_DUPLICADO]})
+
+    def test_importar_ndjson(self):
+        linhas = [
+            {'cpf': '11111111111', 'nome': 'Ana', 'email': 'ana@gmail.com',
+             'dataDeNascimento': '1990-01-01', 'sexo': 'F', 'rendaMensal': '1000.00'},
+            {'cpf': '22222222222', 'nome': 'Beto', 'email': 'ana@gmail.com',
+             'dataDeNascimento': '1990-01-01', 'sexo': 'M', 'rendaMensal': '1000.00'},
+        ]
+        conteudo = ''.join(json.dumps(linha) + '\n' for linha in linhas)
+        rejeitados = self.importar('clientes.ndjson', conteudo)
+
+        self.assertTrue(Cliente.objects.filter(cpf='11111111111').exists())
+        self.assertEqual(rejeitados, [{'linha': 2, 'dados': linhas[1], 'erros': {'email': [EMAIL_DUPLICADO]}}])
+
+    def test_ndjson_com_linhas_corrompidas_e_em_branco(self):
+        """
+        Dado um NDJSON com uma linha truncada e linhas em branco entre clientes válidos
+        Quando ele for importado
+        Então verifique se os válidos são gravados, a truncada vai para os rejeitados e as em branco são puladas
+        """
+        validos = [
+            {'cpf': f'{indice}' * 11, 'nome': 'Cliente', 'email': f'cliente{indice}@gmail.com',
+             'dataDeNascimento': '1990-01-01', 'sexo': 'F', 'rendaMensal': '1000.00'}
+            for indice in (1, 2)
+        ]
+        conteudo = json.dumps(validos[0]) + '\n\n{"cpf": "333\n  \n' + json.dumps(validos[1]) + '\n'
+        rejeitados = self.importar('clientes.ndjson', conteudo)
+
+        self.assertEqual(Cliente.objects.filter(cpf__in=['11111111111', '22222222222']).count(), 2)
+        self.assertEqual(len(rejeitados), 1)
+        self.assertEqual(rejeitados[0]['linha'], 3)
+        self.assertEqual(rejeitados[0]['dados'], '{"cpf": "333')
+        self.assertTrue(rejeitados[0]['erros']['non_field_errors'][0].startswith(JSON_INVALIDO.split('{')[0]))
@@ -1,15 +1,30 @@
+import hashlib
+import io
 import json
+import uuid
 from datetime import date, timedelta
+from unittest.mock import patch
 
 from rest_framework import status
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DatabaseError, connection
 from django.test import Client as App  # Para evitar confusões com o Cliente
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from api.models import Cliente, ContratacaoPlano
+from api.models import (
+    Cliente, Produto, ContratacaoPlano, AporteExtra, Resgate, Movimentacao, ChaveIdempotencia, Tarefa,
+)
+from api.tarefas import enfileirar, processar_pendentes
 from api.tests.tests_unit import BaseTestCase
 from api.error_messages import (
     PRAZO_EXPIRADO, APORTE_MINIMO, IDADE_INVALIDA, APORTE_EXTRA_MINIMO,
     APORTE_INSUFICIENTE, CARENCIA_INICIAL, CARENCIA_ENTRE_RESGATES,
+    PRODUTO_INEXISTENTE, PLANO_INEXISTENTE, IDEMPOTENCIA_REUTILIZADA, IDEMPOTENCIA_CHAVE_LONGA,
+    CAMPOS_INEXISTENTES,
 )
 
 app = App()
@@ -38,6 +53,181 @@ class ClienteIntegrationTest(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_listagem_paginada_por_cursor(self):
+        for numero in range(3):
+            Cliente.objects.create(
+                cpf=f'1111111111{numero}', nome='Cliente', email=f'cliente{numero}@gmail.com',
+                dataDeNascimento=self.data_nascimento, sexo='F', rendaMensal=2500.00
+            )
+        response = app.get(reverse('cliente-list'), {'page_size': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertNotIn('count', response.data)
+
+        proxima_pagina = app.get(response.data['next'])
+        self.assertEqual(len(proxima_pagina.data['results']), 1)
+        self.assertIsNone(proxima_pagina.data['next'])
+        ids = [cliente['id'] for cliente in response.data['results'] + proxima_pagina.data['results']]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_projecao(self):
+        response = app.get(
+            reverse('cliente-projecao', args=[self.cliente.id]), {'taxas': '0,0.06', 'aporteMensal': '0'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['taxas'], [0.0, 0.06])
+        plano, = response.data['planos']
+        self.assertEqual(plano['idPlano'], self.contratacao.id)
+        self.assertEqual(plano['saldoAtual'], '2500.00')
+        self.assertEqual(plano['projecoes'][0], '2500.00')
+        self.assertGreater(float(plano['projecoes'][1]), 2500)
+
+    def test_projecao_taxas_invalidas(self):
+        response = app.get(reverse('cliente-projecao', args=[self.cliente.id]), {'taxas': 'seis'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_projecao_taxas_nao_finitas(self):
+        """
+        Dado taxas nan e inf, que o float() do Python aceita
+        Quando a projeção é pedida com elas
+        Então verifique que a resposta é 400, e não um erro ao renderizar o JSON
+        """
+        for taxas in ('nan,inf', 'nan', '-inf', '0.06,inf'):
+            with self.subTest(taxas=taxas):
+                response = app.get(reverse('cliente-projecao', args=[self.cliente.id]), {'taxas': taxas})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('taxas', response.json())
+
+    def test_produtos_elegiveis(self):
+        """
+        Dado um produto expirado, um vigente e um vigente com idade de entrada acima da do cliente
+        Quando os produtos elegíveis do cliente são consultados
+        Então verifique que só o produto vigente compatível com a idade volta
+        """
+        hoje = date.today()
+        vigente = Produto.objects.create(
+            nome='Vigente', susep='1', expiracaoDeVenda=hoje, valorMinimoAporteInicial=1000,
+            valorMinimoAporteExtra=100, idadeDeEntrada=18, idadeDeSaida=self.cliente.get_idade(hoje),
+            carenciaInicialDeResgate=60, carenciaEntreResgates=30
+        )
+        Produto.objects.create(
+            nome='Sênior', susep='2', expiracaoDeVenda=hoje, valorMinimoAporteInicial=1000,
+            valorMinimoAporteExtra=100, idadeDeEntrada=self.cliente.get_idade(hoje) + 1, idadeDeSaida=80,
+            carenciaInicialDeResgate=60, carenciaEntreResgates=30
+        )
+        with self.assertNumQueries(2):
+            response = app.get(reverse('cliente-produtos-elegiveis', args=[self.cliente.id]), {'fields': 'id,nome'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': str(vigente.id), 'nome': 'Vigente'}])
+
+    def test_posicao(self):
+        """
+        Dado um cliente com um plano, dois aportes extras e um resgate
+        Quando a posição consolidada é consultada
+        Então verifique que os totais do plano vêm de uma única query
+        """
+        for _ in range(2):
+            AporteExtra.objects.create(
+                idCliente=self.cliente, idPlano=self.contratacao, valorAporte=self.valor_minimo_aporte_extra
+            )
+        Resgate.objects.create(idPlano=self.contratacao, valorResgate=300)
+
+        with self.assertNumQueries(1):
+            response = app.get(reverse('cliente-posicao', args=[self.cliente.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['nome'], self.cliente.nome)
+        plano, = response.data['planos']
+        total_extras = 2 * self.valor_minimo_aporte_extra
+        self.assertEqual(plano['nomeProduto'], self.produto.nome)
+        self.assertEqual(plano['totalAportesExtras'], f'{total_extras:.2f}')
+        self.assertEqual(plano['totalResgatado'], '300.00')
+        self.assertEqual(plano['saldo'], f'{2500 + total_extras - 300:.2f}')
+        self.assertEqual(plano['dataUltimoResgate'], str(date.today()))
+
+    def test_posicao_sem_planos(self):
+        outro = Cliente.objects.create(
+            cpf='11111111111', nome='Sem Planos', email='semplanos@gmail.com',
+            dataDeNascimento=self.data_nascimento, sexo='F', rendaMensal=2500.00
+        )
+        response = app.get(reverse('cliente-posicao', args=[outro.id]))
+        self.assertEqual(response.data, {'idCliente': str(outro.id), 'nome': 'Sem Planos', 'planos': []})
+        response = app.get(reverse('cliente-posicao', args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_exportar_ndjson(self):
+        response = app.get(reverse('cliente-exportar'), {'format': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        linhas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(linhas), 1)
+        cliente = json.loads(linhas[0])
+        self.assertEqual(cliente['id'], str(self.cliente.id))
+        self.assertEqual(cliente['rendaMensal'], '3500.00')
+        self.assertEqual(cliente['dataDeNascimento'], str(self.data_nascimento))
+
+    def test_exportar_csv(self):
+        response = app.get(reverse('contratacaoplano-exportar'), {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        linhas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(linhas[0], 'id,idCliente,idProduto,aporte,dataDaContratacao')
+        self.assertEqual(
+            linhas[1],
+            f'{self.contratacao.id},{self.cliente.id},{self.produto.id},2500.00,{self.data_contratacao}'
+        )
+
+    def test_campos_esparsos(self):
+        """
+        Dado a listagem de clientes com ?fields=id,nome
+        Quando ela é consultada
+        Então verifique que só esses campos voltam e que o SQL não busca as demais colunas
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = app.get(reverse('cliente-list'), {'fields': 'id,nome'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'nome'})
+        self.assertNotIn('email', queries[0]['sql'])
+
+        response = app.get(reverse('cliente-detail', kwargs={'pk': self.cliente.id}), {'exclude': 'email,cpf'})
+        self.assertNotIn('email', response.data)
+        self.assertNotIn('cpf', response.data)
+        self.assertEqual(response.data['nome'], self.cliente.nome)
+
+    def test_campos_esparsos_inexistentes(self):
+        response = app.get(reverse('cliente-list'), {'fields': 'id,senha'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['fields'], CAMPOS_INEXISTENTES.format('senha'))
+
+    def test_detalhe_condicional(self):
+        """
+        Dado o detalhe de um cliente já lido, com ETag e Last-Modified
+        Quando o cliente é lido de novo com If-None-Match
+        Então verifique que a resposta é 304 com uma única consulta, e 200 depois de uma alteração
+        """
+        url = reverse('cliente-detail', kwargs={'pk': self.cliente.id})
+        response = app.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('max-age', response['Cache-Control'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = app.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        self.cliente.rendaMensal = 4000
+        self.cliente.save()
+        response = app.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detalhe_condicional_inexistente(self):
+        response = app.get(reverse('cliente-detail', kwargs={'pk': uuid.uuid4()}), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', response)
+
 
 class ProdutoIntegrationTest(BaseTestCase):
     def setUp(self):
@@ -57,6 +247,45 @@ class ProdutoIntegrationTest(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_listagem_condicional(self):
+        """
+        Dado a listagem de produtos já lida, com ETag
+        Quando ela é lida de novo com If-None-Match
+        Então verifique que a resposta é 304 só com a consulta da versão, e 200 depois de um produto novo
+        """
+        response = app.get(reverse('produto-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = app.get(reverse('produto-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(app.get(reverse('produto-list'), {'page_size': 1})['ETag'], etag)
+
+        app.post(reverse('produto-list'), data=json.dumps(self.novo_produto_valido), content_type='application/json')
+        response = app.get(reverse('produto-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_listagem_condicional_entre_workers(self):
+        """
+        Dado a listagem de produtos já lida, com ETag
+        Quando um produto é alterado e apagado por outro worker, cuja invalidação não chega ao cache deste
+        Então verifique que a listagem deixa de responder 304 nos dois casos
+        """
+        outro = Produto.objects.create(**{**self.novo_produto_valido, 'expiracaoDeVenda': self.expiracao_venda})
+        etag = app.get(reverse('produto-list'))['ETag']
+        with patch('api.signals.invalidar_produtos'):
+            self.produto.nome = 'Produto alterado'
+            self.produto.save()
+            response = app.get(reverse('produto-list'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            etag = response['ETag']
+            outro.delete()
+            response = app.get(reverse('produto-list'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
 
 class ContratacaoPlanoIntegrationTest(BaseTestCase):
     def setUp(self):
@@ -150,6 +379,101 @@ class ContratacaoPlanoIntegrationTest(BaseTestCase):
             )
         )
 
+    def test_listagem_filtrada(self):
+        """
+        Dado planos de dois clientes
+        Quando a listagem é filtrada por cliente e data de contratação
+        Então verifique que só os planos do cliente a partir da data voltam
+        """
+        outro = Cliente.objects.create(
+            cpf='11111111111', nome='Outro', email='outro@gmail.com',
+            dataDeNascimento=self.data_nascimento, sexo='F', rendaMensal=2500.00
+        )
+        ContratacaoPlano.objects.bulk_create([
+            ContratacaoPlano(
+                idCliente=outro, idProduto=self.produto, aporte=2500, dataDaContratacao=self.data_contratacao
+            ),
+            ContratacaoPlano(
+                idCliente=self.cliente, idProduto=self.produto, aporte=2500,
+                dataDaContratacao=self.data_contratacao - timedelta(days=30)
+            ),
+        ])
+        response = app.get(reverse('contratacaoplano-list'), {
+            'idCliente': self.cliente.id, 'dataDaContratacao__gte': self.data_contratacao,
+        })
+        self.assertEqual([plano['id'] for plano in response.data['results']], [str(self.contratacao.id)])
+
+        response = app.get(reverse('contratacaoplano-list'), {'dataDaContratacao__gte': 'ontem'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('filtros', response.data)
+
+    def test_add_contratacao_em_lote(self):
+        produto_inexistente = dict(self.nova_contratacao_valida, idProduto=str(uuid.uuid4()))
+        response = app.post(
+            reverse('contratacaoplano-bulk'),
+            data=json.dumps([
+                self.nova_contratacao_valida,
+                self.nova_contratacao_aporte_invalido,
+                produto_inexistente,
+                self.nova_contratacao_menor_idade,
+            ]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['criados']), 1)
+        self.assertEqual(
+            [erro['indice'] for erro in response.data['erros']], [1, 2, 3]
+        )
+        self.assertEqual(response.data['erros'][1]['error'], PRODUTO_INEXISTENTE)
+        self.assertEqual(ContratacaoPlano.objects.filter(idCliente=self.cliente).count(), 2)
+
+    def test_add_contratacao_em_lote_sem_validos(self):
+        response = app.post(
+            reverse('contratacaoplano-bulk'),
+            data=json.dumps([self.nova_contratacao_data_expirada]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['erros'], [{'indice': 0, 'error': PRAZO_EXPIRADO}])
+
+    @override_settings(CONTRATACOES_LOTE_MAX_ITENS=2)
+    def test_add_contratacao_em_lote_acima_do_limite(self):
+        """
+        Dado um limite de dois itens por lote
+        Quando um lote de três é enviado, síncrono e enfileirado
+        Então verifique que os dois são recusados com 400, sem contratar nem enfileirar nada
+        """
+        for parametros in ('', '?assincrono=true'):
+            with self.subTest(parametros=parametros):
+                response = app.post(
+                    reverse('contratacaoplano-bulk') + parametros,
+                    data=json.dumps([self.nova_contratacao_valida] * 3),
+                    content_type='application/json'
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ContratacaoPlano.objects.count(), 1)
+        self.assertFalse(Tarefa.objects.exists())
+
+    def test_movimentacoes_nao_sao_alteradas_nem_apagadas(self):
+        """
+        Dado um plano, um aporte extra e um resgate
+        Quando alguém tenta alterá-los ou apagá-los pela API
+        Então verifique que a resposta é 405 e o extrato continua como estava
+        """
+        aporte = AporteExtra.objects.create(
+            idCliente=self.cliente, idPlano=self.contratacao, valorAporte=self.valor_minimo_aporte_extra
+        )
+        resgate = Resgate.objects.create(idPlano=self.contratacao, valorResgate=300)
+        extrato = list(Movimentacao.objects.values_list('tipo', 'valor'))
+        for rota, instancia in (('contratacaoplano-detail', self.contratacao), ('aporteextra-detail', aporte),
+                                ('resgate-detail', resgate)):
+            url = reverse(rota, args=[instancia.id])
+            for metodo in (app.put, app.patch, app.delete):
+                with self.subTest(rota=rota, metodo=metodo.__name__):
+                    response = metodo(url, data=json.dumps({}), content_type='application/json')
+                    self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(list(Movimentacao.objects.values_list('tipo', 'valor')), extrato)
+
 
 class AporteExtraIntegrationTest(BaseTestCase):
     def setUp(self):
@@ -253,3 +577,190 @@ class ResgateIntegrationTest(BaseTestCase):
             response2.data['error'],
             CARENCIA_ENTRE_RESGATES.format(self.produto.carenciaEntreResgates)
         )
+
+
+class IdempotenciaIntegrationTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.aporte_extra = {
+            'idCliente': str(self.cliente.id), 'idPlano': str(self.contratacao.id),
+            'valorAporte': self.valor_minimo_aporte_extra
+        }
+
+    def post_aporte(self, dados, chave):
+        return app.post(
+            reverse('aporteextra-list'),
+            data=json.dumps(dados),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=chave
+        )
+
+    def test_repeticao_devolve_a_mesma_resposta(self):
+        """
+        Dado um aporte extra enviado com Idempotency-Key
+        Quando o cliente repete a requisição com a mesma chave
+        Então verifique que a resposta é a mesma e que só um aporte foi criado
+        """
+        response1 = self.post_aporte(self.aporte_extra, 'chave-1')
+        with self.assertNumQueries(1):
+            response2 = self.post_aporte(self.aporte_extra, 'chave-1')
+
+        self.assertEqual(response2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response2.json(), response1.json())
+        self.assertEqual(response2['Idempotent-Replayed'], 'true')
+        self.assertEqual(AporteExtra.objects.count(), 1)
+        self.assertEqual(Movimentacao.objects.filter(tipo=Movimentacao.OpcoesTipo.APORTE_EXTRA).count(), 1)
+
+    def test_chave_reutilizada_com_outro_conteudo(self):
+        """
+        Dado um aporte extra já enviado com uma chave
+        Quando outra requisição usa a mesma chave com outro valor
+        Então verifique que ela é recusada sem criar um novo aporte
+        """
+        self.post_aporte(self.aporte_extra, 'chave-1')
+        response = self.post_aporte({**self.aporte_extra, 'valorAporte': 200}, 'chave-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(response.data['error'], IDEMPOTENCIA_REUTILIZADA)
+        self.assertEqual(AporteExtra.objects.count(), 1)
+
+    def test_chave_sem_resposta_e_retomada(self):
+        """
+        Dado uma chave gravada sem resposta por uma requisição interrompida
+        Quando o cliente repete a requisição
+        Então verifique que ela é processada em vez de ficar em 409 até o TTL
+        """
+        corpo = json.dumps(self.aporte_extra).encode()
+        ChaveIdempotencia.objects.create(
+            chave='chave-1', rota='aporteextra-create', hashRequisicao=hashlib.sha256(corpo).hexdigest()
+        )
+        response = self.post_aporte(self.aporte_extra, 'chave-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(AporteExtra.objects.count(), 1)
+        self.assertEqual(ChaveIdempotencia.objects.get().statusCode, status.HTTP_201_CREATED)
+
+    def test_falha_depois_da_escrita_desfaz_tudo(self):
+        """
+        Dado um aporte extra com chave cuja resposta não consegue ser gravada
+        Quando a requisição falha depois de criar o aporte
+        Então verifique que nem o aporte, nem o extrato, nem a chave ficam gravados
+        """
+        with patch.object(ChaveIdempotencia, 'save', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.post_aporte(self.aporte_extra, 'chave-1')
+        self.assertFalse(AporteExtra.objects.exists())
+        self.assertFalse(Movimentacao.objects.filter(tipo=Movimentacao.OpcoesTipo.APORTE_EXTRA).exists())
+        self.assertFalse(ChaveIdempotencia.objects.exists())
+
+    def test_erro_libera_a_chave(self):
+        """
+        Dado um aporte extra inválido enviado com uma chave
+        Quando a validação falha
+        Então verifique que a chave não fica gravada e pode ser usada na nova tentativa
+        """
+        response = self.post_aporte({**self.aporte_extra, 'valorAporte': 1}, 'chave-1')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ChaveIdempotencia.objects.exists())
+
+    def test_limpar_chaves_expiradas(self):
+        """
+        Dado uma chave gravada há mais tempo que o TTL
+        Quando o comando de limpeza roda
+        Então verifique que só ela é apagada
+        """
+        self.post_aporte(self.aporte_extra, 'chave-antiga')
+        self.post_aporte(self.aporte_extra, 'chave-nova')
+        ChaveIdempotencia.objects.filter(chave='chave-antiga').update(
+            criadoEm=timezone.now() - timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS + 1)
+        )
+        call_command('limpar_idempotencia', stdout=io.StringIO())
+        self.assertEqual(list(ChaveIdempotencia.objects.values_list('chave', flat=True)), ['chave-nova'])
+
+    def test_chave_expirada_vale_como_nova(self):
+        """
+        Dado uma chave gravada há mais tempo que o TTL e ainda não apagada pela limpeza
+        Quando o cliente envia um aporte com a mesma chave
+        Então verifique que ele é processado como novo, sem repetir a resposta antiga
+        """
+        self.post_aporte(self.aporte_extra, 'chave-1')
+        ChaveIdempotencia.objects.update(
+            criadoEm=timezone.now() - timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS + 1)
+        )
+        response = self.post_aporte(self.aporte_extra, 'chave-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(AporteExtra.objects.count(), 2)
+        self.assertEqual(ChaveIdempotencia.objects.get().resposta['id'], response.json()['id'])
+
+    def test_chave_longa_demais(self):
+        """
+        Dado uma Idempotency-Key maior que a coluna
+        Quando o aporte é enviado com ela
+        Então verifique que a resposta é 400, e não um erro do banco, sem criar o aporte
+        """
+        response = self.post_aporte(self.aporte_extra, 'c' * 256)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], IDEMPOTENCIA_CHAVE_LONGA.format(255))
+        self.assertFalse(AporteExtra.objects.exists())
+
+    def test_limpeza_pelo_worker(self):
+        """
+        Dado uma chave expirada
+        Quando a tarefa limpar_idempotencia é executada pelo worker
+        Então verifique que a chave é apagada
+        """
+        self.post_aporte(self.aporte_extra, 'chave-antiga')
+        ChaveIdempotencia.objects.update(
+            criadoEm=timezone.now() - timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS + 1)
+        )
+        tarefa = enfileirar('limpar_idempotencia')
+        processar_pendentes()
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.resultado, {'apagadas': 1})
+        self.assertFalse(ChaveIdempotencia.objects.exists())
+
+
+class SimulacaoIntegrationTest(BaseTestCase):
+    def test_simulacao_em_lote(self):
+        """
+        Dado um lote com contratações, aportes extras e resgates válidos e inválidos
+        Quando ele é simulado
+        Então verifique o resultado de cada item, com a mensagem da operação real, sem gravar nada
+        """
+        plano = str(self.contratacao.id)
+        data_resgate = self.data_contratacao + timedelta(days=self.produto.carenciaInicialDeResgate)
+        itens = [
+            {'tipo': 'CONTRATACAO', 'idCliente': str(self.cliente.id), 'idProduto': str(self.produto.id),
+             'valor': 2500, 'data': str(self.data_contratacao)},
+            {'tipo': 'CONTRATACAO', 'idCliente': str(self.cliente.id), 'idProduto': str(self.produto.id),
+             'valor': 10, 'data': str(self.data_contratacao)},
+            {'tipo': 'APORTE_EXTRA', 'idPlano': plano, 'valor': self.valor_minimo_aporte_extra},
+            {'tipo': 'APORTE_EXTRA', 'idPlano': plano, 'valor': 1},
+            {'tipo': 'RESGATE', 'idPlano': plano, 'valor': 100, 'data': str(data_resgate)},
+            {'tipo': 'RESGATE', 'idPlano': plano, 'valor': 100, 'data': str(self.data_contratacao)},
+            {'tipo': 'RESGATE', 'idPlano': plano, 'valor': 5000, 'data': str(data_resgate)},
+            {'tipo': 'RESGATE', 'idPlano': str(uuid.uuid4()), 'valor': 100},
+        ]
+        with self.assertNumQueries(3):
+            response = app.post(reverse('simulacao-list'), data=json.dumps(itens), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([resultado['aceito'] for resultado in response.data], [
+            True, False, True, False, True, False, False, False
+        ])
+        self.assertEqual([resultado['error'] for resultado in response.data if not resultado['aceito']], [
+            APORTE_MINIMO,
+            APORTE_EXTRA_MINIMO,
+            CARENCIA_INICIAL.format(self.produto.carenciaInicialDeResgate),
+            APORTE_INSUFICIENTE,
+            PLANO_INEXISTENTE,
+        ])
+        self.assertEqual(ContratacaoPlano.objects.count(), 1)
+        self.assertFalse(AporteExtra.objects.exists())
+        self.assertFalse(Resgate.objects.exists())
+
+    def test_simulacao_sem_plano(self):
+        response = app.post(
+            reverse('simulacao-list'), data=json.dumps([{'tipo': 'RESGATE', 'valor': 100}]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('idPlano', response.data[0])
@@ -0,0 +1,141 @@
+import uuid
+from datetime import date, datetime, timezone as tz
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import Client as App  # Para evitar confusões com o Cliente
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Cliente, AporteExtra, Resgate, Tarefa
+from api.renderers import ORJSONRenderer
+from api.serializers import ClienteSerializer, conversores_de_leitura, serializar_linhas
+from api.tests.tests_unit import BaseTestCase
+from api.views import ListagemRapidaMixin
+
+app = App()
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    def test_mesma_saida_do_json_renderer(self):
+        """
+        Dado dados com unicode, separadores de linha U+2028/U+2029, Decimal, datas, UUID e aninhamentos
+        Quando renderizados pelo ORJSONRenderer
+        Então verifique que os bytes são os mesmos do JSONRenderer do DRF
+        """
+        dados = [
+            None, True, 0, -12, 2 ** 64, 1.5, 0.1 + 0.2, 2500.0, 1e-05, 1e16, {'taxas': [0.00001], 'saldo': [1e16]},
+            'José\u2028Henriques\u2029', '"aspas" e \\barra\n', Decimal('3500.00'), Decimal('1E-5'), uuid.uuid4(),
+            date(2022, 9, 15),
+            datetime(2023, 1, 1, 12, 30, 15, 123456, tzinfo=tz.utc), datetime(2023, 1, 1, 12, 30),
+            {'results': [{'id': 1, 'nome': 'ação'}], 'next': None}, ('tupla', 1), [], {},
+        ]
+        for dado in dados:
+            with self.subTest(dado=dado):
+                self.assertEqual(ORJSONRenderer().render(dado), JSONRenderer().render(dado))
+
+    def test_nan_recusado_como_no_json_renderer(self):
+        """
+        Dado um NaN nos dados
+        Quando renderizado pelo ORJSONRenderer
+        Então verifique que ele é recusado como no JSONRenderer, e não vira null
+        """
+        for renderer in (ORJSONRenderer, JSONRenderer):
+            with self.subTest(renderer=renderer.__name__), self.assertRaises(ValueError):
+                renderer().render({'saldo': [float('nan')]})
+
+    def test_indentacao_usa_o_json_renderer(self):
+        """
+        Dado um pedido com ; indent=4, como o da API navegável
+        Quando renderizado pelo ORJSONRenderer
+        Então verifique que a saída indentada é a do JSONRenderer
+        """
+        dado = {'nome': 'José', 'valores': [1, 2]}
+        tipo = 'application/json; indent=4'
+        self.assertEqual(ORJSONRenderer().render(dado, tipo), JSONRenderer().render(dado, tipo))
+
+
+class ListagemRapidaTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        Cliente.objects.create(
+            cpf='98765432198', nome='Maria\u2028Conceição', email='mc@gmail.com',
+            dataDeNascimento=date(1980, 1, 1), sexo='F', rendaMensal=Decimal('1234.5')
+        )
+        AporteExtra.objects.create(
+            idCliente=self.cliente, idPlano=self.contratacao, valorAporte=self.valor_minimo_aporte_extra
+        )
+        Resgate.objects.create(idPlano=self.contratacao, valorResgate=300)
+        Tarefa.objects.create(tipo='compactar_saldos', parametros={}, resultado={'atualizados': 1})
+
+    def assertMesmaListagem(self, url, **parametros):
+        rapida = app.get(url, parametros)
+        with patch.object(ListagemRapidaMixin, 'listagem_rapida', False):
+            normal = app.get(url, parametros)
+        self.assertEqual(rapida.status_code, 200)
+        self.assertEqual(rapida.content, normal.content)
+
+    def test_listagens_identicas(self):
+        """
+        Dado registros de todos os recursos
+        Quando listados pela leitura rápida e pelo ModelSerializer
+        Então verifique que as respostas são as mesmas, byte a byte
+        """
+        for rota in ('cliente-list', 'produto-list', 'contratacaoplano-list', 'aporteextra-list',
+                     'resgate-list', 'tarefa-list'):
+            with self.subTest(rota=rota):
+                self.assertMesmaListagem(reverse(rota))
+
+    def test_listagens_identicas_com_recorte_e_paginacao(self):
+        """
+        Dado dois clientes
+        Quando listados com ?fields= sem o id, ?exclude= e uma página de um registro
+        Então verifique que as respostas e o cursor da próxima página são os mesmos
+        """
+        self.assertMesmaListagem(reverse('cliente-list'), fields='nome,rendaMensal')
+        self.assertMesmaListagem(reverse('cliente-list'), exclude='cpf', page_size=1)
+        proxima = app.get(reverse('cliente-list'), {'page_size': 1, 'fields': 'nome'}).json()['next']
+        self.assertMesmaListagem(proxima)
+
+    def test_projecao_com_floats(self):
+        """
+        Dado taxas que o float do Python escreve com expoente
+        Quando a projeção é pedida
+        Então verifique que o corpo é o mesmo que o JSONRenderer geraria
+        """
+        response = app.get(reverse('cliente-projecao', args=[self.cliente.id]), {'taxas': '0.00001,0.06'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'1e-05', response.content)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_listagem_em_uma_consulta(self):
+        """
+        Dado clientes cadastrados
+        Quando listados
+        Então verifique que a leitura rápida faz uma só consulta
+        """
+        with self.assertNumQueries(1):
+            response = app.get(reverse('cliente-list'))
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_serializer_com_campo_calculado_nao_e_compilado(self):
+        """
+        Dado um serializer com um campo que não é coluna do model
+        Quando os conversores de leitura são compilados
+        Então verifique que não há caminho rápido para ele
+        """
+        class ComIdade(ClienteSerializer):
+            idade = serializers.IntegerField(source='get_idade', read_only=True)
+
+            class Meta(ClienteSerializer.Meta):
+                pass
+
+        self.assertIsNone(conversores_de_leitura(ComIdade()))
+        campos = conversores_de_leitura(ClienteSerializer())
+        linhas = Cliente.objects.order_by('id').values(*(coluna for _, coluna, _ in campos))
+        self.assertEqual(
+            serializar_linhas(campos, linhas),
+            ClienteSerializer(Cliente.objects.order_by('id'), many=True).data
+        )
@@ -0,0 +1,95 @@
+import json
+import uuid
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test import Client as App
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from api.tests.tests_unit import BaseTestCase
+
+app = App()
+
+
+def valor(nome, **rotulos):
+    return REGISTRY.get_sample_value(nome, rotulos) or 0
+
+
+class MetricasTest(BaseTestCase):
+    def test_requisicoes_por_acao(self):
+        rotulos = {'basename': 'cliente', 'action': 'retrieve'}
+        antes = valor('api_requisicao_duracao_segundos_count', **rotulos)
+        app.get(reverse('cliente-detail', args=[self.cliente.id]))
+        self.assertEqual(valor('api_requisicao_duracao_segundos_count', **rotulos), antes + 1)
+        self.assertGreaterEqual(
+            valor('api_requisicoes_total', method='GET', status='200', **rotulos), 1
+        )
+
+    def test_rejeicoes_por_erro(self):
+        antes = valor('api_regras_rejeitadas_total', erro='APORTE_EXTRA_MINIMO')
+        app.post(
+            reverse('aporteextra-list'),
+            data=json.dumps({
+                'idCliente': str(self.cliente.id), 'idPlano': str(self.contratacao.id), 'valorAporte': 1
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(valor('api_regras_rejeitadas_total', erro='APORTE_EXTRA_MINIMO'), antes + 1)
+
+    def test_rejeicoes_da_contratacao_em_lote(self):
+        """
+        Dado um lote com um item válido, um abaixo do aporte mínimo e um de produto inexistente
+        Quando ele é contratado pelo /bulk/ e depois simulado
+        Então verifique que cada item rejeitado conta uma vez pelo seu erro, e a simulação não conta
+        """
+        item = {
+            'idCliente': str(self.cliente.id), 'idProduto': str(self.produto.id),
+            'aporte': self.valor_minimo_aporte_inicial, 'dataDaContratacao': str(self.data_contratacao),
+        }
+        itens = [item, {**item, 'aporte': 1}, {**item, 'idProduto': str(uuid.uuid4())}]
+        antes = {erro: valor('api_regras_rejeitadas_total', erro=erro)
+                 for erro in ('APORTE_MINIMO', 'PRODUTO_INEXISTENTE')}
+        response = app.post(reverse('contratacaoplano-bulk'), data=json.dumps(itens), content_type='application/json')
+        self.assertEqual(len(response.json()['erros']), 2)
+        simulacao = app.post(reverse('simulacao-list'), data=json.dumps([
+            {'tipo': 'CONTRATACAO', 'idCliente': item['idCliente'], 'idProduto': item['idProduto'], 'valor': 1,
+             'data': item['dataDaContratacao']},
+        ]), content_type='application/json')
+        self.assertFalse(simulacao.json()[0]['aceito'])
+        for erro, anterior in antes.items():
+            with self.subTest(erro=erro):
+                self.assertEqual(valor('api_regras_rejeitadas_total', erro=erro), anterior + 1)
+
+    def test_endpoint_metrics(self):
+        app.get(reverse('produto-list'))
+        response = app.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'api_requisicoes_total{action="list",basename="produto",method="GET",status="200"}',
+            response.content.decode()
+        )
+
+    def test_diretorio_multiprocesso_inexistente(self):
+        """
+        Dado PROMETHEUS_MULTIPROC_DIR apontando para um diretório que ainda não existe
+        Quando a aplicação sobe fora do gunicorn e atende um ViewSet
+        Então verifique que o diretório é criado e as métricas são gravadas nele
+        """
+        with tempfile.TemporaryDirectory() as raiz:
+            diretorio = os.path.join(raiz, 'prometheus')
+            codigo = (
+                'from django.test import Client; '
+                'r = Client().post("/api/simulacoes/", data="[]", content_type="application/json"); '
+                'print(r.status_code, Client().get("/metrics").status_code)'
+            )
+            resultado = subprocess.run(
+                [sys.executable, 'manage.py', 'shell', '-c', codigo],
+                cwd=settings.BASE_DIR, env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': diretorio},
+                capture_output=True, text=True,
+            )
+            self.assertEqual(resultado.stdout.split(), ['200', '200'], resultado.stderr)
+            self.assertTrue(os.listdir(diretorio))
@@ -0,0 +1,51 @@
+from django.http import HttpResponse
+from django.test import Client as App, override_settings
+from django.urls import path, reverse
+
+from api.models import Cliente
+from api.tests.tests_unit import BaseTestCase
+
+
+def view_n_mais_um(request):
+    planos = [cliente.contratacaoplano_set.count() for cliente in Cliente.objects.all()]
+    return HttpResponse(str(sum(planos)))
+
+
+urlpatterns = [
+    path('n-mais-um/', view_n_mais_um),
+]
+
+
+class InstrumentacaoMiddlewareTest(BaseTestCase):
+    @override_settings(INSTRUMENTACAO=False)
+    def test_desligado(self):
+        response = App().get(reverse('cliente-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(INSTRUMENTACAO=True)
+    def test_server_timing(self):
+        response = App().get(reverse('cliente-detail', args=[self.cliente.id]))
+        metricas = response['Server-Timing']
+        self.assertIn('db;dur=', metricas)
+        self.assertIn('desc="1 queries"', metricas)
+        self.assertIn('total;dur=', metricas)
+        self.assertNotIn('nplus1', metricas)
+
+    @override_settings(
+        INSTRUMENTACAO=True, INSTRUMENTACAO_LIMITE_REPETICOES=3, ROOT_URLCONF='api.tests.tests_middleware'
+    )
+    def test_aponta_n_mais_um(self):
+        """
+        Dada uma requisição que repete a mesma query,
+        Quando ela for instrumentada,
+        Então verifique se o formato repetido aparece no Server-Timing
+        """
+        for numero in range(3):
+            Cliente.objects.create(
+                cpf=f'1111111111{numero}', nome='Cliente', email=f'cliente{numero}@gmail.com',
+                dataDeNascimento=self.data_nascimento, sexo='F', rendaMensal=2500.00
+            )
+        with self.assertLogs('api.middleware', level='WARNING'):
+            response = App().get('/n-mais-um/')
+        self.assertIn('desc="5 queries"', response['Server-Timing'])
+        self.assertIn('nplus1;desc="4x SELECT COUNT(*)', response['Server-Timing'])
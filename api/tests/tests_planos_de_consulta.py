@@ -0,0 +1,78 @@
+from unittest import skipUnless
+
+from django.db import connection, transaction
+from django.test import Client as App  # Para evitar confusões com o Cliente
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.models import AporteExtra, Resgate, ChaveIdempotencia
+from api.relatorios import atualizar_agregados
+from api.tests.tests_unit import BaseTestCase
+
+app = App()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Os planos de execução são os do PostgreSQL')
+class PlanosDeConsultaTest(BaseTestCase):
+    """
+    Roda EXPLAIN em cada query dos caminhos quentes com enable_seqscan desligado: assim o planejador
+    só escolhe um Seq Scan quando nenhum índice atende a query, e o resultado não depende do volume
+    de dados da base de testes
+    """
+
+    def setUp(self):
+        super().setUp()
+        AporteExtra.objects.create(
+            idCliente=self.cliente, idPlano=self.contratacao, valorAporte=self.valor_minimo_aporte_extra
+        )
+        Resgate.objects.create(idPlano=self.contratacao, valorResgate=100)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsaIndices(self, funcao):
+        with CaptureQueriesContext(connection) as queries:
+            funcao()
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN {sql}')
+                plano = '\n'.join(linha for linha, in cursor.fetchall())
+            self.assertNotIn('Seq Scan', plano, f'\n{sql}\n{plano}')
+
+    def test_contratacoes_por_cliente_e_data(self):
+        self.assertUsaIndices(lambda: app.get(reverse('contratacaoplano-list'), {
+            'idCliente': self.cliente.id, 'dataDaContratacao__gte': self.data_contratacao,
+        }))
+
+    def test_aportes_extras_por_plano(self):
+        self.assertUsaIndices(lambda: app.get(reverse('aporteextra-list'), {'idPlano': self.contratacao.id}))
+
+    def test_resgates_por_plano_e_data(self):
+        self.assertUsaIndices(lambda: app.get(reverse('resgate-list'), {
+            'idPlano': self.contratacao.id, 'dataDoResgate__gte': self.data_contratacao,
+        }))
+
+    def test_posicao(self):
+        self.assertUsaIndices(lambda: app.get(reverse('cliente-posicao', args=[self.cliente.id])))
+
+    def test_carencia_e_saldo_do_resgate(self):
+        def verificacoes_do_resgate():
+            with transaction.atomic():
+                self.contratacao.saldo_atual(travar=True)
+                self.contratacao.data_ultimo_resgate()
+        self.assertUsaIndices(verificacoes_do_resgate)
+
+    def test_chave_de_idempotencia(self):
+        self.assertUsaIndices(
+            lambda: ChaveIdempotencia.objects.filter(chave='chave', rota='resgate-create').first()
+        )
+
+    def test_produtos_elegiveis(self):
+        self.assertUsaIndices(lambda: app.get(reverse('cliente-produtos-elegiveis', args=[self.cliente.id])))
+
+    def test_relatorios(self):
+        atualizar_agregados(atraso=0)
+        intervalo = {'inicio': self.data_contratacao, 'fim': self.data_contratacao}
+        self.assertUsaIndices(lambda: app.get(reverse('relatorio-list'), intervalo))
+        self.assertUsaIndices(lambda: app.get(reverse('relatorio-list'), {**intervalo, 'idProduto': self.produto.id}))
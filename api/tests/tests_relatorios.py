@@ -0,0 +1,199 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db.models import Count, F, Sum
+from django.test import Client as App  # Para evitar confusões com o Cliente
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from api.error_messages import INTERVALO_INVALIDO, INTERVALO_LONGO
+from api.models import AgregadoDiario, AporteExtra, ContratacaoPlano, MarcaDagua, Movimentacao, Produto, Resgate
+from api.relatorios import PROCESSO, atualizar_agregados
+from api.serializers import RelatorioSerializer
+from api.tests.tests_unit import BaseTestCase
+
+app = App()
+
+
+class AgregadosDiariosTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        AporteExtra.objects.create(
+            idCliente=self.cliente, idPlano=self.contratacao, valorAporte=self.valor_minimo_aporte_extra
+        )
+        Resgate.objects.create(idPlano=self.contratacao, valorResgate=300)
+
+    def esperado(self):
+        """ O mesmo relatório calculado com GROUP BY sobre o extrato inteiro """
+        linhas = (
+            Movimentacao.objects
+            .values('tipo', 'data', produto=F('idPlano__idProduto'))
+            .annotate(quantidade=Count('id'), total=Sum('valor'))
+        )
+        return {(linha['produto'], linha['data'], linha['tipo']): (linha['quantidade'], abs(linha['total']))
+                for linha in linhas}
+
+    def agregados(self):
+        resultado = {}
+        for agregado in AgregadoDiario.objects.all():
+            for tipo, quantidade, valor in (
+                (Movimentacao.OpcoesTipo.APORTE_INICIAL, agregado.contratacoes, agregado.valorContratado),
+                (Movimentacao.OpcoesTipo.APORTE_EXTRA, agregado.aportesExtras, agregado.valorAportesExtras),
+                (Movimentacao.OpcoesTipo.RESGATE, agregado.resgates, agregado.valorResgatado),
+            ):
+                if quantidade:
+                    resultado[(agregado.idProduto_id, agregado.dia, tipo)] = (quantidade, valor)
+        return resultado
+
+    def test_agregados_iguais_ao_extrato(self):
+        """
+        Dado uma contratação e, em outro dia, um aporte extra e um resgate no extrato
+        Quando os agregados são atualizados
+        Então verifique que batem com o GROUP BY sobre o extrato e que a marca d'água avançou
+        """
+        self.assertEqual(atualizar_agregados(atraso=0), 2)
+        self.assertEqual(self.agregados(), self.esperado())
+        self.assertEqual(
+            MarcaDagua.objects.get(processo=PROCESSO).ultimaMovimentacao, Movimentacao.objects.latest('id').id
+        )
+
+    def test_atualizacao_incremental(self):
+        """
+        Dado agregados já atualizados
+        Quando rodam de novo sem movimentações novas e depois com um aporte extra novo
+        Então verifique que nada é somado duas vezes e que só o aporte novo entra
+        """
+        atualizar_agregados(atraso=0)
+        self.assertEqual(atualizar_agregados(atraso=0), 0)
+        AporteExtra.objects.create(idCliente=self.cliente, idPlano=self.contratacao, valorAporte=500)
+        self.assertEqual(atualizar_agregados(atraso=0), 1)
+        self.assertEqual(self.agregados(), self.esperado())
+        hoje = AgregadoDiario.objects.get(idProduto=self.produto, dia=date.today())
+        self.assertEqual(hoje.aportesExtras, 2)
+        self.assertEqual(hoje.valorAportesExtras, Decimal('700.00'))
+
+    def test_execucao_sem_novidades_nao_mexe_na_marca(self):
+        """
+        Dado agregados já atualizados
+        Quando rodam de novo sem movimentações novas
+        Então verifique que a marca d'água continua com o criadoEm da última movimentação e não é regravada
+        """
+        atualizar_agregados(atraso=0)
+        marca = MarcaDagua.objects.get(processo=PROCESSO)
+        self.assertEqual(marca.ultimaMovimentacaoEm, Movimentacao.objects.latest('id').criadoEm)
+
+        atualizar_agregados(atraso=0)
+        depois = MarcaDagua.objects.get(processo=PROCESSO)
+        self.assertEqual(
+            (depois.ultimaMovimentacaoEm, depois.atualizadoEm), (marca.ultimaMovimentacaoEm, marca.atualizadoEm)
+        )
+
+    def test_atraso_segura_movimentacoes_recentes(self):
+        """
+        Dado movimentações gravadas agora
+        Quando os agregados são atualizados com atraso de um minuto
+        Então verifique que elas ficam para a próxima execução
+        """
+        self.assertEqual(atualizar_agregados(atraso=60), 0)
+        self.assertFalse(AgregadoDiario.objects.exists())
+
+    def test_reconstruir(self):
+        """
+        Dado agregados adulterados
+        Quando reconstruídos pelo comando
+        Então verifique que voltam a bater com o extrato
+        """
+        atualizar_agregados(atraso=0)
+        AgregadoDiario.objects.update(contratacoes=99)
+        call_command('atualizar_agregados', atraso=0, reconstruir=True, stdout=io.StringIO())
+        self.assertEqual(self.agregados(), self.esperado())
+
+
+class RelatoriosIntegrationTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        outro_produto = Produto.objects.create(
+            nome='Produto 2', susep='15414.900840/2018-18', expiracaoDeVenda=self.expiracao_venda,
+            valorMinimoAporteInicial=1000, valorMinimoAporteExtra=100, idadeDeEntrada=18, idadeDeSaida=65,
+            carenciaInicialDeResgate=90, carenciaEntreResgates=30
+        )
+        ContratacaoPlano.objects.create(
+            idCliente=self.cliente, idProduto=outro_produto, aporte=1000,
+            dataDaContratacao=self.data_contratacao + timedelta(days=1)
+        )
+        Resgate.objects.create(idPlano=self.contratacao, valorResgate=300)
+        atualizar_agregados(atraso=0)
+        self.url = reverse('relatorio-list')
+        self.intervalo = {'inicio': str(self.data_contratacao), 'fim': str(date.today())}
+
+    def test_totais_por_produto(self):
+        """
+        Dado movimentações de dois produtos
+        Quando o relatório do intervalo é pedido
+        Então verifique os totais de cada produto, lidos em poucas consultas
+        """
+        with self.assertNumQueries(2):
+            response = app.get(self.url, self.intervalo)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resultados = {linha['nomeProduto']: linha for linha in response.json()['resultados']}
+        self.assertEqual(resultados['Produto 1']['contratacoes'], 1)
+        self.assertEqual(resultados['Produto 1']['valorContratado'], '2500.00')
+        self.assertEqual(resultados['Produto 1']['resgates'], 1)
+        self.assertEqual(resultados['Produto 1']['valorResgatado'], '300.00')
+        self.assertEqual(resultados['Produto 2']['valorContratado'], '1000.00')
+        self.assertNotIn('dia', resultados['Produto 1'])
+        ultima = Movimentacao.objects.latest('id').criadoEm
+        self.assertEqual(
+            response.json()['atualizadoAte'], RelatorioSerializer().fields['atualizadoAte'].to_representation(ultima)
+        )
+
+    # a contratação da base é de anos atrás, além do limite padrão do relatório por dia
+    @override_settings(RELATORIOS_MAX_DIAS=36500)
+    def test_por_dia_e_filtrado(self):
+        """
+        Dado movimentações em dias diferentes
+        Quando o relatório é pedido por dia, e depois só do primeiro dia de um produto
+        Então verifique uma linha por produto e dia, e só a do filtro
+        """
+        response = app.get(self.url, {**self.intervalo, 'agrupamento': 'dia'})
+        dias = [(linha['dia'], linha['nomeProduto']) for linha in response.json()['resultados']]
+        self.assertEqual(dias, [
+            (str(self.data_contratacao), 'Produto 1'),
+            (str(self.data_contratacao + timedelta(days=1)), 'Produto 2'),
+            (str(date.today()), 'Produto 1'),
+        ])
+
+        response = app.get(self.url, {
+            'inicio': str(self.data_contratacao), 'fim': str(self.data_contratacao), 'idProduto': self.produto.id
+        })
+        self.assertEqual(len(response.json()['resultados']), 1)
+        self.assertEqual(response.json()['resultados'][0]['resgates'], 0)
+
+    def test_intervalo_invalido(self):
+        """
+        Dado um início depois do fim
+        Quando o relatório é pedido
+        Então verifique que a resposta é 400 com a mensagem do intervalo
+        """
+        response = app.get(self.url, {'inicio': '2023-02-01', 'fim': '2023-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['fim'], [INTERVALO_INVALIDO])
+
+    @override_settings(RELATORIOS_MAX_DIAS=30)
+    def test_intervalo_por_dia_limitado(self):
+        """
+        Dado um limite de 30 dias para o relatório por dia
+        Quando ele é pedido por dia com 31 dias, e depois por produto com os mesmos 31 dias
+        Então verifique que o primeiro é 400 com a mensagem do limite e o segundo é respondido
+        """
+        intervalo = {'inicio': '2023-01-01', 'fim': '2023-01-31'}
+        response = app.get(self.url, {**intervalo, 'agrupamento': 'dia'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['fim'], [INTERVALO_LONGO.format(30)])
+
+        self.assertEqual(app.get(self.url, intervalo).status_code, status.HTTP_200_OK)
+        self.assertEqual(app.get(self.url, {**intervalo, 'fim': '2023-01-30', 'agrupamento': 'dia'}).status_code,
+                         status.HTTP_200_OK)
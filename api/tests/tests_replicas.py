@@ -0,0 +1,113 @@
+import json
+from datetime import date
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import Client as App  # Para evitar confusões com o Cliente
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.middleware import ReplicaMiddleware
+from api.models import Cliente, Produto, ContratacaoPlano
+
+
+@override_settings(REPLICAS=['replica1'])
+class RoteamentoTest(SimpleTestCase):
+    def rotear(self, request):
+        """ Banco escolhido para uma leitura feita durante a requisição """
+        bancos = []
+
+        def view(request):
+            bancos.append(router.db_for_read(Cliente))
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        response = ReplicaMiddleware(view)(request)
+        return bancos[0], response
+
+    def test_leitura_da_api_vai_para_a_replica(self):
+        banco, response = self.rotear(RequestFactory().get('/api/clientes/'))
+        self.assertEqual(banco, 'replica1')
+        self.assertNotIn(ReplicaMiddleware.cookie, response.cookies)
+        self.assertEqual(router.db_for_read(Cliente), 'default')
+
+    def test_escrita_fixa_o_cliente_no_primario(self):
+        banco, response = self.rotear(RequestFactory().post('/api/resgates/'))
+        self.assertEqual(banco, 'default')
+        self.assertEqual(response.cookies[ReplicaMiddleware.cookie]['max-age'], settings.REPLICA_FIXACAO_SEGUNDOS)
+
+        request = RequestFactory().get('/api/resgates/')
+        request.COOKIES[ReplicaMiddleware.cookie] = '1'
+        self.assertEqual(self.rotear(request)[0], 'default')
+
+    def test_cabecalho_fixa_o_cliente_sem_cookies(self):
+        """
+        Dado um cliente que não guarda cookies
+        Quando ele escreve e depois lê enviando o cabeçalho X-Fixar-Primario devolvido na escrita
+        Então verifique que a leitura vai para o primário
+        """
+        response = self.rotear(RequestFactory().post('/api/resgates/'))[1]
+        self.assertEqual(response[ReplicaMiddleware.cabecalho], str(settings.REPLICA_FIXACAO_SEGUNDOS))
+
+        request = RequestFactory().get('/api/resgates/', HTTP_X_FIXAR_PRIMARIO=response[ReplicaMiddleware.cabecalho])
+        self.assertEqual(self.rotear(request)[0], 'default')
+
+    def test_fora_da_api_fica_no_primario(self):
+        self.assertEqual(self.rotear(RequestFactory().get('/admin/'))[0], 'default')
+
+
+@skipUnless(settings.REPLICAS, 'Configure DATABASE_REPLICA_URLS, ex.: make tests-replicas')
+class ReplicaTest(TransactionTestCase):
+    """ Com DATABASE_REPLICA_URLS definida o default e a réplica são duas conexões para o mesmo banco local """
+    databases = {'default', *settings.REPLICAS}
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            cpf='12345678909', nome='José Henriques', email='jhrq@gmail.com',
+            dataDeNascimento=date(1991, 10, 22), sexo='M', rendaMensal=3500.00
+        )
+        produto = Produto.objects.create(
+            nome="Produto 1", susep='15414.900840/2018-17',
+            expiracaoDeVenda=date(2999, 12, 31), valorMinimoAporteInicial=2500.00,
+            valorMinimoAporteExtra=100.00, idadeDeEntrada=18,
+            idadeDeSaida=65, carenciaInicialDeResgate=0, carenciaEntreResgates=0
+        )
+        self.contratacao = ContratacaoPlano.objects.create(
+            idCliente=self.cliente, idProduto=produto, aporte=2500.00, dataDaContratacao=date(2022, 9, 15)
+        )
+        self.app = App()
+
+    def queries_por_banco(self, requisicao):
+        contextos = {alias: CaptureQueriesContext(connections[alias]) for alias in self.databases}
+        for contexto in contextos.values():
+            contexto.__enter__()
+        try:
+            response = requisicao()
+        finally:
+            for contexto in contextos.values():
+                contexto.__exit__(None, None, None)
+        return response, {alias: len(contexto) for alias, contexto in contextos.items()}
+
+    def test_leitura_na_replica_e_resgate_visivel_depois_da_escrita(self):
+        """
+        Dado um cliente que lê a lista de resgates e depois cria um resgate
+        Quando ele lista os resgates de novo
+        Então verifique que a primeira leitura foi na réplica e a seguinte no primário, com o resgate novo
+        """
+        response, queries = self.queries_por_banco(lambda: self.app.get(reverse('resgate-list')))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries['default'], 0)
+        self.assertGreater(sum(queries[alias] for alias in settings.REPLICAS), 0)
+
+        response = self.app.post(
+            reverse('resgate-list'), data=json.dumps({'idPlano': str(self.contratacao.id), 'valorResgate': 100}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response, queries = self.queries_por_banco(lambda: self.app.get(reverse('resgate-list')))
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertGreater(queries['default'], 0)
+        self.assertEqual(sum(queries[alias] for alias in settings.REPLICAS), 0)
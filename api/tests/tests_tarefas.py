@@ -0,0 +1,239 @@
+import io
+import json
+import os
+import signal
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import Client as App  # Para evitar confusões com o Cliente
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from api.error_messages import APORTE_MINIMO
+from api.models import ContratacaoPlano, Tarefa
+from api.tarefas import (
+    TAREFAS, enfileirar, reservar, executar, recuperar_abandonadas, processar_pendentes, loop_do_worker,
+)
+from api.tests.tests_unit import BaseTestCase
+
+app = App()
+
+
+class TarefaTest(BaseTestCase):
+    def test_contratacao_em_lote_assincrona(self):
+        """
+        Dado um lote de contratações enviado com ?assincrono=true
+        Quando o worker processar a fila
+        Então verifique que a tarefa fica concluída com o progresso e o resultado do lote
+        """
+        itens = [
+            {'idCliente': str(self.cliente.id), 'idProduto': str(self.produto.id),
+             'aporte': aporte, 'dataDaContratacao': str(self.data_contratacao)}
+            for aporte in (2500, 10, 3000)
+        ]
+        response = app.post(
+            reverse('contratacaoplano-bulk') + '?assincrono=true', data=json.dumps(itens),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['estado'], Tarefa.OpcoesEstado.PENDENTE)
+        self.assertEqual(ContratacaoPlano.objects.count(), 1)
+
+        saida = io.StringIO()
+        call_command('worker', '--uma-vez', stdout=saida)
+        self.assertIn('1 tarefas executadas', saida.getvalue())
+
+        tarefa = app.get(response['Location']).data
+        self.assertEqual(tarefa['estado'], Tarefa.OpcoesEstado.CONCLUIDA)
+        self.assertEqual((tarefa['processados'], tarefa['total']), (3, 3))
+        self.assertEqual(len(tarefa['resultado']['criados']), 2)
+        self.assertEqual(tarefa['resultado']['erros'], [{'indice': 1, 'error': APORTE_MINIMO}])
+        self.assertEqual(ContratacaoPlano.objects.count(), 3)
+
+    def test_tarefa_com_erro(self):
+        """
+        Dado uma tarefa cuja execução lança uma exceção
+        Quando ela é executada
+        Então verifique que ela fica como falha, com o erro gravado
+        """
+        enfileirar('contratar_em_lote', itens=[{'idCliente': 'x'}])
+        tarefa, = reservar()
+        self.assertEqual(tarefa.estado, Tarefa.OpcoesEstado.EXECUTANDO)
+        self.assertEqual(reservar(), [])
+
+        executar(tarefa)
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.estado, Tarefa.OpcoesEstado.FALHOU)
+        self.assertIn('ValidationError', tarefa.erro)
+
+    @override_settings(TAREFAS_MAX_TENTATIVAS=2)
+    def test_recuperar_abandonadas(self):
+        """
+        Dado tarefas em execução sem sinal de vida do worker
+        Quando elas são recuperadas
+        Então verifique que voltam para a fila, ou falham depois do limite de tentativas
+        """
+        primeira = enfileirar('compactar_saldos')
+        segunda = enfileirar('compactar_saldos')
+        reservar(limite=2)
+        Tarefa.objects.filter(pk=segunda.pk).update(tentativas=2)
+        Tarefa.objects.update(atualizadoEm=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(recuperar_abandonadas(segundos=60), 1)
+        primeira.refresh_from_db()
+        segunda.refresh_from_db()
+        self.assertEqual(primeira.estado, Tarefa.OpcoesEstado.PENDENTE)
+        self.assertEqual(segunda.estado, Tarefa.OpcoesEstado.FALHOU)
+
+    def test_retomada_sem_contratar_duas_vezes(self):
+        """
+        Dado um lote em blocos cujo worker morreu depois de gravar o primeiro bloco
+        Quando a tarefa abandonada volta para a fila e é executada de novo
+        Então verifique que ela retoma do segundo bloco, sem contratar o primeiro outra vez
+        """
+        itens = [
+            {'idCliente': str(self.cliente.id), 'idProduto': str(self.produto.id),
+             'aporte': 2500, 'dataDaContratacao': str(self.data_contratacao)}
+        ] * 3
+        enfileirar('contratar_em_lote', itens=itens, lote=1)
+        tarefa, = reservar()
+        contratar = ContratacaoPlano.objects.contratar_em_lote
+
+        def morre_no_segundo_bloco(bloco):
+            if tarefa.processados == 1:
+                raise KeyboardInterrupt
+            return contratar(bloco)
+
+        with patch.object(ContratacaoPlano.objects, 'contratar_em_lote', side_effect=morre_no_segundo_bloco):
+            with self.assertRaises(KeyboardInterrupt):
+                executar(tarefa)
+        Tarefa.objects.update(atualizadoEm=timezone.now() - timedelta(hours=1))
+        recuperar_abandonadas(segundos=60)
+        self.assertEqual(processar_pendentes(), 1)
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.estado, Tarefa.OpcoesEstado.CONCLUIDA)
+        self.assertEqual(ContratacaoPlano.objects.count(), 1 + 3)
+        self.assertEqual(len(set(tarefa.resultado['criados'])), 3)
+
+    def test_sigterm_termina_a_tarefa_em_andamento(self):
+        """
+        Dado duas tarefas na fila e um SIGTERM chegando durante a primeira
+        Quando o laço do worker está rodando
+        Então verifique que a primeira termina e o laço sai sem pegar a segunda
+        """
+        def recebe_sigterm(tarefa):
+            os.kill(os.getpid(), signal.SIGTERM)
+            return 'terminou'
+
+        anteriores = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+        try:
+            with patch.dict(TAREFAS, {'recebe_sigterm': recebe_sigterm}):
+                primeira = enfileirar('recebe_sigterm')
+                segunda = enfileirar('recebe_sigterm')
+                loop_do_worker(intervalo=0.01)
+        finally:
+            signal.signal(signal.SIGTERM, anteriores[0])
+            signal.signal(signal.SIGINT, anteriores[1])
+
+        primeira.refresh_from_db()
+        segunda.refresh_from_db()
+        self.assertEqual((primeira.estado, primeira.resultado), (Tarefa.OpcoesEstado.CONCLUIDA, 'terminou'))
+        self.assertEqual(segunda.estado, Tarefa.OpcoesEstado.PENDENTE)
+
+    @override_settings(TAREFAS_ESPERA_MAXIMA=0.01)
+    def test_erro_de_banco_nao_derruba_o_laco(self):
+        """
+        Dado o banco fora do ar na primeira volta do laço do worker
+        Quando ele volta na seguinte
+        Então verifique que o laço descarta as conexões, continua e executa a tarefa da fila
+        """
+        tarefa = enfileirar('compactar_saldos', atraso=0)
+        voltas = []
+
+        def recuperar(*args):
+            voltas.append(1)
+            if len(voltas) == 1:
+                raise OperationalError('conexão perdida')
+            if len(voltas) == 3:
+                os.kill(os.getpid(), signal.SIGTERM)
+            return 0
+
+        anteriores = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+        try:
+            with patch('api.tarefas.recuperar_abandonadas', side_effect=recuperar), \
+                    patch('api.tarefas.close_old_connections') as fechar:
+                loop_do_worker(intervalo=0.01)
+        finally:
+            signal.signal(signal.SIGTERM, anteriores[0])
+            signal.signal(signal.SIGINT, anteriores[1])
+
+        self.assertGreaterEqual(len(voltas), 3)
+        self.assertTrue(fechar.called)
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.estado, Tarefa.OpcoesEstado.CONCLUIDA)
+
+    def test_processo_morto_e_substituido(self):
+        """
+        Dado um processo do worker que morre logo depois de iniciado
+        Quando o processo pai verifica os filhos
+        Então verifique que ele inicia outro no lugar e só sai no SIGTERM, encerrando todos
+        """
+        iniciados = []
+
+        class ProcessoFalso:
+            pid = 0
+
+            def __init__(self, target, args, daemon):
+                iniciados.append(self)
+                self.exitcode = 1 if len(iniciados) == 1 else None
+
+            def start(self):
+                if len(iniciados) == 2:
+                    os.kill(os.getpid(), signal.SIGTERM)
+
+            def is_alive(self):
+                return self.exitcode is None
+
+            def terminate(self):
+                self.exitcode = self.exitcode if self.exitcode is not None else -signal.SIGTERM
+
+            def join(self):
+                pass
+
+        anteriores = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+        try:
+            with patch('api.management.commands.worker.multiprocessing.Process', ProcessoFalso), \
+                    patch('api.management.commands.worker.Command.intervalo_de_verificacao', 0.01):
+                call_command('worker', processos=1, stdout=io.StringIO(), stderr=io.StringIO())
+        finally:
+            signal.signal(signal.SIGTERM, anteriores[0])
+            signal.signal(signal.SIGINT, anteriores[1])
+
+        self.assertEqual(len(iniciados), 2)
+        self.assertEqual(iniciados[1].exitcode, -signal.SIGTERM)
+
+
+class SinalDeVidaTest(TransactionTestCase):
+    @override_settings(TAREFAS_ABANDONO_SEGUNDOS=0.15)
+    def test_tarefa_longa_renova_o_sinal_de_vida(self):
+        """
+        Dado uma tarefa que executa por mais tempo que o limite de abandono, sem gravar progresso
+        Quando as abandonadas são recuperadas durante a execução
+        Então verifique que ela continua em execução, pelo sinal de vida renovado em paralelo
+        """
+        recuperadas = []
+
+        def demorada(tarefa):
+            time.sleep(0.4)
+            recuperadas.append(recuperar_abandonadas())
+
+        with patch.dict(TAREFAS, {'demorada': demorada}):
+            enfileirar('demorada')
+            executar(reservar()[0])
+        self.assertEqual(recuperadas, [0])
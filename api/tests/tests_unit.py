@@ -1,9 +1,14 @@
+from dataclasses import FrozenInstanceError
 from datetime import date, timedelta
+from decimal import Decimal
 
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-from api.models import Produto, Cliente, ContratacaoPlano, AporteExtra, Resgate
+from api.cache import regras_do_produto
+from api.models import Produto, Cliente, ContratacaoPlano, AporteExtra, Resgate, Movimentacao, SaldoCompactado
+from api.projecao import projetar_saldos
+from api.saldos import compactar_saldos, reconstruir_saldos
 
 
 class BaseTestCase(TestCase):
@@ -71,6 +76,58 @@ class ProdutoTestCase(BaseTestCase):
         idade = self.cliente.get_idade(data=data)
         self.assertTrue(self.produto.idade_superior(idade_cliente=idade))
 
+    def test_regras_em_cache(self):
+        """
+        Dadas as regras de um produto já lidas,
+        Quando forem lidas de novo,
+        Então verifique se vêm do cache sem ir ao banco e se são imutáveis
+        """
+        regras = regras_do_produto(self.produto.id)
+        with self.assertNumQueries(0):
+            self.assertIs(regras_do_produto(self.produto.id), regras)
+        with self.assertRaises(FrozenInstanceError):
+            regras.idadeDeEntrada = 0
+
+    def test_regras_invalidadas_ao_salvar(self):
+        """
+        Dadas as regras de um produto em cache,
+        Quando o produto for alterado,
+        Então verifique se as novas regras passam a valer
+        """
+        regras_do_produto(self.produto.id)
+        self.produto.idadeDeEntrada = 40
+        self.produto.save()
+        self.assertEqual(regras_do_produto(self.produto.id).idadeDeEntrada, 40)
+        with self.assertRaises(ValidationError):
+            ContratacaoPlano.objects.create(
+                idCliente=self.cliente,
+                idProduto=self.produto,
+                aporte=self.valor_minimo_aporte_inicial,
+                dataDaContratacao=self.data_contratacao
+            )
+
+    def test_elegiveis_seguem_as_regras(self):
+        """
+        Dado produtos com idades e expirações variadas
+        Quando os elegíveis são filtrados no banco
+        Então verifique que o resultado é o mesmo das regras calculadas em Python
+        """
+        data = self.expiracao_venda
+        variacoes = [(18, 31, data), (32, 65, data), (18, 65, data - timedelta(days=1)), (31, 31, data)]
+        for entrada, saida, expiracao in variacoes:
+            Produto.objects.create(
+                nome='Produto', susep='1', expiracaoDeVenda=expiracao, valorMinimoAporteInicial=1000,
+                valorMinimoAporteExtra=100, idadeDeEntrada=entrada, idadeDeSaida=saida,
+                carenciaInicialDeResgate=60, carenciaEntreResgates=30
+            )
+        idade = self.cliente.get_idade(data)
+        esperados = {
+            produto.id for produto in Produto.objects.all()
+            if not (produto.venda_expirada(data) or produto.idade_insuficiente(idade) or produto.idade_superior(idade))
+        }
+        self.assertEqual(set(Produto.objects.elegiveis(idade, data).values_list('id', flat=True)), esperados)
+        self.assertEqual(len(esperados), 3)
+
 
 class ContratacaoPlanoTestCase(BaseTestCase):
     def test_data_expiracao_produto(self):
@@ -139,6 +196,25 @@ class ContratacaoPlanoTestCase(BaseTestCase):
                 dataDaContratacao=data_contratacao
             )
 
+    def test_contratar_em_lote(self):
+        """
+        Dado um lote de contratações,
+        Quando o lote for contratado,
+        Então verifique se clientes e produtos são buscados uma única vez e os válidos inseridos de uma vez
+        """
+        itens = [
+            {
+                'idCliente': self.cliente.id, 'idProduto': self.produto.id,
+                'aporte': self.valor_minimo_aporte_inicial, 'dataDaContratacao': self.data_contratacao
+            }
+            for _ in range(10)
+        ]
+        itens.append(dict(itens[0], aporte=self.valor_minimo_aporte_inicial - 0.1))
+        with self.assertNumQueries(4):
+            criados, erros = ContratacaoPlano.objects.contratar_em_lote(itens)
+        self.assertEqual(len(criados), 10)
+        self.assertEqual([erro['indice'] for erro in erros], [10])
+
 
 class AporteExtraTestCase(BaseTestCase):
     def test_aporte_extra(self):
@@ -155,6 +231,24 @@ class AporteExtraTestCase(BaseTestCase):
                 valorAporte=aporte_extra
             )
 
+    def test_incremento_saldo(self):
+        """
+        Dado um aporte extra válido,
+        Quando ele for salvo,
+        Então verifique se o saldo do plano é incrementado sem alterar o plano
+        """
+        AporteExtra.objects.create(
+            idCliente=self.cliente,
+            idPlano=self.contratacao,
+            valorAporte=self.valor_minimo_aporte_extra
+        )
+        self.contratacao.refresh_from_db()
+        self.assertEqual(self.contratacao.aporte, Decimal(str(self.valor_minimo_aporte_inicial)))
+        self.assertEqual(
+            self.contratacao.saldo_atual(),
+            Decimal(str(self.valor_minimo_aporte_inicial + self.valor_minimo_aporte_extra))
+        )
+
 
 class ResgateTestCase(BaseTestCase):
     def test_resgate(self):
@@ -201,3 +295,121 @@ class ResgateTestCase(BaseTestCase):
                 idPlano=self.contratacao,
                 valorResgate=valor / 4
             )
+
+    def test_carencia_entre_resgates_por_plano(self):
+        """
+        Dado dois planos do mesmo produto,
+        Quando houver um resgate em um deles,
+        Então verifique se o outro plano continua podendo ser resgatado
+        """
+        outro_plano = ContratacaoPlano.objects.create(
+            idCliente=self.cliente,
+            idProduto=self.produto,
+            aporte=self.valor_minimo_aporte_inicial,
+            dataDaContratacao=self.data_contratacao
+        )
+        valor = self.valor_minimo_aporte_inicial / 4
+        Resgate.objects.create(idPlano=self.contratacao, valorResgate=valor)
+        Resgate.objects.create(idPlano=outro_plano, valorResgate=valor)
+        self.assertEqual(self.contratacao.data_ultimo_resgate(), date.today())
+        self.assertEqual(outro_plano.data_ultimo_resgate(), date.today())
+
+
+class ExtratoTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        AporteExtra.objects.create(
+            idCliente=self.cliente,
+            idPlano=self.contratacao,
+            valorAporte=Decimal('300.00')
+        )
+        Resgate.objects.create(idPlano=self.contratacao, valorResgate=Decimal('1000.00'))
+
+    def test_extrato(self):
+        """
+        Dado um plano com aporte inicial, aporte extra e resgate,
+        Quando o extrato for consultado,
+        Então verifique se cada operação gerou uma movimentação e o saldo reflete todas elas
+        """
+        self.assertEqual(
+            list(Movimentacao.objects.filter(idPlano=self.contratacao).order_by('id').values_list('tipo', 'valor')),
+            [
+                (Movimentacao.OpcoesTipo.APORTE_INICIAL, Decimal('2500.00')),
+                (Movimentacao.OpcoesTipo.APORTE_EXTRA, Decimal('300.00')),
+                (Movimentacao.OpcoesTipo.RESGATE, Decimal('-1000.00')),
+            ]
+        )
+        self.assertEqual(self.contratacao.saldo_atual(), Decimal('1800.00'))
+
+    def test_resgate_acima_do_saldo(self):
+        """
+        Dado um plano que já teve um resgate,
+        Quando um novo resgate for maior que o saldo restante,
+        Então verifique se lança um erro de validação
+        """
+        self.assertTrue(self.contratacao.resgate_negado(Decimal('1800.01')))
+        with self.assertRaises(ValidationError):
+            Resgate.objects.create(idPlano=self.contratacao, valorResgate=Decimal('1800.01'))
+
+    def test_compactar_saldos(self):
+        """
+        Dado um plano com movimentações,
+        Quando os saldos forem compactados e houver novas movimentações,
+        Então verifique se o saldo é o snapshot somado às movimentações posteriores
+        """
+        self.assertEqual(compactar_saldos(atraso=-60), 1)
+        compactado = SaldoCompactado.objects.get(idPlano=self.contratacao)
+        self.assertEqual(compactado.saldo, Decimal('1800.00'))
+
+        AporteExtra.objects.create(
+            idCliente=self.cliente,
+            idPlano=self.contratacao,
+            valorAporte=Decimal('200.00')
+        )
+        self.assertEqual(self.contratacao.saldo_atual(), Decimal('2000.00'))
+        self.assertEqual(compactar_saldos(atraso=-60), 1)
+        self.assertEqual(compactar_saldos(atraso=-60), 0)
+        self.assertEqual(SaldoCompactado.objects.get(idPlano=self.contratacao).saldo, Decimal('2000.00'))
+        self.assertEqual(self.contratacao.saldo_atual(), Decimal('2000.00'))
+
+    def test_reconstruir_saldos(self):
+        """
+        Dado um saldo compactado divergente,
+        Quando os saldos forem reconstruídos a partir do extrato,
+        Então verifique se o saldo volta a bater com as movimentações
+        """
+        SaldoCompactado.objects.create(idPlano=self.contratacao, saldo=0, ultimaMovimentacao=10 ** 9)
+        self.assertEqual(self.contratacao.saldo_atual(), Decimal('0.00'))
+        self.assertEqual(reconstruir_saldos(atraso=-60), 1)
+        self.assertEqual(self.contratacao.saldo_atual(), Decimal('1800.00'))
+
+
+class ProjecaoTestCase(BaseTestCase):
+    def test_projecao(self):
+        """
+        Dado um plano e duas taxas anuais,
+        Quando os saldos forem projetados,
+        Então verifique se o resultado vetorizado bate com a capitalização mês a mês
+        """
+        data_base = date(2022, 10, 22)
+        projecao = projetar_saldos([0.0, 0.06], aporte_mensal=100, data_base=data_base)
+
+        self.assertEqual(list(projecao.planos), [self.contratacao.id])
+        meses = int(projecao.meses[0])
+        self.assertEqual(meses, (self.produto.idadeDeSaida - self.cliente.get_idade(data_base)) * 12)
+        for coluna, taxa in enumerate([0.0, 0.06]):
+            taxa_mensal = (1 + taxa) ** (1 / 12) - 1
+            saldo = self.valor_minimo_aporte_inicial
+            for _ in range(meses):
+                saldo = saldo * (1 + taxa_mensal) + 100
+            self.assertAlmostEqual(projecao.projecoes[0, coluna], saldo, places=4)
+
+    def test_projecao_apos_idade_de_saida(self):
+        """
+        Dado uma data base em que o cliente já passou da idade de saída do produto
+        Quando os saldos são projetados
+        Então verifique que não há meses de projeção e o saldo projetado é o atual
+        """
+        projecao = projetar_saldos([0.06], aporte_mensal=100, data_base=date(2060, 1, 1))
+        self.assertEqual(int(projecao.meses[0]), 0)
+        self.assertAlmostEqual(projecao.projecoes[0, 0], self.valor_minimo_aporte_inicial)
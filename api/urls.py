@@ -1,3 +1,4 @@
+from django.urls import path
 from rest_framework import routers
 
 from api.views import (
@@ -6,7 +7,11 @@ from api.views import (
     ContratacaoPlanoViewSet,
     AportesExtrasViewSet,
     ResgatesViewSet,
+    SimulacoesViewSet,
+    RelatoriosViewSet,
+    TarefasViewSet,
 )
+from api.views_async import LeituraAssincronaView
 
 router = routers.DefaultRouter()
 router.register('clientes', ClientesViewSet)
@@ -14,5 +19,20 @@ router.register('produtos', ProdutosViewSet)
 router.register('contratacoes', ContratacaoPlanoViewSet)
 router.register('aportes-extras', AportesExtrasViewSet)
 router.register('resgates', ResgatesViewSet)
+router.register('simulacoes', SimulacoesViewSet, basename='simulacao')
+router.register('tarefas', TarefasViewSet)
+router.register('relatorios', RelatoriosViewSet, basename='relatorio')
 
-urlpatterns = router.urls
+
+# leituras assíncronas, servidas sem bloquear o worker quando a aplicação roda pelo ASGI
+async_urlpatterns = []
+for prefixo, viewset, basename in router.registry:
+    if getattr(viewset, 'queryset', None) is None:
+        continue
+    view = LeituraAssincronaView.as_view(serializer_class=viewset.serializer_class, queryset=viewset.queryset)
+    async_urlpatterns += [
+        path(f'async/{prefixo}/', view, name=f'{basename}-async-list'),
+        path(f'async/{prefixo}/<uuid:pk>/', view, name=f'{basename}-async-detail'),
+    ]
+
+urlpatterns = router.urls + async_urlpatterns
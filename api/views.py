@@ -1,12 +1,42 @@
-from rest_framework.viewsets import ModelViewSet
+import hashlib
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet, ViewSet
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
+from api.cache import versao_produtos
+from api.idempotencia import IdempotenciaMixin, CABECALHO
+from api.projecao import projetar_saldos
+from api.relatorios import PROCESSO, relatorio
+from api.simulacoes import simular
+from api.tarefas import enfileirar
+from api.renderers import NDJSONRenderer, CSVRenderer
 from api.serializers import (
     ClienteSerializer,
     ProdutoSerializer,
     ContratacaoPlanoSerializer,
+    ContratacaoPlanoLoteSerializer,
+    ProjecaoParametrosSerializer,
+    PosicaoSerializer,
+    RelatorioParametrosSerializer,
+    RelatorioSerializer,
+    SimulacaoSerializer,
+    SimulacaoResultadoSerializer,
+    TarefaSerializer,
     AporteExtraSerializer,
     ResgateSerializer,
+    conversores_de_leitura,
+    serializar_linhas,
 )
 from api.models import (
     Cliente,
@@ -14,42 +44,308 @@ from api.models import (
     ContratacaoPlano,
     AporteExtra,
     Resgate,
+    Tarefa,
+    MarcaDagua,
+)
+
+
+# repetir um POST com a mesma chave devolve a resposta da primeira chamada, sem criar outro registro
+IDEMPOTENCY_KEY = OpenApiParameter(
+    CABECALHO, str, OpenApiParameter.HEADER, required=False,
+    description='Chave única por operação, para repetir a requisição com segurança após um timeout'
+)
+
+ASSINCRONO = OpenApiParameter(
+    'assincrono', bool,
+    description='Enfileira a operação e responde 202 com a tarefa, acompanhada em /api/tarefas/{id}/'
 )
 
 
-class ClientesViewSet(ModelViewSet):
+# métodos dos recursos que movimentam dinheiro: o extrato, os saldos compactados e os relatórios são
+# derivados das inserções, e um PUT, PATCH ou DELETE os deixaria fora de sincronia
+SOMENTE_INCLUSAO = ['get', 'post', 'head', 'options']
+
+
+class ExportacaoMixin:
+    """ Ação /exportar/ que transmite a tabela inteira em NDJSON (padrão) ou CSV com ?format=csv """
+    tamanho_do_lote = settings.EXPORTACAO_TAMANHO_DO_LOTE
+
+    @extend_schema(description='Exporta todos os registros em streaming, em NDJSON ou CSV (?format=csv)')
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def exportar(self, request):
+        renderer = request.accepted_renderer
+        # o streaming lê o banco depois que a view retorna, então o banco (réplica ou primário) é fixado aqui
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.using(queryset.db)
+        campos = queryset.model._meta.concrete_fields
+        linhas = queryset.values_list(*[campo.attname for campo in campos]).iterator(
+            chunk_size=self.tamanho_do_lote
+        )
+        response = StreamingHttpResponse(
+            renderer.render_linhas([campo.name for campo in campos], linhas),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.basename}.{renderer.format}"'
+        return response
+
+
+CAMPOS_ESPARSOS = [
+    OpenApiParameter('fields', str, description='Devolve só estes campos, separados por vírgula, ex.: id,nome'),
+    OpenApiParameter('exclude', str, description='Omite estes campos, separados por vírgula'),
+]
+
+
+class CamposEsparsosMixin:
+    """
+    Leva o recorte de ?fields=/?exclude= do serializer para o SQL: list e retrieve carregam com
+    only() apenas as colunas dos campos que serão devolvidos, mais as de `campos_sempre_carregados`,
+    que a view usa mesmo fora da resposta
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        if not (self.request.query_params.get('fields') or self.request.query_params.get('exclude')):
+            return queryset
+
+        colunas = {campo.name for campo in queryset.model._meta.concrete_fields}
+        fontes = {campo.source for campo in self.get_serializer().fields.values()}
+        return queryset.only('pk', *getattr(self, 'campos_sempre_carregados', ()), *(fontes & colunas))
+
+    @extend_schema(parameters=CAMPOS_ESPARSOS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(parameters=CAMPOS_ESPARSOS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class ListagemRapidaMixin:
+    """
+    Listagem lida com values() e serializada pelos conversores pré-compilados do serializer, sem
+    instanciar models nem passar cada linha pelos Fields do DRF. A resposta é a mesma do ModelSerializer;
+    serializers com campos que não são colunas simples seguem pelo list() normal
+    """
+    listagem_rapida = True
+
+    def list(self, request, *args, **kwargs):
+        campos = conversores_de_leitura(self.get_serializer()) if self.listagem_rapida else None
+        if campos is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # a chave primária vai junto mesmo fora da resposta: o cursor da paginação lê a posição dela
+        colunas = {queryset.model._meta.pk.name, *(coluna for _, coluna, _ in campos)}
+        linhas = queryset.values(*colunas)
+        pagina = self.paginate_queryset(linhas)
+        if pagina is not None:
+            return self.get_paginated_response(serializar_linhas(campos, pagina))
+        return Response(serializar_linhas(campos, linhas))
+
+
+class RespostaCondicionalMixin:
+    """
+    ETag e Last-Modified nas leituras, respondendo If-None-Match/If-Modified-Since com 304 sem
+    serializar nada. O detalhe usa o atualizadoEm da linha; a listagem usa a versão da tabela
+    em `versao_da_listagem`, quando houver
+    """
+    versao_da_listagem = None
+    campos_sempre_carregados = ('atualizadoEm',)
+    max_age = settings.CACHE_CONTROL_MAX_AGE
+
+    def list(self, request, *args, **kwargs):
+        if self.versao_da_listagem is None:
+            return super().list(request, *args, **kwargs)
+        etag = self.gerar_etag(request, self.versao_da_listagem(), request.get_full_path())
+        response = get_conditional_response(request, etag=etag) or super().list(request, *args, **kwargs)
+        return self.cabecalhos_de_cache(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instancia = self.get_object()
+        etag = self.gerar_etag(request, request.get_full_path(), instancia.atualizadoEm.isoformat())
+        ultima_modificacao = int(instancia.atualizadoEm.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+        if response is None:
+            response = Response(self.get_serializer(instancia).data)
+        response['Last-Modified'] = http_date(ultima_modificacao)
+        return self.cabecalhos_de_cache(response, etag)
+
+    @staticmethod
+    def gerar_etag(request, *partes):
+        # o formato entra na versão porque JSON e a API navegável não são o mesmo corpo
+        chave = ':'.join(str(parte) for parte in (*partes, request.accepted_renderer.format))
+        return f'"{hashlib.sha1(chave.encode()).hexdigest()}"'
+
+    def cabecalhos_de_cache(self, response, etag):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
+
+
+class ClientesViewSet(CamposEsparsosMixin, RespostaCondicionalMixin, ListagemRapidaMixin, ExportacaoMixin,
+                      ModelViewSet):
     serializer_class = ClienteSerializer
     queryset = Cliente.objects.all()
 
+    @extend_schema(parameters=[ProjecaoParametrosSerializer],
+                   description='Projeta o saldo de cada plano do cliente até a idade de saída do produto, '
+                               'com aportes mensais e uma projeção por taxa de juros anual')
+    @action(detail=True, methods=['get'])
+    def projecao(self, request, pk=None):
+        cliente = self.get_object()
+        parametros = ProjecaoParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        projecao = projetar_saldos(
+            parametros.validated_data['taxas'],
+            planos=ContratacaoPlano.objects.filter(idCliente=cliente),
+            aporte_mensal=parametros.validated_data.get('aporteMensal'),
+        )
+        planos = [
+            {
+                'idPlano': plano,
+                'mesesAteSaida': int(meses),
+                'saldoAtual': f'{saldo:.2f}',
+                'projecoes': [f'{valor:.2f}' for valor in projecoes],
+            }
+            for plano, meses, saldo, projecoes in zip(
+                projecao.planos, projecao.meses, projecao.saldos, projecao.projecoes
+            )
+        ]
+        return Response({'idCliente': cliente.id, 'taxas': projecao.taxas.tolist(), 'planos': planos})
+
+    @extend_schema(responses=ProdutoSerializer(many=True), parameters=CAMPOS_ESPARSOS,
+                   description='Produtos que o cliente pode contratar hoje, pela idade e pela expiração da venda')
+    @action(detail=True, methods=['get'], url_path='produtos-elegiveis')
+    def produtos_elegiveis(self, request, pk=None):
+        cliente = self.get_object()
+        hoje = date.today()
+        # a idade é calculada uma vez e as regras de cada produto viram um filtro no banco
+        produtos = Produto.objects.elegiveis(cliente.get_idade(hoje), hoje).order_by('nome', 'id')
+        return Response(ProdutoSerializer(produtos, many=True, context=self.get_serializer_context()).data)
 
-class ProdutosViewSet(ModelViewSet):
+    @extend_schema(responses=PosicaoSerializer,
+                   description='Posição consolidada do cliente: cada plano com o produto, o saldo atual, '
+                               'o total de aportes extras, o total resgatado e a data do último resgate')
+    @action(detail=True, methods=['get'])
+    def posicao(self, request, pk=None):
+        # uma única query com os planos e o nome do cliente; o cliente só é buscado à parte se não tiver planos
+        try:
+            planos = list(
+                ContratacaoPlano.objects.filter(idCliente=pk).com_posicao()
+                .annotate(nomeCliente=F('idCliente__nome')).order_by('dataDaContratacao', 'id')
+            )
+        except ValidationError:
+            planos = []
+        if planos:
+            id_cliente, nome = planos[0].idCliente_id, planos[0].nomeCliente
+        else:
+            cliente = self.get_object()
+            id_cliente, nome = cliente.id, cliente.nome
+        return Response(PosicaoSerializer({'idCliente': id_cliente, 'nome': nome, 'planos': planos}).data)
+
+
+class ProdutosViewSet(CamposEsparsosMixin, RespostaCondicionalMixin, ListagemRapidaMixin, ExportacaoMixin,
+                      ModelViewSet):
     serializer_class = ProdutoSerializer
     queryset = Produto.objects.all()
+    versao_da_listagem = staticmethod(versao_produtos)
 
 
-class ContratacaoPlanoViewSet(ModelViewSet):
+class ContratacaoPlanoViewSet(IdempotenciaMixin, CamposEsparsosMixin, ListagemRapidaMixin, ExportacaoMixin,
+                              ModelViewSet):
     serializer_class = ContratacaoPlanoSerializer
+    http_method_names = SOMENTE_INCLUSAO
     queryset = ContratacaoPlano.objects.all()
+    filtros = ('idCliente', 'idProduto', 'dataDaContratacao__gte', 'dataDaContratacao__lte')
 
-    @extend_schema(description='Para contratar um plano é preciso respeitar a data de expiração '
+    @extend_schema(parameters=[IDEMPOTENCY_KEY],
+                   description='Para contratar um plano é preciso respeitar a data de expiração '
                                'do produto, o aporte mínimo inial além das datas mínima e máxima')
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    @extend_schema(request=ContratacaoPlanoLoteSerializer(many=True),
+                   parameters=[ASSINCRONO],
+                   description='Contrata vários planos de uma só vez aplicando as mesmas regras da '
+                               'contratação individual. Retorna os planos criados e os erros por item. '
+                               'Aceita até CONTRATACOES_LOTE_MAX_ITENS itens por requisição')
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        serializer = ContratacaoPlanoLoteSerializer(
+            data=request.data, many=True, max_length=settings.CONTRATACOES_LOTE_MAX_ITENS
+        )
+        serializer.is_valid(raise_exception=True)
+        if request.query_params.get('assincrono') in ('1', 'true'):
+            tarefa = enfileirar('contratar_em_lote', itens=request.data)
+            url = reverse('tarefa-detail', args=[tarefa.id], request=request)
+            return Response(TarefaSerializer(tarefa).data, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
+
+        criados, erros = ContratacaoPlano.objects.contratar_em_lote(serializer.validated_data)
+        data = {
+            'criados': ContratacaoPlanoSerializer(criados, many=True).data,
+            'erros': erros,
+        }
+        status_code = status.HTTP_201_CREATED if criados else status.HTTP_400_BAD_REQUEST
+        return Response(data, status=status_code)
 
-class AportesExtrasViewSet(ModelViewSet):
+
+class AportesExtrasViewSet(IdempotenciaMixin, CamposEsparsosMixin, ListagemRapidaMixin, ExportacaoMixin, ModelViewSet):
     serializer_class = AporteExtraSerializer
+    http_method_names = SOMENTE_INCLUSAO
     queryset = AporteExtra.objects.all()
+    filtros = ('idCliente', 'idPlano')
 
-    @extend_schema(description='O valor mínimo para aporte extra deve ser igual ao valor definido no plano')
+    @extend_schema(parameters=[IDEMPOTENCY_KEY],
+                   description='O valor mínimo para aporte extra deve ser igual ao valor definido no plano')
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
 
-class ResgatesViewSet(ModelViewSet):
+class ResgatesViewSet(IdempotenciaMixin, CamposEsparsosMixin, ListagemRapidaMixin, ExportacaoMixin, ModelViewSet):
     serializer_class = ResgateSerializer
+    http_method_names = SOMENTE_INCLUSAO
     queryset = Resgate.objects.all()
+    filtros = ('idPlano', 'dataDoResgate__gte', 'dataDoResgate__lte')
 
-    @extend_schema(description='O valor máximo para o resgate deve ser igual ao valor de aporte do plano')
+    @extend_schema(parameters=[IDEMPOTENCY_KEY],
+                   description='O valor máximo para o resgate deve ser igual ao valor de aporte do plano')
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
+
+
+class SimulacoesViewSet(ViewSet):
+    @extend_schema(request=SimulacaoSerializer(many=True), responses=SimulacaoResultadoSerializer(many=True),
+                   description='Avalia contratações, aportes extras e resgates com as mesmas regras das operações '
+                               'reais, sem gravar nada nem travar planos. Cada item é avaliado contra o estado '
+                               'atual, independente dos demais, e volta aceito ou com a mensagem de erro')
+    def create(self, request):
+        serializer = SimulacaoSerializer(data=request.data, many=True, max_length=settings.SIMULACOES_MAX_ITENS)
+        serializer.is_valid(raise_exception=True)
+        return Response(SimulacaoResultadoSerializer(simular(serializer.validated_data), many=True).data)
+
+
+class RelatoriosViewSet(ViewSet):
+    @extend_schema(parameters=[RelatorioParametrosSerializer], responses=RelatorioSerializer,
+                   description='Contratações, aportes extras e resgates por produto num intervalo de dias, lidos '
+                               'dos agregados diários mantidos pelo manage.py atualizar_agregados. Movimentações '
+                               'depois de atualizadoAte ainda não entram nos totais. Por dia, o intervalo é '
+                               'limitado a RELATORIOS_MAX_DIAS dias')
+    def list(self, request):
+        parametros = RelatorioParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        dados = parametros.validated_data
+        marca = MarcaDagua.objects.filter(processo=PROCESSO).values_list('ultimaMovimentacaoEm', flat=True).first()
+        return Response(RelatorioSerializer({
+            **dados,
+            'atualizadoAte': marca,
+            'resultados': relatorio(dados['inicio'], dados['fim'], dados['agrupamento'], dados.get('idProduto')),
+        }).data)
+
+
+class TarefasViewSet(ListagemRapidaMixin, ReadOnlyModelViewSet):
+    """ Acompanhamento das tarefas em segundo plano: estado, progresso e resultado """
+    serializer_class = TarefaSerializer
+    queryset = Tarefa.objects.all()
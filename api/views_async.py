@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
+
+from api.renderers import ORJSONRenderer
+from api.serializers import conversores_de_leitura, serializar_linhas
+
+
+def _resposta(data, status=200):
+    return HttpResponse(ORJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+class LeituraAssincronaView(View):
+    """
+    list/retrieve assíncronos com o ORM async do Django, para o caminho de leitura servido pelo ASGI.
+    A saída é a do ModelSerializer do recurso, a listagem é paginada pelo id (?cursor=<último id>)
+    """
+    serializer_class = None
+    queryset = None
+
+    async def get(self, request, pk=None):
+        if pk is not None:
+            return await self.retrieve(pk)
+        return await self.list(request)
+
+    async def retrieve(self, pk):
+        try:
+            instancia = await self.queryset.aget(pk=pk)
+        except (self.queryset.model.DoesNotExist, ValidationError):
+            return _resposta({'detail': NotFound.default_detail}, status=404)
+        return _resposta(self.serializer_class(instancia).data)
+
+    async def list(self, request):
+        try:
+            tamanho = min(int(request.GET.get('page_size', api_settings.PAGE_SIZE)), settings.MAX_PAGE_SIZE)
+        except ValueError:
+            tamanho = api_settings.PAGE_SIZE
+        # page_size zero ou negativo viraria um fatiamento negativo no queryset
+        tamanho = max(tamanho, 1)
+        queryset = self.queryset.order_by('id')
+        cursor = request.GET.get('cursor')
+        if cursor:
+            try:
+                queryset = queryset.filter(id__gt=cursor)
+            except ValidationError as exc:
+                return _resposta({'cursor': exc.messages}, status=400)
+
+        campos = conversores_de_leitura(self.serializer_class())
+        if campos is not None:
+            colunas = ('id', *(coluna for _, coluna, _ in campos))
+            linhas = [linha async for linha in queryset.values(*colunas)[:tamanho + 1]]
+        else:
+            # serializers com campos que não são colunas simples saem pelo ModelSerializer
+            linhas = [instancia async for instancia in queryset[:tamanho + 1]]
+        proxima = None
+        if len(linhas) > tamanho:
+            linhas = linhas[:tamanho]
+            parametros = request.GET.copy()
+            parametros['cursor'] = str(linhas[-1]['id'] if campos is not None else linhas[-1].pk)
+            proxima = request.build_absolute_uri(f'{request.path}?{parametros.urlencode()}')
+        if campos is not None:
+            resultados = serializar_linhas(campos, linhas)
+        else:
+            resultados = self.serializer_class(linhas, many=True).data
+        return _resposta({'next': proxima, 'results': resultados})
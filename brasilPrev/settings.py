@@ -50,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricasMiddleware',
+    'api.middleware.InstrumentacaoMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +62,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Queries e tempos de cada requisição no cabeçalho Server-Timing
+INSTRUMENTACAO = env.bool('INSTRUMENTACAO', False)
+# Vezes que o mesmo formato de query pode se repetir numa requisição antes de ser apontado como N+1
+INSTRUMENTACAO_LIMITE_REPETICOES = env.int('INSTRUMENTACAO_LIMITE_REPETICOES', 5)
+
 ROOT_URLCONF = 'brasilPrev.urls'
 
 TEMPLATES = [
@@ -78,6 +86,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'brasilPrev.wsgi.application'
+ASGI_APPLICATION = 'brasilPrev.asgi.application'
 
 
 # Database
@@ -87,11 +96,44 @@ DATABASES = {
     'default': (
         dj_database_url.config(
             default=env.str('DATABASE_URL'),
-            conn_max_age=600
+            # no ASGI use 0 e deixe a reutilização de conexões para um pooler (ex.: pgbouncer)
+            conn_max_age=env.int('CONN_MAX_AGE', 600)
         )
     )
 }
 
+# Réplicas de leitura, uma URL por réplica separadas por vírgula. Com elas configuradas as leituras
+# da API vão para uma réplica, exceto logo depois de uma escrita do mesmo cliente (ReplicaMiddleware)
+REPLICAS = []
+for numero, url in enumerate(env.list('DATABASE_REPLICA_URLS', []), start=1):
+    DATABASES[f'replica{numero}'] = {
+        **dj_database_url.parse(url, conn_max_age=env.int('CONN_MAX_AGE', 600)),
+        # nos testes a réplica é uma segunda conexão para o banco de testes do default
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICAS.append(f'replica{numero}')
+
+DATABASE_ROUTERS = ['api.replicas.RoteadorDeReplicas']
+
+# Segundos que um cliente fica preso ao primário depois de uma escrita
+REPLICA_FIXACAO_SEGUNDOS = env.int('REPLICA_FIXACAO_SEGUNDOS', 5)
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Guarda a versão do catálogo de produtos; com vários workers precisa ser compartilhado
+# entre eles (ex.: FileBasedCache num diretório comum, Memcached ou Redis)
+
+CACHES = {
+    'default': {
+        'BACKEND': env.str('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env.str('CACHE_LOCATION', ''),
+    }
+}
+
+# Intervalo, em segundos, entre as consultas de cada worker à versão do catálogo de produtos
+CACHE_PRODUTOS_INTERVALO = env.float('CACHE_PRODUTOS_INTERVALO', 5.0)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -136,7 +178,7 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DEFAULT_RENDERER_CLASSES = (
-    'rest_framework.renderers.JSONRenderer',
+    'api.renderers.ORJSONRenderer',
 )
 
 if DEBUG:
@@ -147,9 +189,44 @@ if DEBUG:
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': DEFAULT_RENDERER_CLASSES,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CursorPaginacao',
+    'DEFAULT_FILTER_BACKENDS': ['api.filtros.FiltrosSimples'],
+    'PAGE_SIZE': env.int('PAGE_SIZE', 100),
     'EXCEPTION_HANDLER': 'api.handler.validation_error_handler',
 }
 
+# Tamanho máximo de página que o cliente pode pedir com ?page_size=
+MAX_PAGE_SIZE = env.int('MAX_PAGE_SIZE', 1000)
+
+# Linhas buscadas do banco por vez nas exportações em streaming
+EXPORTACAO_TAMANHO_DO_LOTE = env.int('EXPORTACAO_TAMANHO_DO_LOTE', 2000)
+
+# max-age do Cache-Control nas leituras com ETag, permite o micro-cache do nginx
+CACHE_CONTROL_MAX_AGE = env.int('CACHE_CONTROL_MAX_AGE', 1)
+
+# Itens aceitos por requisição em /api/simulacoes/
+SIMULACOES_MAX_ITENS = env.int('SIMULACOES_MAX_ITENS', 5000)
+
+# Itens aceitos por requisição em /api/contratacoes/bulk/, síncrona ou enfileirada
+CONTRATACOES_LOTE_MAX_ITENS = env.int('CONTRATACOES_LOTE_MAX_ITENS', 10000)
+
+# Dias aceitos por requisição no relatório agrupado por dia
+RELATORIOS_MAX_DIAS = env.int('RELATORIOS_MAX_DIAS', 366)
+
+# Worker das tarefas em segundo plano (manage.py worker)
+TAREFAS_PROCESSOS = env.int('TAREFAS_PROCESSOS', 2)
+TAREFAS_INTERVALO = env.float('TAREFAS_INTERVALO', 1.0)
+TAREFAS_ABANDONO_SEGUNDOS = env.int('TAREFAS_ABANDONO_SEGUNDOS', 600)
+TAREFAS_MAX_TENTATIVAS = env.int('TAREFAS_MAX_TENTATIVAS', 3)
+# Espera máxima, em segundos, entre tentativas depois de erros no laço do worker (ex.: banco fora do ar)
+TAREFAS_ESPERA_MAXIMA = env.float('TAREFAS_ESPERA_MAXIMA', 60.0)
+
+# Acima desse número estimado de linhas o admin mostra a contagem das estatísticas do Postgres no lugar do COUNT(*)
+ADMIN_CONTAGEM_EXATA_ATE = env.int('ADMIN_CONTAGEM_EXATA_ATE', 10000)
+
+# Por quantas horas a resposta de um POST com Idempotency-Key é devolvida nas repetições
+IDEMPOTENCIA_TTL_HORAS = env.float('IDEMPOTENCIA_TTL_HORAS', 24)
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Brasil Prev',
     'DESCRIPTION': 'Uma Api rest que possibilita Cadastro de clientes e '
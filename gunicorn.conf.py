@@ -0,0 +1,21 @@
+"""
+Configuração do gunicorn, lida automaticamente quando ele é iniciado na raiz do projeto.
+Prepara o diretório onde os workers gravam as métricas do Prometheus (PROMETHEUS_MULTIPROC_DIR)
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    diretorio = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if diretorio:
+        # métricas de execuções anteriores não podem ser somadas às novas
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.makedirs(diretorio, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)